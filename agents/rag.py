@@ -1,68 +1,794 @@
 # rag.py
 
+import itertools
+import json
 import logging
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from operator import itemgetter
-from typing import Any, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
 
-from services.document_service import load_documents
+from config.config import RagConfig, embedding_config_dict
+from services.ann_index_service import to_ann_vectorstore
+from services.bm25_service import BM25Index
+from services.chunking_service import SectionTextSplitter
+from services.dedup_service import NearDuplicateFilter
+from services.document_service import (
+    DocumentCache,
+    LoaderOptions,
+    document_source,
+    iter_documents,
+    iter_documents_parallel,
+    load_documents,
+)
+from services.embedding_service import (
+    CachedEmbeddings,
+    EmbeddingStore,
+    embedding_model_id,
+    instantiate_embeddings,
+)
+from services.index_cache_service import (
+    IndexCache,
+    compute_corpus_key,
+    compute_index_key,
+)
+from services.index_manager_service import IndexManager
+from services.ingestion_service import IngestionPipeline
+from services.mmap_store_service import load_mmap_store, save_mmap_store
+from services.query_cache_service import QueryCache, get_shared_query_cache
 from services.url_service import WebScraper
+from utilities.cache_utils import evict_lru, hash_bytes, hash_file
 
 
-def setup_rag_chain(files_path_list: List[str], url: str, llm: ChatOpenAI) -> Any:
+class RagChain:
+    """
+    The LCEL RAG chain together with the components it was built from.
+
+    invoke() matches the runnable interface RagTool relies on, batch_invoke()
+    answers several questions with one FAISS search and one LLM call.
+    cache_scope ties cached answers to the index version, retrieval settings and
+    answering model.
+    """
+
+    def __init__(
+        self,
+        chain: Runnable,
+        answer_chain: Runnable,
+        retriever: "HybridRetriever",
+        llm: ChatOpenAI,
+        embedding_model: Embeddings,
+        index_version: str,
+        cache_scope: str,
+        query_cache: Optional[QueryCache] = None,
+        max_concurrency: int = 4,
+    ):
+        self.chain = chain
+        self.answer_chain = answer_chain
+        self.retriever = retriever
+        self.llm = llm
+        self.embedding_model = embedding_model
+        self.index_version = index_version
+        self.cache_scope = cache_scope
+        self.query_cache = query_cache
+        self.max_concurrency = max_concurrency
+
+    def invoke(
+        self,
+        inputs: Dict[str, Any],
+        config: Optional[Any] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> str:
+        """Answer inputs["question"], reusing query_vector for retrieval if given."""
+        if query_vector is None:
+            return self.chain.invoke(inputs, config)
+        docs = self.retriever.retrieve(
+            inputs["question"], np.asarray(query_vector, dtype=np.float32)
+        )
+        return self.answer_chain.invoke(
+            {"context": docs, "question": inputs["question"]}, config
+        )
+
+    def embed_questions(self, questions: List[str]) -> List[List[float]]:
+        """
+        Embed questions as queries, at most max_concurrency at a time. Unlike
+        embed_documents this applies the model's query encoding and keeps query
+        vectors out of the chunk embedding cache.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            return list(executor.map(self.embedding_model.embed_query, questions))
+
+    def batch_invoke(
+        self,
+        questions: List[str],
+        query_vectors: Optional[List[List[float]]] = None,
+    ) -> List[str]:
+        """
+        Answer several questions at once: embed them concurrently, search FAISS
+        once with the query matrix, deduplicate the retrieved chunks and answer
+        them all in one LLM call. Falls back to bounded parallel per-question
+        calls if the combined answer cannot be parsed.
+        """
+        if not questions:
+            return []
+        if query_vectors is None:
+            query_vectors = self.embed_questions(questions)
+        query_matrix = np.asarray(query_vectors, dtype=np.float32)
+        position_lists = self.retriever.get_positions_batch(questions, query_matrix)
+        doc_lists = [
+            self.retriever.select_documents(positions, query_vector)
+            for positions, query_vector in zip(position_lists, query_matrix)
+        ]
+        # Chunks shared between questions are sent to the LLM only once
+        unique_texts = list(
+            dict.fromkeys(doc.page_content for docs in doc_lists for doc in docs)
+        )
+        context = "\n\n".join(
+            f"[{n + 1}] {text}" for n, text in enumerate(unique_texts)
+        )
+        numbered_questions = "\n".join(f"{n + 1}. {q}" for n, q in enumerate(questions))
+        logging.info(
+            f"Answering {len(questions)} questions with {len(unique_texts)} "
+            f"unique chunks (from {sum(len(docs) for docs in doc_lists)} selected)"
+        )
+        response = (BATCH_RAG_PROMPT | self.llm | StrOutputParser()).invoke(
+            {"context": context, "questions": numbered_questions}
+        )
+        answers = parse_batch_answers(response, len(questions))
+        if answers is not None:
+            return answers
+
+        logging.warning("Could not parse combined answer, answering separately")
+        return self.answer_chain.batch(
+            [
+                {"context": docs, "question": question}
+                for question, docs in zip(questions, doc_lists)
+            ],
+            config={"max_concurrency": self.max_concurrency},
+        )
+
+
+BATCH_RAG_PROMPT = ChatPromptTemplate.from_template(
+    "Context:\n{context}\n\nQuestions:\n{questions}\n\n"
+    "Use the context to answer each question. If you can't answer one, say you don't know. "
+    "Reply with only a JSON array of strings, one answer per question, in the same order."
+)
+
+
+def parse_batch_answers(response: str, expected: int) -> Optional[List[str]]:
+    """Parse the JSON array returned for a batch prompt, or None if it is malformed."""
+    if "```" in response:
+        response = response.split("```")[1].removeprefix("json")
+    try:
+        answers = json.loads(response.strip())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(answers, list) or len(answers) != expected:
+        return None
+    return [str(answer) for answer in answers]
+
+
+def setup_rag_chain(
+    files_path_list: List[str],
+    url: str,
+    llm: ChatOpenAI,
+    rag_config: Optional[RagConfig] = None,
+) -> RagChain:
     """
     Set up a Retrieval-Augmented Generation (RAG) chain using either loaded
     documents or documents extrcted from url and save the resulting vector index.
     """
     logging.info(f"Setting up RAG chain for: {files_path_list or url}")
+    rag_config = rag_config or RagConfig()
 
-    # Load documents using the new document_loader module
-    docs = get_documents(files_path_list, url)
-
-    if docs:
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=0)
-        splits = text_splitter.split_documents(docs)
-
-        embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
-        vectorstore = FAISS.from_documents(splits, embedding_model)
-        retriever = vectorstore.as_retriever()
-        rag_prompt = ChatPromptTemplate.from_template(
-            "Context: {context}\n\nQuery: {question}\n\nUse the context to answer the query. If you can't answer, say you don't know."
+    base_embeddings = instantiate_embeddings(
+        embedding_config_dict[rag_config.embedding_provider][rag_config.embedding_model]
+    )
+    if getattr(base_embeddings, "requires_fit", False):
+        base_embeddings = base_embeddings.for_corpus(
+            fit_corpus_key(files_path_list, url, rag_config)
         )
-        rag_chain = (
-            {
-                "context": itemgetter("question") | retriever,
-                "question": itemgetter("question"),
-            }
-            | rag_prompt
-            | llm
-            | StrOutputParser()
+        if not base_embeddings.is_fitted:
+            base_embeddings.fit(sample_chunk_texts(files_path_list, url, rag_config))
+    embedding_model = CachedEmbeddings(
+        base_embeddings,
+        model_name=embedding_model_id(base_embeddings, rag_config.embedding_model),
+        store=EmbeddingStore(rag_config.embedding_cache_path),
+        batch_size=rag_config.embedding_batch_size,
+        max_concurrency=rag_config.embedding_max_concurrency,
+    )
+    vectorstore, index_key = build_vectorstore(
+        files_path_list, url, embedding_model, rag_config
+    )
+    retriever = HybridRetriever.from_vectorstore(
+        vectorstore,
+        embedding_model,
+        mode=rag_config.retrieval_mode,
+        k=rag_config.retrieval_k,
+        candidate_k=rag_config.retrieval_candidates,
+        mmr_lambda=rag_config.mmr_lambda,
+        merge_adjacent=rag_config.merge_adjacent_chunks,
+        token_budget=rag_config.context_token_budget,
+    )
+    rag_prompt = ChatPromptTemplate.from_template(
+        "Context: {context}\n\nQuery: {question}\n\nUse the context to answer the query. If you can't answer, say you don't know."
+    )
+    answer_chain = rag_prompt | llm | StrOutputParser()
+    rag_chain = {
+        "context": itemgetter("question") | retriever,
+        "question": itemgetter("question"),
+    } | answer_chain
+    # Answers depend on the corpus, the retrieval settings and the answering model
+    cache_scope = hash_bytes(
+        index_key,
+        rag_config.retrieval_mode,
+        str(rag_config.retrieval_k),
+        str(rag_config.mmr_lambda),
+        str(rag_config.merge_adjacent_chunks),
+        str(rag_config.context_token_budget),
+        str(getattr(llm, "model_name", None) or getattr(llm, "model", "")),
+    )
+    query_cache = None
+    if rag_config.query_cache_enabled:
+        query_cache = get_shared_query_cache(
+            rag_config.query_cache_max_entries,
+            rag_config.query_cache_ttl_seconds,
+            rag_config.query_cache_semantic_threshold,
         )
-        logging.info("RAG chain setup complete")
-        return rag_chain
+    logging.info("RAG chain setup complete")
+    return RagChain(
+        rag_chain,
+        answer_chain,
+        retriever,
+        llm,
+        embedding_model,
+        index_version=index_key,
+        cache_scope=cache_scope,
+        query_cache=query_cache,
+        max_concurrency=rag_config.batch_max_concurrency,
+    )
+
+
+def create_text_splitter(
+    rag_config: RagConfig, add_start_index: bool = False
+) -> RecursiveCharacterTextSplitter:
+    """Splitter for the corpus; keeps scraped page sections whole when configured."""
+    params = {
+        "chunk_size": rag_config.chunk_size,
+        "chunk_overlap": rag_config.chunk_overlap,
+        "add_start_index": add_start_index,
+    }
+    if rag_config.section_chunk_size is None:
+        return RecursiveCharacterTextSplitter(**params)
+    return SectionTextSplitter(rag_config.section_chunk_size, **params)
+
+
+def fit_corpus_key(
+    files_path_list: Optional[List[str]], url: Optional[str], rag_config: RagConfig
+) -> str:
+    """Key of the corpus a local embedding model is fitted on: file contents, URL and sampling settings."""
+    parts = [
+        url or "",
+        str(rag_config.chunk_size),
+        str(rag_config.chunk_overlap),
+        str(rag_config.embedding_fit_sample_size),
+    ]
+    for file_path in sorted(files_path_list or []):
+        try:
+            parts.extend([file_path, hash_file(file_path)])
+        except OSError:
+            # Unreadable files are skipped by the loaders too
+            continue
+    return hash_bytes(*parts)
+
+
+def sample_chunk_texts(
+    files_path_list: Optional[List[str]], url: Optional[str], rag_config: RagConfig
+) -> List[str]:
+    """Split the corpus until enough chunk texts are collected to fit a local embedding model."""
+    text_splitter = create_text_splitter(rag_config)
+    url_docs = get_documents(url=url, rag_config=rag_config) if url else []
+    texts: List[str] = []
+    for doc in itertools.chain(load_files(files_path_list or [], rag_config), url_docs):
+        texts.extend(c.page_content for c in text_splitter.split_documents([doc]))
+        if len(texts) >= rag_config.embedding_fit_sample_size:
+            break
+    if not texts:
+        raise ValueError("No documents were loaded, RAG chain setup cannot proceed.")
+    return texts[: rag_config.embedding_fit_sample_size]
+
+
+def build_vectorstore(
+    files_path_list: Optional[List[str]],
+    url: Optional[str],
+    embedding_model: Embeddings,
+    rag_config: RagConfig,
+) -> Tuple[FAISS, str]:
+    """
+    Build the FAISS index for the given files and URL. Files are identified by a
+    hash of their bytes, so an unchanged corpus is served from the index cache
+    without parsing; otherwise only new or changed files are streamed through the
+    ingestion pipeline into the working index.
+    Returns the vector store and its content-addressed index key.
+    """
+    source_hashes: Dict[str, str] = {}
+    for file_path in files_path_list or []:
+        try:
+            source_hashes[file_path] = hash_file(file_path)
+        except OSError as e:
+            logging.error(f"Failed to read {file_path}: {str(e)}")
+    file_sources = set(source_hashes)
+    url_docs_by_source: Dict[str, List[Document]] = defaultdict(list)
+    web_scraper = WebScraper(scraper_config=rag_config.scraper) if url else None
+    snapshot = (
+        web_scraper.sitemap_snapshot(url)
+        if url and rag_config.scraper.sitemap_enabled
+        else None
+    )
+    if snapshot is not None:
+        # Pages unchanged since the last crawl keep their ledger hash unfetched
+        source_hashes.update(snapshot.source_hashes)
+        url_docs_by_source.update(snapshot.documents)
+    elif url:
+        # Pages have no stable bytes on disk, so they are hashed after extraction
+        for doc in get_documents(url=url, rag_config=rag_config):
+            url_docs_by_source[document_source(doc)].append(doc)
+        for source, docs in url_docs_by_source.items():
+            source_hashes[source] = compute_index_key(docs)
+    if not source_hashes:
+        raise ValueError("No documents were loaded, RAG chain setup cannot proceed.")
+
+    index_cache = IndexCache(
+        rag_config.index_cache_dir, rag_config.index_cache_max_bytes
+    )
+    build_params = {
+        "chunk_size": rag_config.chunk_size,
+        "chunk_overlap": rag_config.chunk_overlap,
+        "section_chunk_size": rag_config.section_chunk_size,
+        "csv_rows_per_document": rag_config.csv_rows_per_document,
+        # Includes the fit fingerprint of fitted local models
+        "embedding_model": getattr(embedding_model, "model_name", None)
+        or embedding_model_id(embedding_model, rag_config.embedding_model),
+        # Chunk offsets let retrieval merge neighbouring chunks
+        "add_start_index": True,
+    }
+    if rag_config.dedup_enabled:
+        build_params["dedup"] = [rag_config.dedup_threshold, rag_config.dedup_num_perm]
+    ann_params = {
+        "ann_recall_target": rag_config.ann_recall_target,
+        "ann_flat_max_vectors": rag_config.ann_flat_max_vectors,
+        "ann_pq_min_vectors": rag_config.ann_pq_min_vectors,
+        "ann_recall_k": rag_config.retrieval_candidates,
+    }
+    key = compute_corpus_key(source_hashes, **build_params, **ann_params)
+
+    use_mmap = rag_config.vector_store == "mmap"
+    mmap_dir = rag_config.mmap_store_dir / f"{key}-{rag_config.mmap_dtype}"
+    if use_mmap:
+        vectorstore = load_mmap_store(mmap_dir, embedding_model)
+        if vectorstore is not None:
+            return vectorstore, key
     else:
+        vectorstore = index_cache.load(key, embedding_model)
+        if vectorstore is not None:
+            return vectorstore, key
+
+    def load_sources(sources: List[str]) -> Iterator[Document]:
+        yield from load_files([s for s in sources if s in file_sources], rag_config)
+        unseen = []
+        for source in sources:
+            if source in file_sources:
+                continue
+            if source in url_docs_by_source:
+                yield from url_docs_by_source[source]
+            else:
+                unseen.append(source)
+        if unseen:
+            # Unchanged sitemap pages this working index has not seen yet are
+            # revalidated concurrently, like the sitemap recrawl itself
+            yield from web_scraper.fetch_pages(unseen)
+
+    text_splitter = create_text_splitter(rag_config, add_start_index=True)
+    pipeline = IngestionPipeline(
+        text_splitter,
+        embedding_model,
+        batch_size=rag_config.ingestion_batch_size,
+        queue_size=rag_config.ingestion_queue_size,
+        dedup=(
+            NearDuplicateFilter(
+                rag_config.dedup_threshold,
+                rag_config.dedup_num_perm,
+                count_tokens=count_tokens,
+            )
+            if rag_config.dedup_enabled
+            else None
+        ),
+    )
+    # One working index per build configuration, updated file by file
+    index_manager = IndexManager(
+        rag_config.index_store_dir / compute_corpus_key({}, **build_params),
+        embedding_model,
+    )
+    vectorstore = index_manager.sync(source_hashes, load_sources, pipeline)
+    if vectorstore is None or vectorstore.index.ntotal == 0:
         raise ValueError("No documents were loaded, RAG chain setup cannot proceed.")
+    if isinstance(embedding_model, CachedEmbeddings):
+        logging.info(f"Embedding cache stats: {embedding_model.stats()}")
+
+    if use_mmap:
+        # Quantized vectors are searched exactly, so no ANN index is needed
+        save_mmap_store(vectorstore, mmap_dir, rag_config.mmap_dtype)
+        evict_lru(
+            [
+                p
+                for p in rag_config.mmap_store_dir.iterdir()
+                if not p.name.startswith(".")
+            ],
+            rag_config.index_cache_max_bytes,
+        )
+        return load_mmap_store(mmap_dir, embedding_model), key
+
+    # The working index stays exact; the searchable one is chosen by measured
+    # recall at the depth the retriever searches
+    vectorstore = to_ann_vectorstore(
+        vectorstore,
+        rag_config.ann_recall_target,
+        flat_max_vectors=rag_config.ann_flat_max_vectors,
+        pq_min_vectors=rag_config.ann_pq_min_vectors,
+        k=rag_config.retrieval_candidates,
+    )
+    index_cache.save(key, vectorstore)
+    return vectorstore, key
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[np.ndarray], k: int, rrf_k: int = 60
+) -> np.ndarray:
+    """Fuse ranked lists of document positions with RRF and return the top-k positions."""
+    ranked_lists = [ranks for ranks in ranked_lists if len(ranks)]
+    if not ranked_lists:
+        return np.empty(0, dtype=np.int64)
+    positions = np.concatenate(ranked_lists)
+    contributions = np.concatenate(
+        [1.0 / (rrf_k + np.arange(1, len(ranks) + 1)) for ranks in ranked_lists]
+    )
+    unique_positions, inverse = np.unique(positions, return_inverse=True)
+    fused = np.bincount(inverse, weights=contributions)
+    order = np.argsort(-fused, kind="stable")[:k]
+    return unique_positions[order]
+
+
+# A phrase in straight, curly or back quotes asks for an exact match; single
+# quotes are left out since they are mostly apostrophes ("what's", "teams'")
+QUOTED_PHRASE = re.compile(r'"[^"]+"|“[^”]+”|`[^`]+`')
+
+
+def is_keyword_query(query: str) -> bool:
+    """Heuristic for queries better served by exact term matching than by semantics."""
+    if QUOTED_PHRASE.search(query):
+        return True
+    words = query.split()
+    if len(words) > 4 or query.rstrip().endswith("?"):
+        return False
+    # Identifiers: digits, snake_case, dotted/dashed names or camelCase
+    return any(re.search(r"\d|_|\w[.\-/:]\w|[a-z][A-Z]", word) for word in words)
+
+
+@lru_cache(maxsize=1)
+def _token_encoding() -> Optional[Any]:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logging.warning("tiktoken unavailable, estimating tokens as characters / 4")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken, or estimate them when it is unavailable."""
+    encoding = _token_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def mmr_select(
+    query_vector: np.ndarray, candidate_vectors: np.ndarray, k: int, lambda_mult: float
+) -> List[int]:
+    """
+    Maximal marginal relevance over cosine similarities. The candidate-candidate
+    similarity matrix is computed once; each step is a vectorized argmax.
+    """
+    candidates = candidate_vectors / np.maximum(
+        np.linalg.norm(candidate_vectors, axis=1, keepdims=True), 1e-12
+    )
+    query = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    for _ in range(min(k, len(candidates)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        max_similarity = np.maximum(max_similarity, similarity[best])
+    return selected
+
+
+def merge_adjacent_chunks(docs: List[Document], max_gap: int = 10) -> List[Document]:
+    """
+    Merge chunks of the same source whose character ranges touch or overlap,
+    keeping the rank of the best-ranked chunk in each merged run.
+    """
+    order = sorted(
+        range(len(docs)),
+        key=lambda i: (
+            document_source(docs[i]),
+            docs[i].metadata.get("page", 0),
+            docs[i].metadata.get("start_index", -1),
+        ),
+    )
+    runs: List[Tuple[int, Document]] = []
+    for i in order:
+        doc = docs[i]
+        start = doc.metadata.get("start_index")
+        if runs and start is not None:
+            rank, previous = runs[-1]
+            previous_start = previous.metadata.get("start_index")
+            if (
+                previous_start is not None
+                and document_source(previous) == document_source(doc)
+                and previous.metadata.get("page") == doc.metadata.get("page")
+                and start <= previous_start + len(previous.page_content) + max_gap
+            ):
+                overlap = previous_start + len(previous.page_content) - start
+                tail = doc.page_content[max(overlap, 0) :]
+                separator = "" if overlap >= 0 else " "
+                runs[-1] = (
+                    min(rank, i),
+                    Document(
+                        page_content=previous.page_content + separator + tail,
+                        metadata=previous.metadata,
+                    ),
+                )
+                continue
+        runs.append((i, doc))
+    return [doc for _, doc in sorted(runs, key=lambda run: run[0])]
+
+
+def pack_context(docs: List[Document], token_budget: int) -> List[Document]:
+    """Greedily keep documents in rank order while they fit in the token budget."""
+    packed, used = [], 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content)
+        if used + tokens <= token_budget:
+            packed.append(doc)
+            used += tokens
+    return packed
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines dense FAISS similarity with sparse BM25 using reciprocal rank fusion.
+
+    Modes: "dense", "sparse", "hybrid", or "auto", which answers keyword-style
+    queries from BM25 alone and so skips the query embedding call.
+    """
+
+    vectorstore: FAISS
+    embedding_model: Embeddings
+    bm25: BM25Index
+    documents: List[Document]
+    mode: str = "hybrid"
+    k: int = 4
+    candidate_k: int = 20
+    mmr_lambda: Optional[float] = None
+    merge_adjacent: bool = False
+    token_budget: Optional[int] = None
+
+    @classmethod
+    def from_vectorstore(
+        cls, vectorstore: FAISS, embedding_model: Embeddings, **kwargs: Any
+    ) -> "HybridRetriever":
+        # Documents are ordered by FAISS position so both indexes share positions
+        documents = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            for i in range(vectorstore.index.ntotal)
+        ]
+        bm25 = BM25Index([doc.page_content for doc in documents])
+        return cls(
+            vectorstore=vectorstore,
+            embedding_model=embedding_model,
+            bm25=bm25,
+            documents=documents,
+            **kwargs,
+        )
+
+    def _dense_positions_batch(self, query_vectors: np.ndarray) -> List[np.ndarray]:
+        """One FAISS search over the whole query matrix."""
+        _, positions = self.vectorstore.index.search(
+            np.ascontiguousarray(query_vectors, dtype=np.float32), self.candidate_k
+        )
+        return [row[row >= 0] for row in positions]
+
+    def _route(self, query: str) -> str:
+        if self.mode == "auto":
+            return "sparse" if is_keyword_query(query) else "hybrid"
+        return self.mode
+
+    def uses_dense(self, query: str) -> bool:
+        """Whether retrieving for query embeds it (sparse-only routing does not)."""
+        return self._route(query) != "sparse"
+
+    def _positions(
+        self, query: str, dense_positions: Callable[[], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Rank positions for a query; dense_positions is only called when needed.
+        With MMR enabled the full candidate list is returned for re-selection.
+        """
+        limit = self.candidate_k if self.mmr_lambda is not None else self.k
+        mode = self._route(query)
+
+        if mode == "dense":
+            positions = dense_positions()[:limit]
+        elif mode == "sparse":
+            positions, _ = self.bm25.search(query, limit)
+            if not len(positions):
+                # No term overlap at all; semantics is the only signal left
+                positions = dense_positions()[:limit]
+        else:
+            sparse_positions, _ = self.bm25.search(query, self.candidate_k)
+            positions = reciprocal_rank_fusion(
+                [dense_positions(), sparse_positions], limit
+            )
+        logging.debug(f"Retrieved {len(positions)} documents in {mode} mode")
+        return positions
+
+    def select_documents(
+        self, positions: np.ndarray, query_vector: Optional[np.ndarray] = None
+    ) -> List[Document]:
+        """
+        Post-retrieval stage: diversify candidates with MMR, merge adjacent chunks
+        of the same source and pack the result into the context token budget.
+        """
+        baseline = [self.documents[i] for i in positions[: self.k]]
+        if query_vector is not None and self.mmr_lambda is not None and len(positions):
+            candidate_vectors = np.stack(
+                [self.vectorstore.index.reconstruct(int(i)) for i in positions]
+            )
+            chosen = mmr_select(
+                query_vector, candidate_vectors, self.k, self.mmr_lambda
+            )
+            docs = [self.documents[positions[i]] for i in chosen]
+        else:
+            docs = baseline
+        if self.merge_adjacent:
+            docs = merge_adjacent_chunks(docs)
+        if self.token_budget is not None:
+            docs = pack_context(docs, self.token_budget)
+            baseline_tokens = sum(count_tokens(doc.page_content) for doc in baseline)
+            packed_tokens = sum(count_tokens(doc.page_content) for doc in docs)
+            logging.info(
+                f"Context packed into {packed_tokens} tokens "
+                f"({baseline_tokens - packed_tokens} saved vs plain top-{self.k})"
+            )
+        return docs
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.retrieve(query)
+
+    def retrieve(
+        self, query: str, query_vector: Optional[np.ndarray] = None
+    ) -> List[Document]:
+        """
+        Retrieve documents for query. The query is embedded only if dense search
+        runs and no query_vector was passed in.
+        """
+        query_vectors: List[np.ndarray] = []
+        if query_vector is not None:
+            query_vectors.append(query_vector)
+
+        def dense_positions() -> np.ndarray:
+            if not query_vectors:
+                query_vectors.append(
+                    np.asarray(
+                        self.embedding_model.embed_query(query), dtype=np.float32
+                    )
+                )
+            return self._dense_positions_batch(query_vectors[0][None, :])[0]
+
+        positions = self._positions(query, dense_positions)
+        # MMR needs the query vector, which keyword-only retrieval never computes
+        return self.select_documents(
+            positions, query_vectors[0] if query_vectors else None
+        )
+
+    def get_positions_batch(
+        self, queries: List[str], query_vectors: np.ndarray
+    ) -> List[np.ndarray]:
+        """Rank positions for several queries with a single batched dense search."""
+        dense = self._dense_positions_batch(query_vectors)
+        return [
+            self._positions(query, lambda i=i: dense[i])
+            for i, query in enumerate(queries)
+        ]
+
+
+def document_cache(rag_config: RagConfig) -> Optional[DocumentCache]:
+    """The parsed-document cache configured in rag_config, if enabled."""
+    if not rag_config.document_cache_enabled:
+        return None
+    return DocumentCache(
+        rag_config.document_cache_dir, rag_config.document_cache_max_bytes
+    )
+
+
+def loader_options(rag_config: RagConfig) -> LoaderOptions:
+    """Per file type loader arguments configured in rag_config."""
+    return {"csv": {"rows_per_document": rag_config.csv_rows_per_document}}
+
+
+def load_files(file_paths: List[str], rag_config: RagConfig) -> Iterator[Document]:
+    """Stream documents from files, parsing them in worker processes when configured."""
+    cache = document_cache(rag_config)
+    options = loader_options(rag_config)
+    if rag_config.loader_max_workers > 1 and len(file_paths) > 1:
+        return iter_documents_parallel(
+            file_paths,
+            rag_config.loader_max_workers,
+            rag_config.loader_timeout_seconds,
+            cache,
+            options,
+        )
+    return iter_documents(file_paths, cache, options)
 
 
 def get_documents(
-    files_uploaded: Optional[List[str]] = None, url: Optional[str] = None
+    files_uploaded: Optional[List[str]] = None,
+    url: Optional[str] = None,
+    rag_config: Optional[RagConfig] = None,
 ) -> List[Document]:
     """Load documents from either files uploads or a URL."""
     documents = []
+    rag_config = rag_config or RagConfig()
 
     if files_uploaded:
         logging.info(f"Loading documents from file uploads: {files_uploaded}")
-        documents.extend(load_documents(files_uploaded))
+        documents.extend(
+            load_documents(
+                files_uploaded,
+                max_workers=rag_config.loader_max_workers,
+                timeout=rag_config.loader_timeout_seconds,
+                cache=document_cache(rag_config),
+                loader_options=loader_options(rag_config),
+            )
+        )
 
     if url:
         logging.info(f"Loading documents from URL: {url}")
-        web_scraper = WebScraper()
-        documents.extend(web_scraper.scrape_website(url))
+        web_scraper = WebScraper(scraper_config=rag_config.scraper)
+        if rag_config.scraper.crawl_enabled:
+            documents.extend(web_scraper.crawl_website(url))
+        else:
+            documents.extend(web_scraper.scrape_website(url))
 
     return documents
@@ -2,11 +2,13 @@
 
 import logging
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, List, Optional
 
 from langchain.pydantic_v1 import BaseModel, Field
 from langchain.tools.base import BaseTool
 
+from services.query_cache_service import QueryCache
+
 
 class ToolInput(BaseModel):
     """Defines the input schema for queries to the tool."""
@@ -14,6 +16,14 @@ class ToolInput(BaseModel):
     query: str = Field(description="Query to be processed by the tool")
 
 
+class BatchToolInput(BaseModel):
+    """Defines the input schema for several independent queries answered together."""
+
+    queries: List[str] = Field(
+        description="Independent queries to be processed together by the tool"
+    )
+
+
 class AbstractTool(BaseTool, ABC):
     """Base class for all tools, providing a common interface."""
 
@@ -39,16 +49,113 @@ class RagTool(AbstractTool):
     name = "RagTool"
     description = "Fetches documents data using a RAG chain."
     rag_chain: Any
+    query_cache: Optional[QueryCache] = None
 
-    def __init__(self, rag_chain: Any, **kwargs):
+    def __init__(
+        self, rag_chain: Any, query_cache: Optional[QueryCache] = None, **kwargs
+    ):
         super().__init__(**kwargs)
         self.rag_chain = rag_chain
+        # Chains built by setup_rag_chain carry the shared, version-scoped cache
+        self.query_cache = query_cache or getattr(rag_chain, "query_cache", None)
 
     def _run(self, query: str) -> str:
         """Synchronously fetch data from the RAG documents using the provided query."""
         try:
-            result = self.rag_chain.invoke({"question": query})
+            if self.query_cache is None:
+                result = self.rag_chain.invoke({"question": query})
+            else:
+                result = self._run_cached(query)
             logging.debug(f"Query result: {result}")
             return result
         except Exception as e:
             raise RuntimeError(f"Error processing query: {str(e)}") from e
+
+    def _run_cached(self, query: str) -> str:
+        """Answer from the exact or semantic cache tier, falling back to the chain."""
+        scope = getattr(self.rag_chain, "cache_scope", "")
+        result = self.query_cache.get(query, scope)
+        if result is not None:
+            logging.info(f"Query cache hit for: {query}")
+            return result
+
+        query_vector = None
+        embedding_model = getattr(self.rag_chain, "embedding_model", None)
+        retriever = getattr(self.rag_chain, "retriever", None)
+        if (
+            self.query_cache.semantic_threshold is not None
+            and embedding_model
+            and retriever is not None
+            # Keyword-routed queries skip the embedding call altogether
+            and retriever.uses_dense(query)
+        ):
+            query_vector = embedding_model.embed_query(query)
+            result = self.query_cache.get_similar(query_vector, scope)
+            if result is not None:
+                return result
+
+        if query_vector is None:
+            result = self.rag_chain.invoke({"question": query})
+        else:
+            # Retrieval reuses the vector the semantic tier already computed
+            result = self.rag_chain.invoke(
+                {"question": query}, query_vector=query_vector
+            )
+        self.query_cache.put(query, scope, result, query_vector)
+        return result
+
+
+class BatchRagTool(RagTool):
+    """A RAG tool that answers several queries with one retrieval pass and one LLM call."""
+
+    name = "BatchRagTool"
+    description = (
+        "Fetches documents data for several independent questions at once using a RAG "
+        "chain. Prefer it over RagTool when you need more than one fact."
+    )
+    args_schema: Any = BatchToolInput
+
+    def _run(self, queries: List[str]) -> str:
+        """Synchronously answer all queries, reusing cached answers where possible."""
+        try:
+            answers = self._answer_all(queries)
+            result = "\n\n".join(
+                f"Query: {query}\nAnswer: {answer}"
+                for query, answer in zip(queries, answers)
+            )
+            logging.debug(f"Batch query result: {result}")
+            return result
+        except Exception as e:
+            raise RuntimeError(f"Error processing queries: {str(e)}") from e
+
+    async def _arun(self, queries: List[str]) -> str:
+        logging.warning("Async run not implemented yet.")
+        return self._run(queries)
+
+    def _answer_all(self, queries: List[str]) -> List[str]:
+        if self.query_cache is None:
+            return self.rag_chain.batch_invoke(queries)
+
+        scope = getattr(self.rag_chain, "cache_scope", "")
+        answers: List[Optional[str]] = [
+            self.query_cache.get(query, scope) for query in queries
+        ]
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+
+        # The query embeddings serve both the semantic tier and retrieval
+        vectors = self.rag_chain.embed_questions([queries[i] for i in pending])
+        vector_by_index = dict(zip(pending, vectors))
+        for i in pending:
+            answers[i] = self.query_cache.get_similar(vector_by_index[i], scope)
+        pending = [i for i in pending if answers[i] is None]
+        if pending:
+            fresh = self.rag_chain.batch_invoke(
+                [queries[i] for i in pending],
+                query_vectors=[vector_by_index[i] for i in pending],
+            )
+            for i, answer in zip(pending, fresh):
+                answers[i] = answer
+                self.query_cache.put(queries[i], scope, answer, vector_by_index[i])
+        return answers
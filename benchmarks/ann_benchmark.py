@@ -0,0 +1,90 @@
+# ann_benchmark.py
+"""
+Recall-vs-latency benchmark for the FAISS index types used by setup_rag_chain.
+
+Usage:
+    python -m benchmarks.ann_benchmark --vectors 200000 --dim 256 --k 4
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from services.ann_index_service import INDEX_TYPES, RecallSample, build_faiss_index
+
+
+def synthetic_corpus(
+    n_vectors: int, dim: int, n_clusters: int, seed: int
+) -> np.ndarray:
+    """Clustered Gaussian vectors, which behave more like text embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, n_clusters, size=n_vectors)
+    noise = rng.normal(scale=0.5, size=(n_vectors, dim)).astype(np.float32)
+    vectors = centers[assignments] + noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours that the approximate search returned."""
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def run(args: argparse.Namespace):
+    corpus = synthetic_corpus(args.vectors, args.dim, args.clusters, args.seed)
+    queries = synthetic_corpus(args.queries, args.dim, args.clusters, args.seed + 1)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(corpus)
+    _, expected = exact.search(queries, args.k)
+
+    print(f"{args.vectors} vectors, dim {args.dim}, {args.queries} queries, k={args.k}")
+    print(
+        f"{'index':<8}{'recall@k':>10}{'build s':>10}{'ms/query':>10}{'p99 ms':>10}{'RAM MB':>10}"
+    )
+    # Search parameters are calibrated on queries held out from the evaluation set
+    calibration = synthetic_corpus(1000, args.dim, args.clusters, args.seed + 2)
+    sample = RecallSample(corpus, args.k, queries=calibration)
+    for index_type in args.index_types:
+        start = time.perf_counter()
+        index = build_faiss_index(
+            index_type, corpus, args.recall_target, sample, args.k
+        )
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty_like(expected)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = ids[0]
+
+        # The serialized index is a close proxy for its resident size
+        ram_mb = faiss.serialize_index(index).nbytes / 1024**2
+        print(
+            f"{index_type:<8}{recall_at_k(found, expected):>10.3f}{build_seconds:>10.2f}"
+            f"{np.mean(latencies):>10.3f}{np.percentile(latencies, 99):>10.3f}{ram_mb:>10.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--recall-target", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--index-types", nargs="+", choices=INDEX_TYPES, default=INDEX_TYPES
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
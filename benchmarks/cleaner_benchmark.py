@@ -0,0 +1,142 @@
+# cleaner_benchmark.py
+"""
+Pages-per-second benchmark for the BeautifulSoup and lxml ContentCleaner engines.
+
+Usage:
+    python -m benchmarks.cleaner_benchmark --html-dir path/to/saved/pages
+    python -m benchmarks.cleaner_benchmark --pages 200 --depth 40
+
+The corpus is every *.html / *.htm file under --html-dir plus the pages saved in
+the scraper's page cache; if both are empty, synthetic pages are generated.
+Timings are end to end: each engine parses the page with its own parser
+(html.parser for BeautifulSoup, lxml for lxml) and then cleans it. Outputs are
+compared page by page; they can only differ where the parsers repair invalid
+markup differently.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from config.config import ScraperConfig
+from services.content_cleaner_service import ContentCleaner, LxmlContentCleaner
+
+WORDS = (
+    "agent graph retrieval index vector query document chunk model token cache "
+    "memory latency throughput batch embedding search context answer source page "
+    "rescue drone mission area sector team weather report status signal"
+).split()
+
+
+def synthetic_page(rng: random.Random, paragraphs: int, depth: int) -> str:
+    """A page with navigation, ads and an article nested depth divs deep."""
+
+    def sentence() -> str:
+        return " ".join(rng.choices(WORDS, k=rng.randint(6, 18))).capitalize() + "."
+
+    nav = "".join(f'<li><a href="/{w}">{w}</a></li>' for w in rng.sample(WORDS, 8))
+    body = "".join(
+        f"<p>{' '.join(sentence() for _ in range(rng.randint(2, 6)))}</p>"
+        + (f'<div class="ad-banner"><p>{sentence()}</p></div>' if i % 5 == 4 else "")
+        for i in range(paragraphs)
+    )
+    article = f"<article><h1>{sentence()}</h1>{body}</article>"
+    for level in range(depth):
+        article = f'<div class="wrap-{level}">\n  {article}\n</div>'
+    return (
+        "<!DOCTYPE html><html><head><title>Page</title>"
+        "<script>var x = 1;</script><style>p { margin: 0 }</style></head><body>"
+        f'<header><ul class="menu">{nav}</ul></header>'
+        f'<div class="sidebar"><p>{sentence()}</p></div>'
+        f"<!-- main content -->{article}"
+        f"<footer><p>{sentence()}</p></footer></body></html>"
+    )
+
+
+def load_corpus(args: argparse.Namespace) -> List[Tuple[str, str]]:
+    pages = []
+    if args.html_dir:
+        for path in sorted(Path(args.html_dir).rglob("*")):
+            if path.suffix.lower() in (".html", ".htm"):
+                pages.append((str(path), path.read_text(errors="replace")))
+    if args.page_cache:
+        cache_dir = ScraperConfig().page_cache_dir
+        for path in sorted(cache_dir.glob("*.json.gz")) if cache_dir.is_dir() else []:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            pages.append((entry["url"], entry["html"]))
+    if not pages:
+        rng = random.Random(args.seed)
+        pages = [
+            (f"synthetic-{i}", synthetic_page(rng, args.paragraphs, args.depth))
+            for i in range(args.pages)
+        ]
+    return pages
+
+
+def timed(engine: Callable[[str], str], html: str) -> Tuple[float, str]:
+    start = time.perf_counter()
+    try:
+        result = engine(html)
+    except ValueError as e:  # e.g. no indexable words on the page
+        result = f"ValueError: {e}"
+    return time.perf_counter() - start, result
+
+
+def run(args: argparse.Namespace):
+    warnings.filterwarnings("ignore")  # bs4 deprecation notices
+    pages = load_corpus(args)
+    reference, lxml_cleaner = ContentCleaner(), LxmlContentCleaner()
+    engines = {
+        "beautifulsoup": lambda html: str(
+            reference.clean(BeautifulSoup(html, "html.parser"))
+        ),
+        "lxml": lambda html: str(lxml_cleaner.clean_html(html)),
+    }
+    seconds = dict.fromkeys(engines, 0.0)
+    mismatches = []
+    for name, html in pages:
+        outputs = {}
+        for engine, clean in engines.items():
+            elapsed, outputs[engine] = timed(clean, html)
+            seconds[engine] += elapsed
+        if len(set(outputs.values())) > 1:
+            mismatches.append(name)
+
+    print(f"{len(pages)} pages, {sum(len(html) for _, html in pages) / 1e6:.1f} MB")
+    print(f"{'engine':<16}{'seconds':>10}{'pages/s':>10}{'speedup':>10}")
+    for engine, total in seconds.items():
+        print(
+            f"{engine:<16}{total:>10.2f}{len(pages) / total:>10.1f}"
+            f"{seconds['beautifulsoup'] / total:>10.2f}"
+        )
+    print(f"{len(mismatches)} pages with different output")
+    for name in mismatches[:10]:
+        print(f"  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--html-dir", help="directory of saved HTML pages")
+    parser.add_argument(
+        "--no-page-cache",
+        dest="page_cache",
+        action="store_false",
+        help="do not add the pages saved in the scraper's page cache",
+    )
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
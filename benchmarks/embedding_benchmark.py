@@ -0,0 +1,88 @@
+# embedding_benchmark.py
+"""
+Throughput benchmark for the embedding backends in embedding_config_dict.
+
+Usage:
+    python -m benchmarks.embedding_benchmark --texts 2000 --models local/hashing-projection ollama/nomic-embed-text
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from config.config import embedding_config_dict
+from services.embedding_service import instantiate_embeddings
+
+WORDS = (
+    "agent graph retrieval index vector query document chunk model token cache "
+    "memory latency throughput batch embedding search context answer source page "
+    "supervisor tool stream parse split score rank fuse quantize store"
+).split()
+
+
+def synthetic_texts(n_texts: int, words_per_text: int, seed: int) -> list:
+    """Random word sequences roughly the length of a default-sized chunk."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(WORDS, k=words_per_text)) + f" item-{i}"
+        for i in range(n_texts)
+    ]
+
+
+def run(args: argparse.Namespace):
+    texts = synthetic_texts(args.texts, args.words, args.seed)
+    print(f"{args.texts} texts of {args.words} words, batch size {args.batch_size}")
+    print(f"{'backend':<40}{'fit s':>10}{'texts/s':>12}{'dims':>8}")
+    for name in args.models:
+        provider, model_name = name.split("/", 1)
+        config = embedding_config_dict[provider][model_name]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if "model_path" in config.params:
+                # Never overwrite the model fitted for the app
+                config = config.model_copy(
+                    update={
+                        "params": {
+                            **config.params,
+                            "model_path": Path(tmp_dir) / "model.joblib",
+                        }
+                    }
+                )
+            try:
+                embeddings = instantiate_embeddings(config)
+                fit_seconds = 0.0
+                if getattr(embeddings, "requires_fit", False):
+                    start = time.perf_counter()
+                    embeddings.fit(texts)
+                    fit_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                dims = 0
+                for i in range(0, len(texts), args.batch_size):
+                    vectors = embeddings.embed_documents(texts[i : i + args.batch_size])
+                    dims = len(vectors[0])
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"{name:<40}  failed: {e}")
+                continue
+        print(f"{name:<40}{fit_seconds:>10.2f}{len(texts) / elapsed:>12.1f}{dims:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--texts", type=int, default=2_000)
+    parser.add_argument("--words", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=[f"local/{name}" for name in embedding_config_dict["local"]],
+        help="provider/model pairs from embedding_config_dict",
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
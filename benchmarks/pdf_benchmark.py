@@ -0,0 +1,87 @@
+# pdf_benchmark.py
+"""
+Pages-per-second benchmark for page-parallel PDF extraction against core count.
+
+Usage:
+    python -m benchmarks.pdf_benchmark --pages 2000 --workers 1 2 4 8
+    python -m benchmarks.pdf_benchmark --pdf path/to/large.pdf
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pymupdf
+
+from services.pdf_service import ParallelPyMuPDFLoader
+
+WORDS = (
+    "agent graph retrieval index vector query document chunk model token cache "
+    "memory latency throughput batch embedding search context answer source page"
+).split()
+
+
+def synthetic_pdf(path: str, n_pages: int, lines_per_page: int, seed: int):
+    """Write a text-only PDF with n_pages pages of random words."""
+    rng = random.Random(seed)
+    pdf = pymupdf.open()
+    for number in range(n_pages):
+        page = pdf.new_page()
+        text = "\n".join(
+            " ".join(rng.choices(WORDS, k=12)) for _ in range(lines_per_page)
+        )
+        page.insert_text((50, 50), f"Page {number}\n{text}", fontsize=9)
+    pdf.save(path)
+    pdf.close()
+
+
+def run(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+            synthetic_pdf(pdf_path, args.pages, args.lines, args.seed)
+
+        print(f"{pdf_path}, {os.cpu_count()} cores available")
+        print(
+            f"{'workers':<10}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'speedup':>10}"
+        )
+        baseline = None
+        for workers in args.workers:
+            loader = ParallelPyMuPDFLoader(
+                pdf_path,
+                max_workers=workers,
+                min_pages_per_worker=args.min_pages_per_worker,
+            )
+            start = time.perf_counter()
+            pages = sum(1 for _ in loader.lazy_load())
+            elapsed = time.perf_counter() - start
+            rate = pages / elapsed
+            baseline = baseline or rate
+            print(
+                f"{workers:<10}{pages:>8}{elapsed:>10.2f}{rate:>10.1f}{rate / baseline:>10.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--pdf", help="PDF to extract; a synthetic one is generated if omitted"
+    )
+    parser.add_argument("--pages", type=int, default=2_000)
+    parser.add_argument("--lines", type=int, default=60)
+    parser.add_argument("--min-pages-per-worker", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
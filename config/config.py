@@ -3,15 +3,20 @@
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from langchain_ollama import OllamaEmbeddings
 from langchain_ollama.chat_models import ChatOllama
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from pydantic import BaseModel, HttpUrl
 
+from services.embedding_service import HashingProjectionEmbeddings, TfidfSvdEmbeddings
+
 # Constants
 AGENT_SUPERVISOR = "supervisor"
 FINISH = "FINISH"
 ROUTE_NAME = "route"
 SAMPLE_AGENT_CONFIG = Path().absolute() / "config" / "sample_agent_config.json"
+CACHE_DIR = Path().absolute() / ".cache"
+UPLOAD_DIR = CACHE_DIR / "uploads"
 
 
 class Role(BaseModel):
@@ -39,6 +44,78 @@ class URLConfig(BaseModel):
     url: HttpUrl
 
 
+class ScraperConfig(BaseModel):
+    browser_pool_size: int = 4  # concurrent warm browser contexts
+    browser_max_pages_per_context: int = 50  # recycle contexts after this many pages
+    user_agent: str = "YourBot/1.0 (+https://yourwebsite.com/bot)"
+    static_fetch_enabled: bool = True  # try a plain GET before the browser
+    static_fetch_timeout_seconds: float = 10
+    js_min_text_chars: int = 200  # less visible text than this needs the browser
+    js_min_text_ratio: float = 0.02  # text-to-markup ratio below this needs the browser
+    page_cache_enabled: bool = True
+    page_cache_dir: Path = CACHE_DIR / "pages"
+    page_cache_ttl_seconds: int = 3600  # served without network access until then
+    page_cache_max_bytes: int = 256 * 1024**2
+    crawl_enabled: bool = False  # follow same-site links from the given URL
+    crawl_max_depth: int = 2  # link hops from the start URL
+    crawl_max_pages: int = 50
+    crawl_max_concurrency: int = 4  # pages rendered at once
+    crawl_max_retries: int = 3  # per page, after 429 or 503
+    host_requests_per_second: float = 2.0  # per-host token bucket rate
+    host_burst: int = 4  # per-host token bucket size
+    sitemap_enabled: bool = False  # ingest the pages listed in the site's sitemaps
+    sitemap_max_urls: int = 10_000
+    crawl_ledger_path: Path = CACHE_DIR / "crawl_ledger.sqlite3"
+    # A text block seen on this many other pages of a domain is boilerplate
+    site_template_min_other_pages: int = 2
+
+
+class RagConfig(BaseModel):
+    chunk_size: int = 300
+    chunk_overlap: int = 0
+    section_chunk_size: Optional[int] = 1200  # None splits web sections like files
+    embedding_provider: str = "openai"
+    embedding_model: str = "text-embedding-3-small"
+    embedding_fit_sample_size: int = 20_000  # chunks used to fit local models
+    loader_max_workers: int = 1  # parser processes; above 1 opts in to a pool
+    loader_timeout_seconds: Optional[float] = 300  # per file, in parallel mode
+    csv_rows_per_document: int = 100  # CSV rows grouped into one document
+    document_cache_enabled: bool = True
+    document_cache_dir: Path = CACHE_DIR / "documents"
+    document_cache_max_bytes: int = 512 * 1024**2
+    index_cache_dir: Path = CACHE_DIR / "faiss_indexes"
+    index_cache_max_bytes: int = 1024**3  # 1 GiB across all cached indexes
+    index_store_dir: Path = CACHE_DIR / "faiss_working"
+    vector_store: str = "faiss"  # faiss, or mmap for a shared quantized store
+    mmap_store_dir: Path = CACHE_DIR / "mmap_indexes"
+    mmap_dtype: str = "float16"  # float16 or int8
+    ann_recall_target: float = 0.95
+    ann_flat_max_vectors: int = 20_000
+    ann_pq_min_vectors: int = 1_000_000
+    retrieval_mode: str = "hybrid"  # dense, sparse, hybrid or auto
+    retrieval_k: int = 4
+    retrieval_candidates: int = 20
+    batch_max_concurrency: int = 4
+    mmr_lambda: Optional[float] = 0.7  # None keeps the plain top-k
+    merge_adjacent_chunks: bool = True
+    context_token_budget: Optional[int] = 1200
+    query_cache_enabled: bool = True
+    query_cache_max_entries: int = 1024
+    query_cache_ttl_seconds: float = 3600
+    # Opt-in semantic tier: a cosine similarity (e.g. 0.95) at which a paraphrased
+    # question reuses a cached answer. None matches exact questions only.
+    query_cache_semantic_threshold: Optional[float] = None
+    dedup_enabled: bool = False  # drop near-duplicate chunks before embedding
+    dedup_threshold: float = 0.9  # estimated Jaccard similarity of word 3-grams
+    dedup_num_perm: int = 128
+    ingestion_batch_size: int = 64
+    ingestion_queue_size: int = 4
+    embedding_cache_path: Path = CACHE_DIR / "embeddings.sqlite3"
+    embedding_batch_size: int = 256
+    embedding_max_concurrency: int = 4
+    scraper: ScraperConfig = ScraperConfig()
+
+
 class ModelConfig(BaseModel):
     model_company: str
     model_name: str
@@ -50,6 +127,16 @@ class ModelConfig(BaseModel):
         protected_namespaces = ()
 
 
+class EmbeddingConfig(BaseModel):
+    provider: str
+    model_name: str
+    embedding_class: Any
+    params: Dict[str, Any] = {}
+
+    class Config:
+        protected_namespaces = ()
+
+
 # Configuration for models with direct class references
 model_config_dict: Dict = {
     "openai": {
@@ -81,3 +168,45 @@ model_config_dict: Dict = {
         ),
     },
 }
+
+# Embedding backends, selectable per run next to the chat models above
+embedding_config_dict: Dict = {
+    "openai": {
+        "text-embedding-3-small": EmbeddingConfig(
+            provider="openai",
+            model_name="text-embedding-3-small",
+            embedding_class=OpenAIEmbeddings,
+        ),
+        "text-embedding-3-large": EmbeddingConfig(
+            provider="openai",
+            model_name="text-embedding-3-large",
+            embedding_class=OpenAIEmbeddings,
+        ),
+    },
+    "ollama": {
+        "nomic-embed-text": EmbeddingConfig(
+            provider="ollama",
+            model_name="nomic-embed-text",
+            embedding_class=OllamaEmbeddings,
+        ),
+        "mxbai-embed-large": EmbeddingConfig(
+            provider="ollama",
+            model_name="mxbai-embed-large",
+            embedding_class=OllamaEmbeddings,
+        ),
+    },
+    "local": {
+        "hashing-projection": EmbeddingConfig(
+            provider="local",
+            model_name="hashing-projection",
+            embedding_class=HashingProjectionEmbeddings,
+            params={"dimensions": 384},
+        ),
+        "tfidf-svd": EmbeddingConfig(
+            provider="local",
+            model_name="tfidf-svd",
+            embedding_class=TfidfSvdEmbeddings,
+            params={"model_path": CACHE_DIR / "tfidf_svd.joblib", "dimensions": 256},
+        ),
+    },
+}
@@ -13,8 +13,8 @@ from agents.agents import RoleBasedAgentModel, create_role_based_agents
 from agents.graph import create_graph
 from agents.rag import setup_rag_chain
 from agents.supervisor import create_team_supervisor
-from agents.tools import RagTool
-from config.config import FileUploadConfig
+from agents.tools import BatchRagTool, RagTool
+from config.config import FileUploadConfig, RagConfig
 from core.execution import execute_graph
 
 
@@ -27,8 +27,10 @@ class App:
         file_config: Optional[FileUploadConfig] = None,
         url: Optional[str] = None,
         langfuse_handler: Optional[CallbackHandler] = None,
+        rag_config: Optional[RagConfig] = None,
         agent_factory=create_role_based_agents,
         rag_tool_factory=RagTool,
+        batch_rag_tool_factory=BatchRagTool,
         supervisor_factory=create_team_supervisor,
         graph_factory=create_graph,
     ):
@@ -39,8 +41,10 @@ class App:
         self.file_config = file_config
         self.url = url
         self.langfuse_handler = langfuse_handler
+        self.rag_config = rag_config
         self.agent_factory = agent_factory
         self.rag_tool_factory = rag_tool_factory
+        self.batch_rag_tool_factory = batch_rag_tool_factory
         self.supervisor_factory = supervisor_factory
         self.graph_factory = graph_factory
         self._graph: CompiledStateGraph = None
@@ -94,10 +98,12 @@ class App:
             files_path_list=getattr(self.file_config, "files", None),
             url=self.url,
             llm=self.llm,
+            rag_config=self.rag_config,
         )
         rag_tool = self.rag_tool_factory(rag_chain=rag_chain)
+        batch_rag_tool = self.batch_rag_tool_factory(rag_chain=rag_chain)
         agents: List[RoleBasedAgentModel] = self.agent_factory(
-            self.llm, [rag_tool], self.agent_config["roles"]
+            self.llm, [rag_tool, batch_rag_tool], self.agent_config["roles"]
         )
         return agents
 
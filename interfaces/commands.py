@@ -81,6 +81,7 @@ class GenerateAgentsCommand(Command):
         documents = get_documents(
             getattr(self.context["file_upload_config"], "files", None),
             self.context["url"],
+            self.context["rag_config"],
         )
         generated_config = generate_config_json(self.context["llm"], documents)
         if not generated_config:
@@ -149,6 +150,7 @@ class RunConfigCommand(Command):
                 file_config=self.context["file_upload_config"],
                 url=self.context["url"],
                 langfuse_handler=self.context["langfuse_handler"],
+                rag_config=self.context["rag_config"],
             )
             messages = app.execute_graph(message_placeholder)
             with st.chat_message("assistant"):
@@ -204,6 +206,7 @@ class VisualizeGraphCommand(Command):
                 file_config=self.context["file_upload_config"],
                 url=self.context["url"],
                 langfuse_handler=self.context["langfuse_handler"],
+                rag_config=self.context["rag_config"],
             )
             graph_image = app.visualise_graph()
             img_byte_arr = io.BytesIO()
@@ -330,6 +333,7 @@ def process_command(command: str, session_state: Dict[str, Any]):
         "config_json": session_state.get("config_json"),
         "recursion_limit": session_state.recursion_limit,
         "langfuse_handler": session_state.langfuse_handler,
+        "rag_config": session_state.get("rag_config"),
         "scenario": session_state.get("scenario", ""),
     }
     handle_command(command, context)
@@ -5,11 +5,16 @@ import random
 import streamlit as st
 from PIL import Image
 
-from config.config import FileUploadConfig, model_config_dict
+from config.config import (
+    FileUploadConfig,
+    RagConfig,
+    embedding_config_dict,
+    model_config_dict,
+)
 from interfaces.commands import process_command
 from services.langfuse_service import handle_langfuse_integration
 from services.model_service import ensure_api_key_is_set, instantiate_llm
-from utilities.file_utils import save_uploaded_file
+from utilities.file_utils import get_upload_store, save_uploaded_file
 
 
 def layout_streamlit_ui():
@@ -59,6 +64,16 @@ def display_model_config():
         )
         if api_key:
             st.session_state.llm = instantiate_llm(selected_model_config, api_key)
+        embedding_provider = st.selectbox(
+            "Select embedding provider:", list(embedding_config_dict.keys())
+        )
+        embedding_model = st.selectbox(
+            "Select embedding model:",
+            list(embedding_config_dict[embedding_provider].keys()),
+        )
+        st.session_state.rag_config = RagConfig(
+            embedding_provider=embedding_provider, embedding_model=embedding_model
+        )
 
 
 def display_file_and_url_inputs():
@@ -90,12 +105,15 @@ def handle_file_uploads():
             "Upload Files",
             accept_multiple_files=True,
             type=st.session_state.get(
-                "allowed_file_types", ["pdf", "csv", "md", "epub", "json", "xml", "txt"]
+                "allowed_file_types",
+                ["pdf", "csv", "md", "epub", "json", "jsonl", "xml", "txt"],
             ),
             key=st.session_state.file_uploader_key,
         )
-        if uploaded_files:
-            file_paths = [str(save_uploaded_file(file)) for file in uploaded_files]
+        file_paths = [str(save_uploaded_file(file)) for file in uploaded_files or []]
+        # Keeps this session's uploads alive and lets unreferenced ones be collected
+        get_upload_store().set_session_files(st.session_state.session_id, file_paths)
+        if file_paths:
             st.session_state.file_upload_config = FileUploadConfig(files=file_paths)
         else:
             st.session_state.file_upload_config = None
@@ -144,6 +162,8 @@ def display_chat_widget():
 
 def clear_session_state():
     """Clear all session state variables and cache."""
+    if "session_id" in st.session_state:
+        get_upload_store().set_session_files(st.session_state.session_id, [])
     for key in list(st.session_state.keys()):
         del st.session_state[key]
     st.cache_data.clear()
@@ -0,0 +1,278 @@
+# ann_index_service.py
+
+import logging
+import math
+import time
+from typing import Callable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+INDEX_TYPES = ["flat", "ivf", "hnsw", "ivfpq"]
+
+# Largest efSearch tried for HNSW, and re-ranking depths tried for IVF-PQ
+HNSW_MAX_EF_SEARCH = 4096
+PQ_REFINE_K_FACTORS = (4, 16, 64, 256)
+
+
+class RecallSample:
+    """
+    Held-out queries for measuring recall@k against the exact k nearest
+    neighbours. Without explicit queries, corpus vectors are used and each one's
+    own entry is left out of both the expected and the returned neighbours.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        k: int = 4,
+        size: int = 1000,
+        seed: int = 0,
+        queries: Optional[np.ndarray] = None,
+    ):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if queries is None:
+            rng = np.random.default_rng(seed)
+            self.ids = rng.choice(
+                len(vectors), size=min(size, len(vectors)), replace=False
+            )
+            self.queries = vectors[self.ids]
+            self.k = max(1, min(k, len(vectors) - 1))
+        else:
+            self.ids = np.full(len(queries), -1)
+            self.queries = np.ascontiguousarray(queries, dtype=np.float32)
+            self.k = max(1, min(k, len(vectors)))
+        start = time.perf_counter()
+        _, neighbours = faiss.knn(self.queries, vectors, self.k + 1)
+        # Exhaustive search time, the cost an ANN index has to beat
+        self.exact_seconds = time.perf_counter() - start
+        self.expected = self._without_self(neighbours)
+
+    def _without_self(self, neighbours: np.ndarray) -> List[set]:
+        return [
+            set([int(i) for i in row if i != query_id][: self.k])
+            for row, query_id in zip(neighbours, self.ids)
+        ]
+
+    def measure(self, index: faiss.Index) -> Tuple[float, float]:
+        """Recall@k of index on the sample and the seconds the search took."""
+        start = time.perf_counter()
+        _, neighbours = index.search(self.queries, self.k + 1)
+        seconds = time.perf_counter() - start
+        found = self._without_self(neighbours)
+        hits = sum(len(f & e) for f, e in zip(found, self.expected))
+        return hits / max(1, sum(len(e) for e in self.expected)), seconds
+
+    def lower_bound(self, recall: float) -> float:
+        """
+        One-sided 95% lower confidence bound on the recall over unseen queries,
+        so parameters tuned to just pass on the sample still meet the target.
+        """
+        n = max(1, sum(len(e) for e in self.expected))
+        return recall - 1.645 * math.sqrt(recall * (1 - recall) / n)
+
+
+def candidate_index_types(
+    n_vectors: int,
+    recall_target: float = 0.95,
+    flat_max_vectors: int = 20_000,
+    pq_min_vectors: int = 1_000_000,
+) -> List[str]:
+    """
+    ANN index types worth trying for a corpus, cheapest to build first. An empty
+    list means exact search: the corpus is small or exact recall is required.
+    """
+    if n_vectors <= flat_max_vectors or recall_target >= 1.0:
+        return []
+    if n_vectors >= pq_min_vectors:
+        return ["ivfpq", "ivf", "hnsw"]
+    return ["ivf", "hnsw"]
+
+
+def _smallest_passing(
+    low: int, high: int, recall_at: Callable[[int], float], recall_target: float
+) -> Optional[int]:
+    """
+    Smallest value in [low, high] whose recall meets the target, assuming recall
+    grows with it: doubling from low, then bisecting the last step.
+    """
+    passing = low
+    while recall_at(passing) < recall_target:
+        if passing >= high:
+            return None
+        low, passing = passing + 1, min(high, passing * 2)
+    while low < passing:
+        middle = (low + passing) // 2
+        if recall_at(middle) >= recall_target:
+            passing = middle
+        else:
+            low = middle + 1
+    return passing
+
+
+def calibrate_index(
+    index_type: str, index: faiss.Index, sample: RecallSample, recall_target: float
+) -> faiss.Index:
+    """
+    Set the cheapest search parameters (nprobe, efSearch, re-ranking depth) at
+    which the index reaches the recall target on the sample, or the most
+    thorough ones if it cannot.
+    """
+
+    def recall_with(apply: Callable[[int], None]) -> Callable[[int], float]:
+        def recall_at(value: int) -> float:
+            apply(value)
+            return sample.lower_bound(sample.measure(index)[0])
+
+        return recall_at
+
+    if index_type == "hnsw":
+
+        def set_ef_search(value: int):
+            index.hnsw.efSearch = value
+
+        ef_search = _smallest_passing(
+            max(16, sample.k + 1),
+            HNSW_MAX_EF_SEARCH,
+            recall_with(set_ef_search),
+            recall_target,
+        )
+        set_ef_search(ef_search or HNSW_MAX_EF_SEARCH)
+    elif index_type in ("ivf", "ivfpq"):
+        ivf = faiss.extract_index_ivf(index)
+
+        def set_nprobe(value: int):
+            ivf.nprobe = value
+
+        k_factors = PQ_REFINE_K_FACTORS if index_type == "ivfpq" else (None,)
+        for k_factor in k_factors:
+            if k_factor is not None:
+                index.k_factor = k_factor
+            nprobe = _smallest_passing(
+                1, ivf.nlist, recall_with(set_nprobe), recall_target
+            )
+            if nprobe is not None:
+                break
+        set_nprobe(nprobe or ivf.nlist)
+    return index
+
+
+def build_faiss_index(
+    index_type: str,
+    vectors: np.ndarray,
+    recall_target: float = 0.95,
+    sample: Optional[RecallSample] = None,
+    k: int = 4,
+) -> faiss.Index:
+    """
+    Build, train and fill a FAISS index of the given type with L2 distance, and
+    calibrate its search parameters to the recall target on a held-out sample.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, 32)
+        index.hnsw.efConstruction = 80
+    elif index_type in ("ivf", "ivfpq"):
+        # ~4 * sqrt(n) lists, with at least 39 training points per centroid
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            ivfpq = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8)
+            # PQ distances alone cap recall far below typical targets, so the
+            # best candidates are re-ranked on float16 copies, half the size of
+            # the float32 vectors a flat refine index would keep (8-bit codes
+            # stall below a 0.98 target)
+            refine = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+            index = faiss.IndexRefine(ivfpq, refine)
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unsupported index type: {index_type}")
+
+    index.add(vectors)
+    if index_type == "ivf":
+        # Lets post-retrieval stages reconstruct chunk vectors by position
+        index.make_direct_map()
+    if index_type != "flat":
+        calibrate_index(
+            index_type, index, sample or RecallSample(vectors, k), recall_target
+        )
+    return index
+
+
+def select_faiss_index(
+    vectors: np.ndarray,
+    recall_target: float = 0.95,
+    flat_max_vectors: int = 20_000,
+    pq_min_vectors: int = 1_000_000,
+    k: int = 4,
+) -> Tuple[str, faiss.Index]:
+    """
+    Build the first candidate index type that reaches the recall target on a
+    held-out sample while searching faster than exact search, or a flat index
+    if none does.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    candidates = candidate_index_types(
+        len(vectors), recall_target, flat_max_vectors, pq_min_vectors
+    )
+    sample = RecallSample(vectors, k) if candidates else None
+    for index_type in candidates:
+        index = build_faiss_index(index_type, vectors, recall_target, sample, k)
+        recall, seconds = sample.measure(index)
+        logging.info(
+            f"{index_type} index: recall@{sample.k} {recall:.3f} in {seconds:.3f}s "
+            f"on {len(sample.ids)} held-out queries (exact search "
+            f"{sample.exact_seconds:.3f}s)"
+        )
+        passes = sample.lower_bound(recall) >= recall_target
+        if passes and seconds < sample.exact_seconds:
+            return index_type, index
+    return "flat", build_faiss_index("flat", vectors)
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest sub-quantizer count <= dim / 8 that divides dim, so each code covers >= 8 dims."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def to_ann_vectorstore(
+    vectorstore: FAISS,
+    recall_target: float,
+    flat_max_vectors: int = 20_000,
+    pq_min_vectors: int = 1_000_000,
+    k: int = 4,
+) -> FAISS:
+    """
+    Rebuild a flat FAISS vector store on the index type that meets the recall
+    target for k neighbours. Vectors are reconstructed from the flat index, so no
+    embedding calls are made.
+    """
+    flat_index = vectorstore.index
+    if not candidate_index_types(
+        flat_index.ntotal, recall_target, flat_max_vectors, pq_min_vectors
+    ):
+        logging.info(f"Using flat index for {flat_index.ntotal} chunks")
+        return vectorstore
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+    index_type, index = select_faiss_index(
+        vectors, recall_target, flat_max_vectors, pq_min_vectors, k
+    )
+    logging.info(f"Using {index_type} index for {flat_index.ntotal} chunks")
+    if index_type == "flat":
+        return vectorstore
+    return FAISS(
+        embedding_function=vectorstore.embedding_function,
+        index=index,
+        docstore=vectorstore.docstore,
+        index_to_docstore_id=dict(vectorstore.index_to_docstore_id),
+    )
@@ -0,0 +1,83 @@
+# bm25_service.py
+
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Words, plus compound identifiers such as "v1.2", "user-001" or "a/b.py"
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/:]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase tokens; compound identifiers are kept whole and also split into parts."""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(re.findall(r"[^\W_]+", match))
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a compact scipy inverted index.
+
+    Per-term BM25 weights are precomputed into a term-major (CSC) sparse matrix,
+    so scoring a query is a sum over the posting columns of its terms.
+    """
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        counts: List[int] = []
+        for text in texts:
+            term_counts: Dict[int, int] = {}
+            for token in tokenize(text):
+                term_id = self.vocabulary.setdefault(token, len(self.vocabulary))
+                term_counts[term_id] = term_counts.get(term_id, 0) + 1
+            indices.extend(term_counts.keys())
+            counts.extend(term_counts.values())
+            indptr.append(len(indices))
+
+        self.n_docs = len(texts)
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), indices, indptr),
+            shape=(self.n_docs, max(1, len(self.vocabulary))),
+        )
+        doc_lengths = np.asarray(tf.sum(axis=1)).ravel()
+        avg_length = doc_lengths.mean() if self.n_docs else 0.0
+        doc_freq = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log1p((self.n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(
+            np.float32
+        )
+
+        # BM25 term saturation, computed on the stored non-zeros only
+        row_norm = k1 * (1 - b + b * doc_lengths / max(avg_length, 1e-9))
+        rows = np.repeat(np.arange(self.n_docs), np.diff(tf.indptr))
+        data = tf.data * (k1 + 1) / (tf.data + row_norm[rows])
+        data *= idf[tf.indices]
+        self.weights = sparse.csr_matrix(
+            (data.astype(np.float32), tf.indices, tf.indptr), shape=tf.shape
+        ).tocsc()
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query."""
+        term_ids = [
+            self.vocabulary[t] for t in set(tokenize(query)) if t in self.vocabulary
+        ]
+        if not term_ids:
+            return np.zeros(self.n_docs, dtype=np.float32)
+        return np.asarray(self.weights[:, term_ids].sum(axis=1)).ravel()
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the positions and scores of the top-k matching documents, best first."""
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
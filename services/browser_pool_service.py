@@ -0,0 +1,194 @@
+# browser_pool_service.py
+
+import asyncio
+import atexit
+import inspect
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+from undetected_playwright import Malenia
+
+DEFAULT_USER_AGENT = "YourBot/1.0 (+https://yourwebsite.com/bot)"
+
+T = TypeVar("T")
+
+
+class _ContextSlot:
+    def __init__(self):
+        self.context: Optional[BrowserContext] = None
+        self.pages_served = 0
+
+
+class BrowserPool:
+    """
+    Long-lived pool of warm Chromium browser contexts shared across threads.
+
+    Playwright objects are bound to the event loop that created them, so the
+    pool owns one background thread running an asyncio loop with a single
+    browser. Callers on any thread submit work with run() or render(); up to
+    `size` pages are rendered concurrently, each in its own context. Contexts
+    are recycled after max_pages_per_context pages and replaced when they
+    fail, and the browser is relaunched if it disconnects.
+    """
+
+    def __init__(
+        self,
+        size: int = 4,
+        max_pages_per_context: int = 50,
+        user_agent: str = DEFAULT_USER_AGENT,
+        headless: bool = True,
+    ):
+        self.size = max(1, size)
+        self.max_pages_per_context = max(1, max_pages_per_context)
+        self.user_agent = user_agent
+        self.headless = headless
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="browser-pool", daemon=True
+        )
+        self._thread.start()
+        self._slots: asyncio.Queue = self._call(self._create_slots())
+        self._browser_lock = asyncio.Lock()
+        self._closed = False
+        self._stats = {"pages": 0, "contexts_created": 0, "browser_launches": 0}
+
+    def _call(self, coroutine: Awaitable[T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _create_slots(self) -> asyncio.Queue:
+        slots: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.size):
+            slots.put_nowait(_ContextSlot())
+        return slots
+
+    def schedule(self, coroutine: Awaitable[T]) -> "Future[T]":
+        """Run a coroutine on the pool's event loop, e.g. one that calls with_page()."""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def submit(self, work: Callable[[Page], Awaitable[T]]) -> "Future[T]":
+        """Schedule work(page) on a pooled page from any thread."""
+        return self.schedule(self.with_page(work))
+
+    def run(self, work: Callable[[Page], Awaitable[T]]) -> T:
+        """Run work(page) on a pooled page and wait for its result."""
+        return self.submit(work).result()
+
+    def render(self, url: str, timeout: int = 30000) -> str:
+        """Navigate to url, wait for the network to settle and return the rendered HTML."""
+
+        async def render_page(page: Page) -> str:
+            logging.info(f"Navigating to {url}")
+            try:
+                await page.goto(url, timeout=timeout)
+                await page.wait_for_load_state("networkidle", timeout=timeout)
+            except PlaywrightTimeoutError:
+                logging.warning(f"Timeout occurred while loading {url}")
+            return await page.content()
+
+        return self.run(render_page)
+
+    async def with_page(self, work: Callable[[Page], Awaitable[T]]) -> T:
+        """Coroutine form of run(); must be awaited on the pool's event loop."""
+        slot: _ContextSlot = await self._slots.get()
+        healthy = True
+        try:
+            if slot.context is None:
+                slot.context = await self._new_context()
+                slot.pages_served = 0
+            page = await slot.context.new_page()
+            try:
+                return await work(page)
+            finally:
+                slot.pages_served += 1
+                self._stats["pages"] += 1
+                await page.close()
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            if not healthy or slot.pages_served >= self.max_pages_per_context:
+                await self._close_context(slot)
+            self._slots.put_nowait(slot)
+
+    async def _new_context(self) -> BrowserContext:
+        browser = await self._ensure_browser()
+        context = await browser.new_context(user_agent=self.user_agent)
+        stealth = Malenia.apply_stealth(context)
+        if inspect.isawaitable(stealth):
+            await stealth
+        self._stats["contexts_created"] += 1
+        return context
+
+    async def _close_context(self, slot: _ContextSlot):
+        context, slot.context, slot.pages_served = slot.context, None, 0
+        if context is not None:
+            try:
+                await context.close()
+            except Exception as e:
+                logging.debug(f"Ignoring error while closing browser context: {e}")
+
+    async def _ensure_browser(self) -> Browser:
+        """Health check: (re)launch the browser if it is missing or disconnected."""
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                logging.warning("Pooled browser disconnected, relaunching")
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            logging.info("Launching pooled browser")
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless
+            )
+            self._stats["browser_launches"] += 1
+            return self._browser
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "size": self.size}
+
+    def close(self):
+        """Close every context, the browser and the pool's event loop."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._call(self._shutdown())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    async def _shutdown(self):
+        while not self._slots.empty():
+            await self._close_context(self._slots.get_nowait())
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+
+_browser_pools: Dict[Tuple, BrowserPool] = {}
+_browser_pools_lock = threading.Lock()
+
+
+def get_browser_pool(
+    size: int = 4,
+    max_pages_per_context: int = 50,
+    user_agent: str = DEFAULT_USER_AGENT,
+) -> BrowserPool:
+    """Return the process-wide browser pool for these settings, creating it on first use."""
+    key = (size, max_pages_per_context, user_agent)
+    with _browser_pools_lock:
+        if key not in _browser_pools:
+            pool = BrowserPool(size, max_pages_per_context, user_agent)
+            atexit.register(pool.close)
+            _browser_pools[key] = pool
+        return _browser_pools[key]
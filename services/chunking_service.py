@@ -0,0 +1,51 @@
+# chunking_service.py
+
+from typing import Any, Iterable, List
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+class SectionTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Splitter that respects the section boundaries of scraped pages.
+
+    Documents with a "section_start" offset are sections of a page. Sections up
+    to section_chunk_size characters become a single chunk, and longer ones are
+    split into chunks of up to that size, never across sections. Their
+    start_index is offset into the page, so neighbouring chunks of one page can
+    still be merged. Other documents are split with chunk_size as usual.
+    """
+
+    def __init__(self, section_chunk_size: int, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.section_chunk_size = max(section_chunk_size, self._chunk_size)
+        self._section_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.section_chunk_size,
+            chunk_overlap=min(self._chunk_overlap, self.section_chunk_size // 2),
+            add_start_index=True,
+        )
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        chunks: List[Document] = []
+        for document in documents:
+            section_start = document.metadata.get("section_start")
+            if section_start is None:
+                chunks.extend(super().split_documents([document]))
+                continue
+            if len(document.page_content) <= self.section_chunk_size:
+                sections = [
+                    Document(
+                        page_content=document.page_content,
+                        metadata={**document.metadata, "start_index": 0},
+                    )
+                ]
+            else:
+                sections = self._section_splitter.split_documents([document])
+            for section in sections:
+                if self._add_start_index:
+                    section.metadata["start_index"] += section_start
+                else:
+                    del section.metadata["start_index"]
+                chunks.append(section)
+        return chunks
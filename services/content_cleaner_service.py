@@ -0,0 +1,668 @@
+# content_cleaner_service.py
+
+import itertools
+import logging
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import lxml.html
+import numpy as np
+from bs4 import BeautifulSoup, Comment, Tag
+from bs4.builder import HTMLTreeBuilder
+from lxml import etree
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_PATTERN = re.compile(r"\w+[.!?]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+CANDIDATE_TAGS = ("div", "article", "main", "section")
+# Elements whose own header and footer belong to their content, not the site's
+SECTIONING_TAGS = frozenset(("article", "main", "section"))
+# Text blocks the site template matches when cleaning whole pages
+TEMPLATE_BLOCK_TAGS = (
+    "p",
+    "li",
+    "dd",
+    "dt",
+    "td",
+    "th",
+    "blockquote",
+    "pre",
+    "figcaption",
+    "address",
+    "div",
+)
+PRESERVE_WHITESPACE_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+
+
+def dom_step(tag: Tag) -> str:
+    """One step of a DOM path: the tag name and its classes."""
+    classes = tag.get("class") or ()
+    if isinstance(classes, str):
+        classes = (classes,)
+    return tag.name + "".join(f".{name}" for name in classes)
+
+
+def dom_path(tag: Tag) -> int:
+    """Hash of the tag names and classes from the document root down to tag."""
+    path = 0
+    for element in reversed([tag, *tag.parents]):
+        if not isinstance(element, BeautifulSoup):
+            path = hash((path, dom_step(element)))
+    return path
+
+
+class SiteTemplate:
+    """
+    Paragraphs and DOM paths shared across the pages of one site.
+
+    For every paragraph text hash and DOM path hash the model keeps the IDs of
+    up to min_other_pages + 1 pages it was seen on, which is all it needs to
+    tell whether it also occurs on min_other_pages pages other than the one
+    being cleaned. Re-cleaning a page therefore never makes its own content
+    look like a template.
+    """
+
+    def __init__(
+        self,
+        min_other_pages: int = 2,
+        path_template_ratio: float = 0.5,
+        max_entries: int = 200_000,
+    ):
+        self.min_other_pages = max(1, min_other_pages)
+        self.path_template_ratio = path_template_ratio
+        self.max_entries = max_entries
+        self._paragraph_pages: Dict[int, Tuple[int, ...]] = {}
+        self._path_pages: Dict[int, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _is_shared(self, pages: Dict[int, Tuple[int, ...]], key: int, page: int):
+        seen = pages.get(key, ())
+        return len(seen) - (page in seen) >= self.min_other_pages
+
+    def _learn(self, pages: Dict[int, Tuple[int, ...]], keys: Iterable[int], page: int):
+        for key in keys:
+            seen = pages.get(key, ())
+            if page not in seen and len(seen) <= self.min_other_pages:
+                pages[key] = seen + (page,)
+        if len(pages) > self.max_entries:
+            # Content unique to one page is the bulk of the model and never matches
+            for key in [key for key, seen in pages.items() if len(seen) == 1]:
+                del pages[key]
+            # Otherwise forget the oldest entries down to half the limit
+            excess = max(0, len(pages) - self.max_entries // 2)
+            for key in list(itertools.islice(pages, excess)):
+                del pages[key]
+
+    def filter(self, url: str, paragraphs: List[str], paths: List[int]) -> List[str]:
+        """Drop the template paragraphs of a page (see shared()) and learn it."""
+        flags = self.shared(url, paragraphs, paths)
+        kept = [text for text, flag in zip(paragraphs, flags) if not flag]
+        if len(kept) < len(paragraphs):
+            logging.info(
+                f"Dropped {len(paragraphs) - len(kept)} template paragraphs from {url}"
+            )
+        return kept
+
+    def shared(self, url: str, paragraphs: List[str], paths: List[int]) -> List[bool]:
+        """
+        Flag paragraphs that also appear on other pages of the site, and every
+        paragraph at a DOM path that recurs across pages and on this page mostly
+        holds such paragraphs. Then learn the page.
+        """
+        page = hash(url)
+        hashes = [
+            hash(WHITESPACE_PATTERN.sub(" ", text).strip()) if text.strip() else None
+            for text in paragraphs
+        ]
+        with self._lock:
+            shared = [
+                h is not None and self._is_shared(self._paragraph_pages, h, page)
+                for h in hashes
+            ]
+            shared_by_path = defaultdict(list)
+            for h, path, is_shared in zip(hashes, paths, shared):
+                if h is not None:
+                    shared_by_path[path].append(is_shared)
+            template_paths = {
+                path
+                for path, flags in shared_by_path.items()
+                if sum(flags) > self.path_template_ratio * len(flags)
+                and self._is_shared(self._path_pages, path, page)
+            }
+            self._learn(
+                self._paragraph_pages, {h for h in hashes if h is not None}, page
+            )
+            self._learn(self._path_pages, shared_by_path, page)
+
+        return [
+            is_shared or (h is not None and path in template_paths)
+            for h, path, is_shared in zip(hashes, paths, shared)
+        ]
+
+
+class SiteTemplates:
+    """Per-domain SiteTemplate models, keeping the most recently used domains."""
+
+    def __init__(self, max_domains: int = 256, **template_params):
+        self.max_domains = max_domains
+        self.template_params = template_params
+        self._templates: "OrderedDict[str, SiteTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> SiteTemplate:
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            template = self._templates.get(domain)
+            if template is None:
+                template = self._templates[domain] = SiteTemplate(
+                    **self.template_params
+                )
+                while len(self._templates) > self.max_domains:
+                    self._templates.popitem(last=False)
+            self._templates.move_to_end(domain)
+            return template
+
+
+@lru_cache(maxsize=None)
+def get_site_templates(min_other_pages: int = 2) -> SiteTemplates:
+    """Return the process-wide site template models for a sharing threshold."""
+    return SiteTemplates(min_other_pages=min_other_pages)
+
+
+class ContentCleaner:
+    def __init__(self, site_templates: Optional[SiteTemplates] = None):
+        # Define common class names for ads and navigation elements
+        self.common_ad_classes = ["ad", "advertisement", "banner", "sponsored"]
+        self.common_nav_classes = ["nav", "navigation", "menu", "sidebar"]
+        # Define tags that are typically irrelevant to main content
+        self.irrelevant_tags = [
+            "script",
+            "style",
+            "noscript",
+            "iframe",
+            "header",
+            "footer",
+        ]
+        # Initialize TF-IDF vectorizer for text analysis
+        self.vectorizer = TfidfVectorizer(stop_words="english")
+        # Boilerplate learned across the pages of each site
+        self.site_templates = site_templates or get_site_templates()
+
+    def clean(self, soup: BeautifulSoup, url: Optional[str] = None) -> BeautifulSoup:
+        """
+        Main cleaning method that applies all cleaning techniques. With the
+        page's url, paragraphs repeated across the site's pages are dropped too.
+        """
+        # Apply basic cleaning techniques
+        self.remove_comments(soup)
+        self.remove_irrelevant_tags(soup)
+        self.remove_ads(soup)
+        self.remove_navigation(soup)
+        self.remove_empty_tags(soup)
+        self.clean_text(soup)
+
+        # Find the main content wrapper
+        main_content = self.find_content_wrapper(soup)
+        paths = []
+        if url is not None:
+            scope = main_content if main_content else soup
+            paths = [dom_path(p) for p in scope.find_all("p")]
+        if main_content:
+            soup = BeautifulSoup(str(main_content), "html.parser")
+
+        # Extract paragraphs and remove boilerplate content
+        paragraphs = [p.get_text() for p in soup.find_all("p")]
+        return self.paragraph_soup(paragraphs, paths, url)
+
+    def paragraph_soup(
+        self,
+        paragraphs: List[str],
+        paths: Optional[List[int]] = None,
+        url: Optional[str] = None,
+    ) -> BeautifulSoup:
+        """Remove boilerplate paragraphs and wrap the rest in a fresh soup."""
+        if url is not None:
+            paragraphs = self.site_templates.get(url).filter(url, paragraphs, paths)
+        cleaned_paragraphs = self.remove_boilerplate(paragraphs)
+        logging.debug(f"Cleaned paragraphs: {cleaned_paragraphs}")
+        # Reconstruct the soup with cleaned paragraphs
+        new_soup = BeautifulSoup("<div></div>", "html.parser")
+        for para in cleaned_paragraphs:
+            new_p = new_soup.new_tag("p")
+            new_p.string = para
+            new_soup.div.append(new_p)
+
+        return new_soup
+
+    def remove_comments(self, soup: BeautifulSoup):
+        """Remove HTML comments from the soup."""
+        for comment in soup.find_all(text=lambda text: isinstance(text, Comment)):
+            comment.extract()
+
+    def remove_irrelevant_tags(self, soup: BeautifulSoup):
+        """Remove irrelevant tags from the soup."""
+        for tag in self.irrelevant_tags:
+            for element in soup.find_all(tag):
+                element.decompose()
+
+    def remove_ads(self, soup: BeautifulSoup):
+        """Remove elements with common ad class names from the soup."""
+        for ad_class in self.common_ad_classes:
+            for element in soup.find_all(class_=re.compile(ad_class, re.I)):
+                element.decompose()
+
+    def remove_navigation(self, soup: BeautifulSoup):
+        """Remove elements with common navigation class names from the soup."""
+        for nav_class in self.common_nav_classes:
+            for element in soup.find_all(class_=re.compile(nav_class, re.I)):
+                element.decompose()
+
+    def remove_empty_tags(self, soup: BeautifulSoup):
+        """Remove empty tags from the soup."""
+        for element in soup.find_all():
+            if len(element.get_text(strip=True)) == 0:
+                element.extract()
+
+    def clean_text(self, soup: BeautifulSoup):
+        """Normalize whitespace in text nodes."""
+        for element in soup.find_all(text=True):
+            text = element.strip()
+            if text:
+                cleaned_text = re.sub(r"\s+", " ", text)
+                element.replace_with(cleaned_text)
+
+    def remove_boilerplate(self, paragraphs: List[str]) -> List[str]:
+        """Remove boilerplate content using TF-IDF analysis."""
+        if not paragraphs:
+            return []
+
+        # Calculate TF-IDF scores for each paragraph
+        tfidf_matrix = self.vectorizer.fit_transform(paragraphs)
+
+        # Calculate the average TF-IDF score for each paragraph, staying sparse
+        avg_scores = np.asarray(tfidf_matrix.mean(axis=1)).ravel()
+
+        # Keep paragraphs with above-average TF-IDF scores
+        threshold = np.mean(avg_scores)
+        return [
+            para for para, score in zip(paragraphs, avg_scores) if score > threshold
+        ]
+
+    def score_readability(self, text):
+        """Calculate a basic readability score for a given text."""
+        words = len(re.findall(r"\w+", text))
+        sentences = len(re.findall(r"\w+[.!?]", text)) or 1
+        return words / sentences  # A simple words per sentence ratio
+
+    def find_content_wrapper(self, soup):
+        """Identify the main content wrapper based on readability and structure."""
+        candidates = soup.find_all(["div", "article", "main", "section"])
+        if not candidates:
+            return None
+
+        scored_candidates = []
+        for candidate in candidates:
+            text = candidate.get_text()
+            score = self.score_readability(text)
+            text_length = len(text)
+            p_density = len(candidate.find_all("p")) / (len(candidate.find_all()) + 1)
+
+            combined_score = score * text_length * p_density
+            scored_candidates.append((candidate, combined_score))
+
+        return max(scored_candidates, key=lambda x: x[1])[0]
+
+
+# Text statistics of a run of strings, combinable without re-reading the text:
+# (length, words, sentences, starts with a word char, starts with [.!?],
+#  ends with a word char)
+_TextStats = Tuple[int, int, int, bool, bool, bool]
+_NO_TEXT: _TextStats = (0, 0, 0, False, False, False)
+
+
+def _text_stats(text: str) -> _TextStats:
+    return (
+        len(text),
+        len(WORD_PATTERN.findall(text)),
+        len(SENTENCE_PATTERN.findall(text)),
+        WORD_PATTERN.match(text) is not None,
+        text[0] in ".!?",
+        WORD_PATTERN.match(text[-1]) is not None,
+    )
+
+
+def _concat_stats(left: _TextStats, right: _TextStats) -> _TextStats:
+    """Stats of the concatenated text, as score_readability() would count them."""
+    if not left[0]:
+        return right
+    if not right[0]:
+        return left
+    joined = left[5] and right[3]  # one word spans the boundary
+    completed = left[5] and right[4]  # left's last word ends a sentence
+    return (
+        left[0] + right[0],
+        left[1] + right[1] - joined,
+        left[2] + right[2] + completed,
+        left[3],
+        left[4],
+        right[5],
+    )
+
+
+class _Frame:
+    """An element during the walk, with its cleaned subtree's statistics."""
+
+    __slots__ = (
+        "element",
+        "children",
+        "order",
+        "has_text",
+        "stats",
+        "n_tags",
+        "n_paragraphs",
+        "path",
+    )
+
+    def __init__(self, element: etree._Element, order: int, path: int):
+        self.element = element
+        self.children = iter(element)
+        self.order = order
+        self.has_text = False
+        self.stats = _NO_TEXT
+        self.n_tags = 0
+        self.n_paragraphs = 0
+        self.path = path
+
+    def add_text(self, text: Optional[str]):
+        if text:
+            self.has_text = self.has_text or bool(text.strip())
+            self.stats = _concat_stats(self.stats, _text_stats(text))
+
+    def add_child(self, child: "_Frame"):
+        self.has_text = True
+        self.stats = _concat_stats(self.stats, child.stats)
+        self.n_tags += 1 + child.n_tags
+        self.n_paragraphs += child.n_paragraphs + (child.element.tag == "p")
+
+
+def normalize_string(text: Optional[str]) -> Optional[str]:
+    """A text node as clean_text() leaves it: stripped and collapsed unless blank."""
+    if text and text.strip():
+        return WHITESPACE_PATTERN.sub(" ", text.strip())
+    return text
+
+
+def lxml_dom_step(element: etree._Element) -> str:
+    """dom_step() for an lxml element."""
+    return element.tag + "".join(
+        f".{name}" for name in (element.get("class") or "").split()
+    )
+
+
+_parsers = threading.local()
+
+
+def parse_html(html: str) -> Optional[etree._Element]:
+    """
+    Parse a page with lxml's HTML parser, or None if the page is empty.
+    Comments are kept: like bs4, the walk normalizes the text on either side
+    of one separately.
+    """
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        parser = _parsers.parser = lxml.html.HTMLParser()
+    try:
+        return lxml.html.document_fromstring(html, parser=parser)
+    except ValueError:
+        # str input must not carry an XML encoding declaration
+        return lxml.html.document_fromstring(
+            html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8")
+        )
+    except etree.ParserError:
+        return None
+
+
+class LxmlContentCleaner(ContentCleaner):
+    """
+    ContentCleaner engine that parses the page with lxml and cleans it in a
+    single pass over the lxml tree.
+
+    The walk is depth first: irrelevant tags and ad or navigation subtrees are
+    skipped without being visited, text is normalized in place, and empty
+    elements are dropped and candidate wrappers scored bottom-up from their
+    children's statistics. Paragraph text is then read from the winning
+    wrapper. Output matches ContentCleaner wherever lxml and html.parser build
+    the same tree, which is the case for well-formed pages.
+    """
+
+    # bs4 keeps the text of these out of get_text(), so they never contribute
+    hidden_tags = ("template", "rt", "rp")
+
+    def __init__(self, site_templates: Optional[SiteTemplates] = None):
+        super().__init__(site_templates)
+        # The per-class regexes of remove_ads/remove_navigation, searched at once
+        self.class_pattern = re.compile(
+            "|".join(
+                f"(?:{name})"
+                for name in self.common_ad_classes + self.common_nav_classes
+            ),
+            re.I,
+        )
+        self.removed_tags = frozenset(self.irrelevant_tags) | frozenset(
+            self.hidden_tags
+        )
+        # The same names as whole words of a class, e.g. "main-nav" but not "shadow"
+        chrome_classes = self.common_ad_classes + self.common_nav_classes
+        self.chrome_class_pattern = re.compile(
+            r"(?<![a-z0-9])(?:"
+            + "|".join(chrome_classes + ["ads", "navbar"])
+            + r")(?![a-z0-9])",
+            re.I,
+        )
+
+    def clean(self, soup: BeautifulSoup, url: Optional[str] = None) -> BeautifulSoup:
+        """ContentCleaner interface; clean_html() saves serializing the soup."""
+        return self.clean_html(str(soup), url)
+
+    def clean_html(self, html: str, url: Optional[str] = None) -> BeautifulSoup:
+        """Parse and clean a page, returning the kept paragraphs like clean()."""
+        root = parse_html(html)
+        paragraphs = self.extract_paragraphs(root) if root is not None else []
+        texts = [text for text, _ in paragraphs]
+        paths = [path for _, path in paragraphs]
+        return self.paragraph_soup(texts, paths, url)
+
+    def is_removed(self, element: etree._Element) -> bool:
+        # Comments and processing instructions have no string tag
+        if not isinstance(element.tag, str) or element.tag in self.removed_tags:
+            return True
+        classes = element.get("class")
+        return bool(classes) and self.class_pattern.search(classes) is not None
+
+    def prune(
+        self, root: etree._Element
+    ) -> Tuple[Optional[etree._Element], Dict[etree._Element, int]]:
+        """
+        Clean the tree in place in one walk: drop removed and empty elements and
+        normalize text. Returns the best content wrapper, if any, and the DOM
+        path hash of every element kept.
+        """
+        top = _Frame(root, 0, hash((0, lxml_dom_step(root))))
+        top.add_text(normalize_string(root.text))
+        root.text = normalize_string(root.text)
+        paths: Dict[etree._Element, int] = {root: top.path}
+        dropped: List[etree._Element] = []
+        stack = [top]
+        order = 0
+        best: Optional[_Frame] = None
+        best_score = 0.0
+        while stack:
+            frame = stack[-1]
+            element = next(frame.children, None)
+            if element is not None:
+                if self.is_removed(element):
+                    dropped.append(element)
+                    element.tail = normalize_string(element.tail)
+                    frame.add_text(element.tail)
+                    continue
+                order += 1
+                child = _Frame(
+                    element, order, hash((frame.path, lxml_dom_step(element)))
+                )
+                element.text = normalize_string(element.text)
+                child.add_text(element.text)
+                stack.append(child)
+                continue
+
+            stack.pop()
+            if not stack:
+                break
+            parent = stack[-1]
+            element = frame.element
+            # Elements without text are dropped along with their subtree
+            if frame.has_text:
+                parent.add_child(frame)
+                paths[element] = frame.path
+                if element.tag in CANDIDATE_TAGS:
+                    length, words, sentences = frame.stats[:3]
+                    score = (
+                        words
+                        / (sentences or 1)
+                        * length
+                        * (frame.n_paragraphs / (frame.n_tags + 1))
+                    )
+                    # max() keeps the first of equal scores in document order
+                    if (
+                        best is None
+                        or score > best_score
+                        or (score == best_score and frame.order < best.order)
+                    ):
+                        best, best_score = frame, score
+            else:
+                dropped.append(element)
+            # The tail stays in the parent when the element is dropped
+            element.tail = normalize_string(element.tail)
+            parent.add_text(element.tail)
+
+        for element in dropped:
+            element.drop_tree()
+        return (best.element if best is not None else None), paths
+
+    def is_site_chrome(self, element: etree._Element, in_section: bool) -> bool:
+        """
+        Whether clean_page() drops an element: irrelevant tags, <nav>, a header
+        or footer outside sectioning content, or an ad or navigation class. Class
+        names are matched as whole words, so e.g. "page-heading" is kept.
+        """
+        if not isinstance(element.tag, str) or element.tag in self.removed_tags:
+            return element.tag not in ("header", "footer") or not in_section
+        if element.tag == "nav":
+            return True
+        classes = element.get("class")
+        return bool(classes) and self.chrome_class_pattern.search(classes) is not None
+
+    def clean_page(self, html: str, url: str) -> Optional[etree._Element]:
+        """
+        Parse a page and strip its site chrome for section extraction, or
+        return None if the page is empty.
+
+        Unlike clean(), the page keeps its headings, its text as written and
+        every content block rather than one wrapper's paragraphs. One walk drops
+        site chrome (see is_site_chrome()) and collects the innermost text
+        blocks with their DOM paths; blocks the domain's SiteTemplate has seen
+        on other pages are then dropped, and the page is learned.
+        """
+        root = parse_html(html)
+        if root is None:
+            return None
+        dropped: List[etree._Element] = []
+        blocks: List[etree._Element] = []
+        block_paths: List[int] = []
+        leaf: Dict[etree._Element, bool] = {}
+        open_blocks: List[etree._Element] = []
+        paths = [0]
+        sections = 0
+        walker = etree.iterwalk(root, events=("start", "end"))
+        skipped = None
+        for event, element in walker:
+            if element is skipped:
+                skipped = None
+                continue
+            if event == "start":
+                if element is not root and self.is_site_chrome(element, sections > 0):
+                    dropped.append(element)
+                    skipped = element
+                    walker.skip_subtree()
+                    continue
+                paths.append(hash((paths[-1], lxml_dom_step(element))))
+                sections += element.tag in SECTIONING_TAGS
+                if element.tag in TEMPLATE_BLOCK_TAGS:
+                    if open_blocks:
+                        leaf[open_blocks[-1]] = False
+                    open_blocks.append(element)
+                    leaf[element] = True
+                    blocks.append(element)
+                    block_paths.append(paths[-1])
+            else:
+                paths.pop()
+                sections -= element.tag in SECTIONING_TAGS
+                if open_blocks and open_blocks[-1] is element:
+                    open_blocks.pop()
+
+        leaves = [
+            (block, path) for block, path in zip(blocks, block_paths) if leaf[block]
+        ]
+        flags = self.site_templates.get(url).shared(
+            url,
+            [block.text_content() for block, _ in leaves],
+            [path for _, path in leaves],
+        )
+        template_blocks = [block for (block, _), flag in zip(leaves, flags) if flag]
+        if template_blocks:
+            logging.info(f"Dropped {len(template_blocks)} template blocks from {url}")
+        for element in dropped + template_blocks:
+            element.drop_tree()
+        return root
+
+    def extract_paragraphs(self, root: etree._Element) -> List[Tuple[str, int]]:
+        """
+        The text and DOM path hash of each paragraph clean() would keep. Cleans
+        the tree in place.
+        """
+        wrapper, paths = self.prune(root)
+        if wrapper is None:
+            return [("".join(p.itertext()), paths[p]) for p in root.iter("p")]
+        return [(reparsed_text(p, wrapper), paths[p]) for p in wrapper.iter("p")]
+
+
+def reparsed_text(paragraph: etree._Element, wrapper: etree._Element) -> str:
+    """
+    Text of a paragraph as get_text() sees it after clean() re-parses the
+    wrapper: runs of ASCII whitespace between tags collapse to one newline or
+    space, as BeautifulSoup does outside <pre> and <textarea>.
+    """
+    preserved = sum(
+        ancestor.tag in PRESERVE_WHITESPACE_TAGS
+        for ancestor in itertools.takewhile(
+            lambda ancestor: ancestor is not wrapper, paragraph.iterancestors()
+        )
+    )
+    parts = []
+    for event, element in etree.iterwalk(paragraph, events=("start", "end")):
+        if event == "start":
+            preserved += element.tag in PRESERVE_WHITESPACE_TAGS
+            text = element.text
+        else:
+            preserved -= element.tag in PRESERVE_WHITESPACE_TAGS
+            text = element.tail if element is not paragraph else None
+        if text:
+            if not preserved and not text.strip(BeautifulSoup.ASCII_SPACES):
+                text = "\n" if "\n" in text else " "
+            parts.append(text)
+    return "".join(parts)
@@ -0,0 +1,308 @@
+# crawler_service.py
+
+import asyncio
+import logging
+import queue
+import time
+from email.utils import parsedate_to_datetime
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import urldefrag, urlparse
+
+from langchain.schema import Document
+from playwright.async_api import Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from services.browser_pool_service import BrowserPool
+
+# Statuses that mean "slow down" rather than "this page is broken"
+THROTTLE_STATUSES = (429, 503)
+
+_DONE = object()
+
+# status, Retry-After header, the page's documents and its links
+PageResult = Tuple[int, Optional[str], List[Document], List[str]]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+
+class HostRateLimiter:
+    """
+    Per-host token buckets for asyncio code. A host that answers 429/503 has
+    its bucket drained, its rate halved and, if it sent Retry-After, is paused
+    for that long; successful requests raise the rate back towards the
+    configured maximum. Other hosts are unaffected and nothing blocks the loop.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 2.0,
+        burst: int = 4,
+        min_requests_per_second: float = 0.05,
+    ):
+        self.max_rate = requests_per_second
+        self.min_rate = min(min_requests_per_second, requests_per_second)
+        self.burst = max(1, burst)
+        self._buckets: Dict[str, _TokenBucket] = {}
+
+    def _bucket(self, host: str) -> _TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = _TokenBucket(self.max_rate, self.burst)
+        return self._buckets[host]
+
+    async def acquire(self, host: str):
+        """Wait until a request to host is allowed and take a token."""
+        bucket = self._bucket(host)
+        while True:
+            now = time.monotonic()
+            bucket.tokens = min(
+                self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate
+            )
+            bucket.updated = now
+            if now >= bucket.blocked_until and bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return
+            await asyncio.sleep(
+                max(bucket.blocked_until - now, (1 - bucket.tokens) / bucket.rate)
+            )
+
+    def backoff(self, host: str, retry_after: Optional[float] = None):
+        """Slow down after a throttling response."""
+        bucket = self._bucket(host)
+        bucket.rate = max(self.min_rate, bucket.rate / 2)
+        bucket.tokens = 0.0
+        pause = retry_after if retry_after is not None else 1 / bucket.rate
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + pause)
+        logging.warning(
+            f"Throttled by {host}, pausing {pause:.1f}s and lowering rate to "
+            f"{bucket.rate:.2f} req/s"
+        )
+
+    def succeeded(self, host: str):
+        """Additively restore the rate after a successful request."""
+        bucket = self._bucket(host)
+        bucket.rate = min(self.max_rate, bucket.rate + self.max_rate / 10)
+
+
+def normalize_url(url: str) -> str:
+    """Drop the fragment so anchors on one page are crawled once."""
+    return urldefrag(url)[0]
+
+
+class SiteCrawler:
+    """
+    Concurrent same-site crawler on Playwright's async API.
+
+    Pages are visited breadth-first from a start URL up to max_depth links away
+    and at most max_pages in total, with at most max_concurrency pages in
+    flight. Each page is turned into Documents by `extract` and yielded as soon
+    as it finishes. A `fetch_page` coroutine can replace rendering and
+    extraction, e.g. to fetch over plain HTTP or serve cached pages.
+    """
+
+    def __init__(
+        self,
+        browser_pool: BrowserPool,
+        extract: Callable[[str, str], List[Document]],
+        can_fetch: Callable[[str], bool] = lambda url: True,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        max_depth: int = 2,
+        max_pages: int = 50,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        timeout: int = 30000,
+        fetch_page: Optional[Callable[[str], Awaitable[PageResult]]] = None,
+    ):
+        self.browser_pool = browser_pool
+        self.extract = extract
+        self.can_fetch = can_fetch
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.max_depth = max_depth
+        self.max_pages = max(1, max_pages)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.fetch_page = fetch_page or self._render_page
+
+    def crawl(self, start_url: str) -> Iterator[Document]:
+        """Blocking iterator over crawl_async(), usable from any thread."""
+        return self._iterate(self.crawl_async(start_url))
+
+    def fetch_all(self, urls: Iterable[str]) -> Iterator[Document]:
+        """Fetch the given pages concurrently without following their links."""
+        return self._iterate(self._crawl([normalize_url(url) for url in urls], False))
+
+    def _iterate(self, documents_async: AsyncIterator[Document]) -> Iterator[Document]:
+        documents: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for document in documents_async:
+                    documents.put(document)
+            except Exception as e:
+                documents.put(e)
+            finally:
+                documents.put(_DONE)
+
+        future = self.browser_pool.schedule(pump())
+        try:
+            while (item := documents.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    async def crawl_async(self, start_url: str) -> AsyncIterator[Document]:
+        """Crawl on the browser pool's event loop, yielding documents page by page."""
+        async for document in self._crawl([normalize_url(start_url)], True):
+            yield document
+
+    async def _crawl(
+        self, start_urls: List[str], follow_links: bool
+    ) -> AsyncIterator[Document]:
+        hosts = {urlparse(url).netloc for url in start_urls}
+        seen = set(start_urls)
+        frontier: asyncio.Queue = asyncio.Queue()
+        for url in seen:
+            frontier.put_nowait((url, 0, 0))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                url, depth, attempt = await frontier.get()
+                try:
+                    links = await self._crawl_page(
+                        url, depth, attempt, frontier, results
+                    )
+                    for link in links if follow_links else []:
+                        link = normalize_url(link)
+                        if (
+                            len(seen) < self.max_pages
+                            and link not in seen
+                            and urlparse(link).netloc in hosts
+                            and urlparse(link).scheme in ("http", "https")
+                        ):
+                            seen.add(link)
+                            frontier.put_nowait((link, depth + 1, 0))
+                except Exception as e:
+                    logging.error(f"Error occurred while crawling {url}: {str(e)}")
+                finally:
+                    frontier.task_done()
+
+        async def finish():
+            await frontier.join()
+            results.put_nowait(_DONE)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        tasks.append(asyncio.create_task(finish()))
+        n_pages = 0
+        try:
+            while (document := await results.get()) is not _DONE:
+                n_pages += 1
+                yield document
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logging.info(
+            f"Crawled {len(seen)} pages of {', '.join(sorted(hosts))}, "
+            f"{n_pages} documents"
+        )
+
+    async def _crawl_page(
+        self,
+        url: str,
+        depth: int,
+        attempt: int,
+        frontier: asyncio.Queue,
+        results: asyncio.Queue,
+    ) -> List[str]:
+        """Fetch one page, queue its documents and return its links to follow."""
+        loop = asyncio.get_running_loop()
+        # robots.txt is fetched with blocking I/O the first time a host is seen
+        if not await loop.run_in_executor(None, self.can_fetch, url):
+            logging.warning(f"Skipping {url}: disallowed by robots.txt")
+            return []
+
+        host = urlparse(url).netloc
+        await self.rate_limiter.acquire(host)
+        start = time.perf_counter()
+        status, retry_after, documents, links = await self.fetch_page(url)
+        if status in THROTTLE_STATUSES:
+            self.rate_limiter.backoff(host, parse_retry_after(retry_after))
+            if attempt < self.max_retries:
+                frontier.put_nowait((url, depth, attempt + 1))
+            else:
+                logging.error(f"Giving up on {url} after {attempt + 1} attempts")
+            return []
+        self.rate_limiter.succeeded(host)
+        if status >= 400:
+            logging.warning(f"Skipping {url}: HTTP {status}")
+            return []
+
+        logging.info(
+            f"Crawled {url} (depth {depth}) in {time.perf_counter() - start:.2f}s"
+        )
+        for document in documents:
+            results.put_nowait(document)
+        return links if depth < self.max_depth else []
+
+    async def _render_page(self, url: str) -> PageResult:
+        """Render url in a pooled page and extract its documents."""
+        status, retry_after, html, links = await self.browser_pool.with_page(
+            lambda page: self._visit(page, url)
+        )
+        if status in THROTTLE_STATUSES or status >= 400:
+            return status, retry_after, [], []
+        # Parsing is CPU-bound; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        documents = await loop.run_in_executor(None, self.extract, html, url)
+        return status, retry_after, documents, links
+
+    async def _visit(
+        self, page: Page, url: str
+    ) -> Tuple[int, Optional[str], str, List[str]]:
+        response = None
+        try:
+            response = await page.goto(url, timeout=self.timeout)
+            if response is not None and response.status in THROTTLE_STATUSES:
+                return response.status, response.headers.get("retry-after"), "", []
+            await page.wait_for_load_state("networkidle", timeout=self.timeout)
+        except PlaywrightTimeoutError:
+            logging.warning(f"Timeout occurred while loading {url}")
+        status = response.status if response is not None else 200
+        html = await page.content()
+        links = await page.eval_on_selector_all(
+            "a[href]", "elements => elements.map(element => element.href)"
+        )
+        return status, None, html, links
@@ -0,0 +1,199 @@
+# dedup_service.py
+
+import logging
+import os
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Odd multiplier used to fold token hashes into word n-gram hashes
+_SHINGLE_BASE = np.uint64(1_000_003)
+
+
+def shingle_hashes(text: str, size: int = 3) -> np.ndarray:
+    """Unique 64-bit hashes of the word n-grams of a text."""
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    token_hashes = np.fromiter(
+        (zlib.crc32(token.encode("utf-8")) for token in tokens),
+        dtype=np.uint64,
+        count=len(tokens),
+    )
+    size = min(size, len(tokens))
+    n_shingles = len(tokens) - size + 1
+    shingles = np.zeros(n_shingles, dtype=np.uint64)
+    for offset in range(size):
+        # uint64 arithmetic wraps, which is what we want for hashing
+        window = token_hashes[offset : offset + n_shingles]
+        shingles = shingles * _SHINGLE_BASE + window
+    return np.unique(shingles)
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose (bands, rows) with bands * rows == num_perm whose S-curve midpoint
+    (1 / bands) ** (1 / rows) is closest to, but not above, the threshold.
+    """
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        midpoint = (1 / bands) ** (1 / rows)
+        gap = threshold - midpoint
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detector for chunks, using MinHash signatures over
+    word shingles and LSH banding to find candidates.
+
+    The first chunk of every near-duplicate group is kept; later chunks whose
+    estimated Jaccard similarity to a kept chunk reaches the threshold are
+    dropped before they are embedded. Kept signatures remember their source, so
+    a source can be forgotten when it leaves the index, and duplicate_of records
+    which sources' chunks stood in for each source's dropped ones.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+        seed: int = 1,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family; odd multipliers keep it a bijection mod 2^64
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [
+            defaultdict(list) for _ in range(self.bands)
+        ]
+        self._signatures: List[np.ndarray] = []
+        self._owners: List[str] = []
+        self.duplicate_of: Dict[str, Set[str]] = defaultdict(set)
+        self.kept_chunks = 0
+        self.removed_chunks = 0
+        self.removed_tokens = 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a text, or None if it has no words."""
+        shingles = shingle_hashes(text, self.shingle_size)
+        if shingles.size == 0:
+            return None
+        # One row per permutation; the high 32 bits are the hash value
+        hashed = self._a[:, None] * shingles[None, :] + self._b[:, None]
+        return (hashed >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _remember(self, signature: np.ndarray, source: str):
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._owners.append(source)
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets[key].append(position)
+
+    def is_duplicate(self, text: str, source: str = "") -> bool:
+        """Check a chunk against every kept chunk, remembering it if it is new."""
+        signature = self.signature(text)
+        if signature is None:
+            self.kept_chunks += 1
+            return False
+        band_keys = self._band_keys(signature)
+        candidates = {
+            kept
+            for buckets, key in zip(self._buckets, band_keys)
+            for kept in buckets.get(key, ())
+        }
+        for kept in candidates:
+            if np.mean(self._signatures[kept] == signature) >= self.threshold:
+                self.removed_chunks += 1
+                self.removed_tokens += self.count_tokens(text)
+                if self._owners[kept] != source:
+                    self.duplicate_of[source].add(self._owners[kept])
+                return True
+
+        self._remember(signature, source)
+        self.kept_chunks += 1
+        return False
+
+    def remove_sources(self, sources: Iterable[str]):
+        """Forget the kept chunks of sources that are no longer indexed."""
+        sources = set(sources)
+        if not sources:
+            return
+        kept = [
+            (signature, owner)
+            for signature, owner in zip(self._signatures, self._owners)
+            if owner not in sources
+        ]
+        self.reset()
+        for signature, owner in kept:
+            self._remember(signature, owner)
+
+    def reset(self):
+        """Forget every kept chunk."""
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures = []
+        self._owners = []
+        self.duplicate_of = defaultdict(set)
+
+    def save(self, path: Path):
+        """Write the kept signatures and their sources atomically."""
+        tmp_path = Path(path).with_suffix(".tmp.npz")
+        np.savez(
+            tmp_path,
+            signatures=np.asarray(self._signatures, dtype=np.uint32).reshape(
+                len(self._signatures), len(self._a)
+            ),
+            owners=np.asarray(self._owners, dtype=str),
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: Path) -> bool:
+        """Replace the kept chunks with those saved at path; False if unusable."""
+        self.reset()
+        try:
+            with np.load(path) as state:
+                signatures, owners = state["signatures"], state["owners"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.info(f"No usable near-duplicate state at {path}: {str(e)}")
+            return False
+        if signatures.shape[1:] != (len(self._a),):
+            return False
+        for signature, owner in zip(signatures, owners.tolist()):
+            self._remember(signature, owner)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "kept_chunks": self.kept_chunks,
+            "removed_chunks": self.removed_chunks,
+            "removed_tokens": self.removed_tokens,
+        }
+
+    def log_stats(self):
+        logging.info(
+            f"Near-duplicate filter removed {self.removed_chunks} of "
+            f"{self.kept_chunks + self.removed_chunks} chunks "
+            f"(~{self.removed_tokens} embedding tokens)"
+        )
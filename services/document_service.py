@@ -1,32 +1,427 @@
 # document_service.py
 
+import gzip
+import itertools
+import json
 import logging
-from typing import List
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from importlib.metadata import PackageNotFoundError, version
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
 
 from langchain.schema import Document
-from langchain_community.document_loaders import JSONLoader, UnstructuredEPubLoader
-from langchain_community.document_loaders.csv_loader import CSVLoader
+from langchain_community.document_loaders import UnstructuredEPubLoader
 from langchain_community.document_loaders.markdown import UnstructuredMarkdownLoader
-from langchain_community.document_loaders.pdf import PyMuPDFLoader
 from langchain_community.document_loaders.text import TextLoader
 from langchain_community.document_loaders.xml import UnstructuredXMLLoader
 
+from services.pdf_service import ParallelPyMuPDFLoader, set_page_worker_budget
+from services.structured_data_service import BatchedCSVLoader, StreamingJSONLoader
+from utilities.cache_utils import evict_lru, hash_bytes, hash_file, remove_path, touch
+
 # Mapping of file types to corresponding document loaders
 DEFAULT_LOADERS = {
-    "pdf": PyMuPDFLoader,
-    "csv": CSVLoader,
+    "pdf": ParallelPyMuPDFLoader,
+    "csv": BatchedCSVLoader,
     "epub": UnstructuredEPubLoader,
     "md": UnstructuredMarkdownLoader,
-    "json": JSONLoader,
+    "json": StreamingJSONLoader,
+    "jsonl": StreamingJSONLoader,
     "xml": UnstructuredXMLLoader,
     "txt": TextLoader,
 }
 
+# Extra constructor arguments for the loader of each file type, e.g.
+# {"csv": {"rows_per_document": 50}}
+LoaderOptions = Dict[str, Dict[str, Any]]
+
+# Bump when the documents produced for a file change for reasons other than
+# the loader, e.g. new metadata fields
+DOCUMENT_CACHE_FORMAT = "2"
+
+# Files queued per pool worker ahead of the one being yielded, and how long
+# workers get to finish before an abandoned pool is killed
+POOL_WINDOW = 2
+POOL_SHUTDOWN_GRACE_SECONDS = 5.0
+
+# Loader metadata that is kept on each document, e.g. to cite the page
+PRESERVED_METADATA = ("page", "total_pages", "row_start", "row_end", "seq_num")
+
+
+def loader_version(loader_class: type) -> str:
+    """Version of the package that provides a loader class."""
+    if hasattr(loader_class, "loader_version"):
+        return loader_class.loader_version
+    package = loader_class.__module__.split(".")[0]
+    try:
+        return version(package.replace("_", "-"))
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class DocumentCache:
+    """
+    On-disk LRU cache of parsed documents, keyed on a file's content hash and the
+    loader class and version that parsed it. Entries are gzip-compressed JSON, so
+    a repeat load of an unchanged file skips parsing entirely.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(
+        self,
+        file_path: str,
+        loader_class: type,
+        loader_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        return hash_bytes(
+            hash_file(file_path),
+            f"{loader_class.__module__}.{loader_class.__qualname__}",
+            loader_version(loader_class),
+            json.dumps(loader_kwargs or {}, sort_keys=True, default=str),
+            DOCUMENT_CACHE_FORMAT,
+        )
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json.gz"
+
+    def contains(self, key: str) -> bool:
+        return self._entry_path(key).is_file()
+
+    def load(self, key: str, file_path: str) -> Optional[List[Document]]:
+        """Return the cached documents for a key, re-pointed at file_path, or None on a miss."""
+        entry = self._entry_path(key)
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                records = json.load(f)
+            touch(entry)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read cached documents {key[:12]}: {str(e)}")
+            remove_path(entry)
+            return None
+        logging.info(f"Document cache hit for {file_path}")
+        # The same bytes may have been uploaded under another path
+        return [
+            Document(
+                page_content=record["page_content"],
+                metadata={**record["metadata"], "source": file_path},
+            )
+            for record in records
+        ]
+
+    def writer(self, key: str) -> "DocumentCacheWriter":
+        """Start an entry that documents are streamed into while a file is parsed."""
+        return DocumentCacheWriter(self, key)
+
+    def clear(self):
+        """Remove every cached document list."""
+        for entry in self.entries():
+            remove_path(entry)
+        logging.info(f"Cleared document cache at {self.cache_dir}")
+
+    def entries(self) -> List[Path]:
+        return [p for p in self.cache_dir.iterdir() if not p.name.startswith(".")]
+
+    def evict(self) -> List[Path]:
+        """Evict least recently used entries until the cache fits in max_bytes."""
+        return evict_lru(self.entries(), self.max_bytes)
+
+
+class DocumentCacheWriter:
+    """
+    Writes the documents of one file into a cache entry as they are parsed, so
+    a large file is never held in memory just to be cached. The entry only
+    becomes visible on commit; files whose compressed entry outgrows the whole
+    cache are abandoned part-way.
+    """
+
+    def __init__(self, cache: DocumentCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.count = 0
+        self.file = self.raw = self.tmp_path = None
+        try:
+            fd, self.tmp_path = tempfile.mkstemp(dir=cache.cache_dir, prefix=".tmp-")
+            self.raw = os.fdopen(fd, "wb")
+            self.file = gzip.open(self.raw, "wt", encoding="utf-8")
+            self.file.write("[")
+        except Exception as e:
+            self._fail(e)
+
+    def add(self, document: Document):
+        if self.file is None:
+            return
+        try:
+            if self.count:
+                self.file.write(",")
+            record = {
+                "page_content": document.page_content,
+                "metadata": document.metadata,
+            }
+            json.dump(record, self.file, default=str)
+            self.count += 1
+        except Exception as e:
+            self._fail(e)
+            return
+        if self.raw.tell() > self.cache.max_bytes:
+            logging.info(
+                f"Not caching documents {self.key[:12]}: larger than the cache"
+            )
+            self.abort()
+
+    def commit(self):
+        """Publish the entry and evict old entries over the size cap."""
+        if self.file is None:
+            return
+        try:
+            self.file.write("]")
+            self.file.close()
+            self.raw.close()
+            os.replace(self.tmp_path, self.cache._entry_path(self.key))
+        except Exception as e:
+            self._fail(e)
+            return
+        self.file = self.tmp_path = None
+        self.cache.evict()
+
+    def abort(self):
+        """Drop the partial entry, if any."""
+        for stream in (self.file, self.raw):
+            try:
+                if stream is not None:
+                    stream.close()
+            except (OSError, ValueError):
+                pass
+        self.file = None
+        if self.tmp_path is not None:
+            remove_path(Path(self.tmp_path))
+            self.tmp_path = None
+
+    def _fail(self, error: Exception):
+        logging.error(f"Failed to cache documents {self.key[:12]}: {str(error)}")
+        self.abort()
+
 
-def load_documents(file_paths: List[str]) -> List[Document]:
+def load_documents(
+    file_paths: List[str],
+    max_workers: int = 1,
+    timeout: Optional[float] = None,
+    cache: Optional[DocumentCache] = None,
+    loader_options: Optional[LoaderOptions] = None,
+) -> List[Document]:
     """Load documents based on their file types and return them in LangChain's Document format with metadata."""
-    docs = []
+    if max_workers > 1 and len(file_paths) > 1:
+        return list(
+            iter_documents_parallel(
+                file_paths, max_workers, timeout, cache, loader_options
+            )
+        )
+    return list(iter_documents(file_paths, cache, loader_options))
+
+
+def load_file(
+    file_path: str,
+    cache: Optional[DocumentCache] = None,
+    loader_options: Optional[LoaderOptions] = None,
+) -> List[Document]:
+    """Load a single file; module-level so it can run in a worker process."""
+    return list(iter_documents([file_path], cache, loader_options))
+
+
+def iter_documents_parallel(
+    file_paths: List[str],
+    max_workers: int = 4,
+    timeout: Optional[float] = None,
+    cache: Optional[DocumentCache] = None,
+    loader_options: Optional[LoaderOptions] = None,
+) -> Iterator[Document]:
+    """
+    Parse files in a process pool and yield their documents in input order.
+
+    A file that takes longer than timeout seconds to come back, or that crashes
+    its worker process, is logged and skipped; the pool is then replaced and the
+    remaining files are loaded as usual. Cached files never reach the pool; their
+    entries are looked up as the pool reaches them and only read when their turn
+    to be yielded comes.
+    """
+    # Cache keys of the files looked up so far, None for a miss
+    entry_keys: List[Optional[str]] = []
+
+    def entry_key(position: int) -> Optional[str]:
+        while len(entry_keys) <= position:
+            entry_keys.append(
+                _cache_entry_key(file_paths[len(entry_keys)], cache, loader_options)
+            )
+        return entry_keys[position]
+
+    parsed = _parse_in_pool(
+        (path for i, path in enumerate(file_paths) if entry_key(i) is None),
+        max_workers,
+        timeout,
+        cache,
+        loader_options,
+    )
+    for i, file_path in enumerate(file_paths):
+        key = entry_key(i)
+        if key is None:
+            yield from next(parsed)
+            continue
+        docs = cache.load(key, file_path)
+        # The entry may have been evicted since it was looked up
+        yield from (
+            docs if docs is not None else load_file(file_path, cache, loader_options)
+        )
+
+
+class _TrackingContext:
+    """Multiprocessing context that remembers the worker processes it starts."""
+
+    def __init__(self, context):
+        self._context = context
+        self.processes = []
 
+    def Process(self, *args, **kwargs):
+        process = self._context.Process(*args, **kwargs)
+        self.processes.append(process)
+        return process
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+def _parse_in_pool(
+    file_paths: Iterable[str],
+    max_workers: int,
+    timeout: Optional[float],
+    cache: Optional[DocumentCache],
+    loader_options: Optional[LoaderOptions],
+) -> Iterator[List[Document]]:
+    """Yield the documents of each file in order, or an empty list for a skipped file."""
+    paths = iter(file_paths)
+    # Files taken from paths but not yielded yet; the futures in a pool's window
+    # are always for the first of them
+    pending: Deque[str] = deque()
+    # After a crash the culprit is unknown, so the next file is retried on its own
+    isolate = False
+    while True:
+        if not pending:
+            pending.extend(itertools.islice(paths, 1))
+            if not pending:
+                return
+        # Workers must not inherit locks held by the caller's threads
+        context = _TrackingContext(multiprocessing.get_context("spawn"))
+        n_workers = 1 if isolate else max_workers
+        executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=context,
+            # Page-parallel loaders in the workers split the cores between them
+            initializer=set_page_worker_budget,
+            initargs=(max(1, (os.cpu_count() or 1) // n_workers),),
+        )
+        failure = None
+        # Only a window of files is queued ahead of the one being yielded, so
+        # finished results don't pile up behind a slow file
+        window = deque()
+        limit = 1 if isolate else POOL_WINDOW * max_workers
+        try:
+            while True:
+                while len(window) < limit:
+                    if len(window) == len(pending):
+                        pending.extend(itertools.islice(paths, 1))
+                        if len(window) == len(pending):
+                            break
+                    window.append(
+                        executor.submit(
+                            load_file, pending[len(window)], cache, loader_options
+                        )
+                    )
+                if not window:
+                    break
+                try:
+                    docs = window.popleft().result(timeout=timeout)
+                except FuturesTimeoutError:
+                    failure = f"timed out after {timeout}s"
+                    break
+                except BrokenProcessPool:
+                    failure = "crashed its worker process"
+                    break
+                pending.popleft()
+                yield docs
+                if isolate:
+                    break
+        finally:
+            _shutdown_pool(
+                executor,
+                context.processes,
+                terminate=failure is not None or bool(window),
+            )
+
+        if failure is None:
+            isolate = False
+        elif failure.startswith("timed out") or isolate:
+            logging.error(f"Skipping {pending.popleft()}: parser {failure}")
+            isolate = False
+            yield []
+        else:
+            isolate = True
+
+
+def _shutdown_pool(
+    executor: ProcessPoolExecutor, processes: List[BaseProcess], terminate: bool
+):
+    """
+    Shut the pool down. When files were abandoned, queued ones are cancelled and
+    workers still busy after a grace period are killed.
+    """
+    if not terminate:
+        executor.shutdown(wait=True)
+        return
+    executor.shutdown(wait=False, cancel_futures=True)
+    deadline = time.monotonic() + POOL_SHUTDOWN_GRACE_SECONDS
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+
+def _cache_entry_key(
+    file_path: str,
+    cache: Optional[DocumentCache],
+    loader_options: Optional[LoaderOptions] = None,
+) -> Optional[str]:
+    """Key of file_path's document cache entry, or None if it has none."""
+    file_type = file_path.split(".")[-1].lower()
+    loader_class = DEFAULT_LOADERS.get(file_type)
+    if cache is None or loader_class is None:
+        return None
+    loader_kwargs = (loader_options or {}).get(file_type, {})
+    try:
+        key = cache.key(file_path, loader_class, loader_kwargs)
+    except OSError:
+        return None
+    return key if cache.contains(key) else None
+
+
+def iter_documents(
+    file_paths: List[str],
+    cache: Optional[DocumentCache] = None,
+    loader_options: Optional[LoaderOptions] = None,
+) -> Iterator[Document]:
+    """Lazily load documents file by file, yielding each one as soon as it is parsed."""
     for file_path in file_paths:
         logging.info(f"Loading file: {file_path}")
         try:
@@ -36,18 +431,35 @@ def load_documents(file_paths: List[str]) -> List[Document]:
 
             # Get the appropriate loader class for the file type
             loader_class = DEFAULT_LOADERS.get(file_type)
+            loader_kwargs = (loader_options or {}).get(file_type, {})
             if loader_class:
-                # Instantiate the loader and load the documents
-                loader = loader_class(file_path)
-                loaded_docs = loader.load()
+                if cache is not None:
+                    cache_key = cache.key(file_path, loader_class, loader_kwargs)
+                    cached_docs = cache.load(cache_key, file_path)
+                    if cached_docs is not None:
+                        yield from cached_docs
+                        continue
+                # Instantiate the loader and stream the documents
+                loader = loader_class(file_path, **loader_kwargs)
+                loaded_docs = loader.lazy_load()
             else:
                 logging.error(f"No loader found for file type: {file_type}")
                 raise ValueError(f"Unsupported file type: {file_type}")
 
             # Add metadata to each loaded document
-            for doc in loaded_docs:
-                doc.metadata = generate_metadata(doc, file_path)
-            docs.extend(loaded_docs)
+            writer = cache.writer(cache_key) if cache is not None else None
+            try:
+                for doc in loaded_docs:
+                    doc.metadata = generate_metadata(doc, file_path)
+                    if writer is not None:
+                        writer.add(doc)
+                    yield doc
+                if writer is not None:
+                    writer.commit()
+            finally:
+                # A no-op after commit; drops the entry of a failed or abandoned file
+                if writer is not None:
+                    writer.abort()
 
         except ValueError as ve:
             logging.error(f"ValueError: {str(ve)}")
@@ -55,8 +467,6 @@ def load_documents(file_paths: List[str]) -> List[Document]:
             logging.error(f"Failed to load document from {file_path}: {str(e)}")
             continue  # Skip the current file and proceed with the next one
 
-    return docs
-
 
 def generate_metadata(document: Document, file_path: str) -> dict:
     """Generate metadata for the document based on the file path and document content."""
@@ -64,4 +474,12 @@ def generate_metadata(document: Document, file_path: str) -> dict:
         "source": file_path,
         "content_length": len(document.page_content),
     }
+    for key in PRESERVED_METADATA:
+        if key in document.metadata:
+            metadata[key] = document.metadata[key]
     return metadata
+
+
+def document_source(document: Document) -> str:
+    """Return the file path or URL a document was loaded from."""
+    return str(document.metadata.get("source") or document.metadata.get("url") or "")
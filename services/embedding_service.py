@@ -0,0 +1,286 @@
+# embedding_service.py
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+from sklearn.random_projection import SparseRandomProjection
+
+from utilities.cache_utils import hash_bytes, hash_file
+
+
+class EmbeddingStore:
+    """SQLite-backed store of float32 embedding vectors keyed by chunk hash."""
+
+    def __init__(self, db_path: Path):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that reuses vectors for previously seen chunks.
+
+    Each chunk is keyed on a hash of its text and the model name. Duplicate chunks
+    within a call are embedded once, and only cache misses are sent to the
+    underlying model, in batches of batch_size with at most max_concurrency
+    requests in flight.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        store: EmbeddingStore,
+        batch_size: int = 256,
+        max_concurrency: int = 4,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.store = store
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+        self._stats_lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return hash_bytes(self.model_name, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        # Deduplicate while keeping first-seen order
+        unique: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            unique.setdefault(key, text)
+
+        vectors = self.store.get_many(list(unique))
+        missing = [key for key in unique if key not in vectors]
+        if missing:
+            vectors.update(self._embed_missing(missing, unique))
+
+        with self._stats_lock:
+            self.hits += len(unique) - len(missing)
+            self.misses += len(missing)
+            self.duplicates += len(texts) - len(unique)
+        logging.debug(
+            f"Embedded {len(texts)} chunks: {len(unique) - len(missing)} cached, "
+            f"{len(missing)} new, {len(texts) - len(unique)} duplicates"
+        )
+        return [vectors[key] for key in keys]
+
+    def _embed_missing(
+        self, missing: List[str], texts_by_key: Dict[str, str]
+    ) -> Dict[str, List[float]]:
+        batches = [
+            missing[start : start + self.batch_size]
+            for start in range(0, len(missing), self.batch_size)
+        ]
+
+        def embed_batch(batch_keys: List[str]) -> Dict[str, List[float]]:
+            batch_vectors = self.underlying.embed_documents(
+                [texts_by_key[key] for key in batch_keys]
+            )
+            # Round through float32 so fresh and cached vectors are identical
+            matrix = np.asarray(batch_vectors, dtype=np.float32)
+            result = dict(zip(batch_keys, matrix.tolist()))
+            # Persist per batch so a failure later on keeps earlier work
+            self.store.put_many(result)
+            return result
+
+        embedded: Dict[str, List[float]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            for result in executor.map(embed_batch, batches):
+                embedded.update(result)
+        return embedded
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters accumulated since this wrapper was created."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "duplicates": self.duplicates,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _normalize_rows(matrix: np.ndarray) -> List[List[float]]:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).tolist()
+
+
+class HashingProjectionEmbeddings(Embeddings):
+    """
+    Stateless local embeddings: hashed word uni/bigram counts projected to a dense
+    vector with a fixed-seed sparse random projection. Needs no fitting and no
+    network, and gives identical vectors in every process.
+    """
+
+    def __init__(self, dimensions: int = 384, n_features: int = 2**18, seed: int = 42):
+        self.model_id = f"hashing-projection-{dimensions}-{n_features}-{seed}"
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm="l2",
+        )
+        # Fitting only draws the random matrix; it depends on the shape, not the data
+        self.projection = SparseRandomProjection(
+            n_components=dimensions, dense_output=True, random_state=seed
+        ).fit(sparse.csr_matrix((1, n_features)))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return _normalize_rows(
+            self.projection.transform(self.vectorizer.transform(texts))
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class TfidfSvdEmbeddings(Embeddings):
+    """
+    Local latent-semantic embeddings: TF-IDF followed by truncated SVD.
+
+    The model has to be fitted once on a sample of the corpus. It is then saved
+    to model_path and reused by later runs; for_corpus() gives each corpus its
+    own model file, so one corpus is never embedded with another's vocabulary.
+    model_id carries the fit
+    fingerprint (output size and a hash of the saved model), so cached vectors
+    and indexes from an older fit are never mixed in.
+    """
+
+    requires_fit = True
+
+    def __init__(
+        self, model_path: Path, dimensions: int = 256, max_features: int = 100_000
+    ):
+        self.model_path = Path(model_path)
+        self.dimensions = dimensions
+        self.max_features = max_features
+        self.model: Optional[Any] = None
+        self.fit_fingerprint: Optional[str] = None
+        self.model_id = "tfidf-svd-unfitted"
+        if self.model_path.is_file():
+            # Only ever written by fit() below
+            self.model = joblib.load(self.model_path)
+            self._set_fingerprint()
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.model is not None
+
+    def for_corpus(self, corpus_key: str) -> "TfidfSvdEmbeddings":
+        """The model for one corpus, stored next to model_path under the corpus key."""
+        model_path = self.model_path.with_name(
+            f"{self.model_path.stem}-{corpus_key[:16]}{self.model_path.suffix}"
+        )
+        return TfidfSvdEmbeddings(model_path, self.dimensions, self.max_features)
+
+    def _set_fingerprint(self):
+        components = self.model[-1].n_components
+        self.fit_fingerprint = f"{components}d-{hash_file(self.model_path)[:16]}"
+        self.model_id = f"tfidf-svd-{self.fit_fingerprint}"
+
+    def fit(self, texts: List[str]):
+        """Fit on a corpus sample and persist the model atomically."""
+        tfidf = TfidfVectorizer(
+            max_features=self.max_features, sublinear_tf=True, stop_words="english"
+        )
+        term_matrix = tfidf.fit_transform(texts)
+        # TruncatedSVD needs fewer components than samples and terms
+        components = max(1, min(self.dimensions, min(term_matrix.shape) - 1))
+        svd = TruncatedSVD(n_components=components, random_state=42)
+        svd.fit(term_matrix)
+        self.model = make_pipeline(tfidf, svd)
+
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.model_path.parent, suffix=".tmp")
+        os.close(fd)
+        joblib.dump(self.model, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self._set_fingerprint()
+        logging.info(
+            f"Fitted TF-IDF + SVD embeddings ({components} dims) on {len(texts)} chunks"
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.model is None:
+            raise RuntimeError("TfidfSvdEmbeddings must be fitted before use.")
+        if not texts:
+            return []
+        return _normalize_rows(self.model.transform(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def instantiate_embeddings(config: Any) -> Embeddings:
+    """Instantiate an embedding backend from an EmbeddingConfig registry entry."""
+    if config.provider in ("openai", "ollama"):
+        return config.embedding_class(model=config.model_name, **config.params)
+    return config.embedding_class(**config.params)
+
+
+def embedding_model_id(embeddings: Embeddings, default: str) -> str:
+    """Identity used in cache keys; fitted local models include their fit hash."""
+    return getattr(embeddings, "model_id", None) or default
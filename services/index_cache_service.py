@@ -0,0 +1,107 @@
+# index_cache_service.py
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from utilities.cache_utils import evict_lru, hash_bytes, remove_path, touch
+
+
+def compute_index_key(documents: List[Document], **build_params: Any) -> str:
+    """
+    Compute a content-addressed key for a vector index from the document contents,
+    their metadata and the parameters used to split and embed them.
+    """
+    parts = [json.dumps(build_params, sort_keys=True, default=str)]
+    for doc in documents:
+        parts.append(doc.page_content)
+        parts.append(json.dumps(doc.metadata, sort_keys=True, default=str))
+    return hash_bytes(*parts)
+
+
+def compute_corpus_key(source_hashes: Dict[str, str], **build_params: Any) -> str:
+    """
+    Compute a content-addressed key for a vector index from per-source content
+    hashes, so an unchanged corpus can be recognized without parsing it.
+    """
+    parts = [json.dumps(build_params, sort_keys=True, default=str)]
+    for source, content_hash in sorted(source_hashes.items()):
+        parts.extend([source, content_hash])
+    return hash_bytes(*parts)
+
+
+class IndexCache:
+    """On-disk LRU cache of FAISS indexes keyed on corpus content and build parameters."""
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def load(self, key: str, embeddings: Embeddings) -> Optional[FAISS]:
+        """Load a cached index, returning None on a miss or an unreadable entry."""
+        entry = self._entry_path(key)
+        if not entry.is_dir():
+            logging.info(f"Index cache miss for key {key[:12]}")
+            return None
+        try:
+            # Entries are only ever written by this process group via save()
+            vectorstore = FAISS.load_local(
+                str(entry), embeddings, allow_dangerous_deserialization=True
+            )
+        except Exception as e:
+            logging.error(f"Failed to load cached index {key[:12]}: {str(e)}")
+            self.invalidate(key)
+            return None
+        touch(entry)
+        logging.info(f"Index cache hit for key {key[:12]}")
+        return vectorstore
+
+    def save(self, key: str, vectorstore: FAISS):
+        """Persist an index under the given key and evict old entries over the size cap."""
+        entry = self._entry_path(key)
+        # Write to a sibling temp dir first so readers never see a partial index
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            vectorstore.save_local(str(tmp_dir))
+            if entry.exists():
+                remove_path(entry)
+            os.replace(tmp_dir, entry)
+        except Exception as e:
+            logging.error(f"Failed to cache index {key[:12]}: {str(e)}")
+            remove_path(tmp_dir)
+            return
+        logging.info(f"Cached index under key {key[:12]}")
+        self.evict()
+
+    def invalidate(self, key: str) -> bool:
+        """Remove a single cached index. Returns True if an entry was removed."""
+        entry = self._entry_path(key)
+        if not entry.exists():
+            return False
+        remove_path(entry)
+        logging.info(f"Invalidated cached index {key[:12]}")
+        return True
+
+    def clear(self):
+        """Remove every cached index."""
+        for entry in self.entries():
+            remove_path(entry)
+        logging.info(f"Cleared index cache at {self.cache_dir}")
+
+    def entries(self) -> List[Path]:
+        return [p for p in self.cache_dir.iterdir() if not p.name.startswith(".")]
+
+    def evict(self) -> List[Path]:
+        """Evict least recently used indexes until the cache fits in max_bytes."""
+        return evict_lru(self.entries(), self.max_bytes)
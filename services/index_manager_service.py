@@ -0,0 +1,194 @@
+# index_manager_service.py
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from filelock import FileLock
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from services.ingestion_service import IngestionPipeline
+from utilities.cache_utils import hash_bytes, remove_path
+
+MANIFEST_FILE = "manifest.json"
+INDEX_DIR = "index"
+DEDUP_FILE = "dedup.npz"
+LOCK_FILE = ".lock"
+
+# Serializes syncs of the same working index within this process; the lock
+# file in the index directory does the same across processes
+_sync_locks: Dict[Path, threading.Lock] = defaultdict(threading.Lock)
+
+
+class IndexManager:
+    """
+    Keeps a persistent FAISS index in step with a set of source files.
+
+    The manifest records, for every source, the hash of its content and the IDs of
+    the chunks it produced. On sync only new or changed sources are loaded, split
+    and embedded, and the chunks of changed or removed sources are deleted by ID
+    from the ID-mapped docstore that LangChain's FAISS wrapper maintains.
+
+    With near-duplicate filtering, the filter's state is saved next to the
+    manifest so later syncs dedup against what is already indexed, and each
+    source records the sources whose chunks stood in for its dropped
+    duplicates. When one of those leaves the index, the source is re-ingested.
+    """
+
+    def __init__(self, store_dir: Path, embeddings: Embeddings):
+        self.store_dir = Path(store_dir)
+        self.embeddings = embeddings
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.store_dir / MANIFEST_FILE
+
+    @property
+    def index_path(self) -> Path:
+        return self.store_dir / INDEX_DIR
+
+    @property
+    def dedup_path(self) -> Path:
+        return self.store_dir / DEDUP_FILE
+
+    @property
+    def lock_path(self) -> Path:
+        return self.store_dir / LOCK_FILE
+
+    def sync(
+        self,
+        source_hashes: Dict[str, str],
+        load_sources: Callable[[List[str]], Iterable[Document]],
+        pipeline: IngestionPipeline,
+    ) -> Optional[FAISS]:
+        """
+        Bring the working index up to date with the given sources and return it.
+        source_hashes maps each source to a hash of its content; load_sources is
+        only called for sources that are new or changed. Sessions and processes
+        sharing the working index take turns, so none saves over another's sync.
+        """
+        with _sync_locks[self.store_dir.resolve()], FileLock(self.lock_path):
+            return self._sync(source_hashes, load_sources, pipeline)
+
+    def _sync(
+        self,
+        source_hashes: Dict[str, str],
+        load_sources: Callable[[List[str]], Iterable[Document]],
+        pipeline: IngestionPipeline,
+    ) -> Optional[FAISS]:
+        vectorstore = self._load_index()
+        manifest = self._load_manifest() if vectorstore is not None else {}
+
+        removed = {
+            source
+            for source, entry in manifest.items()
+            if source_hashes.get(source) != entry["hash"]
+        }
+        # Sources whose duplicates were dropped in favour of a removed source's
+        # chunks have lost that content, so they are ingested again in full
+        pending = removed
+        while pending:
+            pending = {
+                source
+                for source, entry in manifest.items()
+                if source not in removed
+                and pending.intersection(entry.get("duplicate_of", ()))
+            }
+            removed |= pending
+        stale = sorted(removed)
+        fresh = [
+            source
+            for source in source_hashes
+            if source not in manifest or source in removed
+        ]
+        if not stale and not fresh:
+            logging.info("Working index is up to date")
+            return vectorstore
+
+        stale_ids = [
+            chunk_id for source in stale for chunk_id in manifest[source]["chunk_ids"]
+        ]
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+        for source in stale:
+            del manifest[source]
+
+        dedup = pipeline.dedup
+        if dedup is not None:
+            if vectorstore is None or not dedup.load(self.dedup_path):
+                dedup.reset()
+            dedup.remove_sources(stale)
+
+        def chunk_id(source: str, n: int) -> str:
+            # Identical files under different paths must not share chunk IDs
+            return f"{hash_bytes(source, source_hashes[source])[:16]}-{n}"
+
+        vectorstore, ids_by_source = pipeline.run(
+            load_sources(fresh), chunk_id, vectorstore
+        )
+        for source in fresh:
+            # Sources that yield no text are recorded too, so they are not reloaded
+            manifest[source] = {
+                "hash": source_hashes[source],
+                "chunk_ids": ids_by_source.get(source, []),
+            }
+            if dedup is not None and dedup.duplicate_of.get(source):
+                manifest[source]["duplicate_of"] = sorted(dedup.duplicate_of[source])
+
+        logging.info(
+            f"Synced working index: {len(fresh)} sources added or changed "
+            f"({sum(len(ids) for ids in ids_by_source.values())} chunks), "
+            f"{len(stale)} sources removed or changed ({len(stale_ids)} chunks)"
+        )
+        self._save(vectorstore, manifest)
+        if dedup is not None and vectorstore is not None:
+            dedup.save(self.dedup_path)
+        return vectorstore
+
+    def _load_index(self) -> Optional[FAISS]:
+        if not self.index_path.is_dir() or not self.manifest_path.is_file():
+            return None
+        try:
+            # The working index is only ever written by _save
+            return FAISS.load_local(
+                str(self.index_path),
+                self.embeddings,
+                allow_dangerous_deserialization=True,
+            )
+        except Exception as e:
+            logging.error(f"Failed to load working index, rebuilding: {str(e)}")
+            return None
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, vectorstore: Optional[FAISS], manifest: Dict[str, Dict]):
+        if vectorstore is None:
+            self.reset()
+            return
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.store_dir, prefix=".tmp-"))
+        vectorstore.save_local(str(tmp_dir))
+        remove_path(self.index_path)
+        os.replace(tmp_dir, self.index_path)
+        tmp_manifest = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, self.manifest_path)
+
+    def reset(self):
+        """Drop the working index and its manifest."""
+        remove_path(self.index_path)
+        remove_path(self.manifest_path)
+        remove_path(self.dedup_path)
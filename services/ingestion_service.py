@@ -0,0 +1,210 @@
+# ingestion_service.py
+
+import logging
+import queue
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain.text_splitter import TextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from services.dedup_service import NearDuplicateFilter
+from services.document_service import document_source
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+# A batch of (chunk id, chunk) pairs
+Batch = List[Tuple[str, Document]]
+
+
+class _StageFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class IngestionPipeline:
+    """
+    Streams documents through load -> split -> embed -> index as overlapping stages.
+
+    Each stage runs on its own thread and hands work to the next through a bounded
+    queue, so parsing, embedding and index writes overlap and at most a few
+    batches are in flight regardless of corpus size.
+    """
+
+    def __init__(
+        self,
+        text_splitter: TextSplitter,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        queue_size: int = 4,
+        embed_workers: int = 2,
+        dedup: Optional[NearDuplicateFilter] = None,
+    ):
+        self.text_splitter = text_splitter
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.embed_workers = max(1, embed_workers)
+        # Drops near-duplicate chunks between the split and embed stages
+        self.dedup = dedup
+
+    def run(
+        self,
+        documents: Iterable[Document],
+        chunk_id: Callable[[str, int], str],
+        vectorstore: Optional[FAISS] = None,
+    ) -> Tuple[Optional[FAISS], Dict[str, List[str]]]:
+        """
+        Ingest documents into vectorstore (created on the first batch if None).
+        chunk_id(source, n) names the n-th chunk of a source. Returns the store and
+        the chunk IDs written per source.
+        """
+        self._stop = threading.Event()
+        docs_queue: queue.Queue = queue.Queue(self.queue_size)
+        splits_queue: queue.Queue = queue.Queue(self.queue_size)
+        vectors_queue: queue.Queue = queue.Queue(self.queue_size)
+
+        threads = [
+            threading.Thread(
+                target=self._load_stage, args=(documents, docs_queue), daemon=True
+            ),
+            threading.Thread(
+                target=self._split_stage,
+                args=(docs_queue, splits_queue, chunk_id),
+                daemon=True,
+            ),
+        ] + [
+            threading.Thread(
+                target=self._embed_stage,
+                args=(splits_queue, vectors_queue),
+                daemon=True,
+            )
+            for _ in range(self.embed_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            result = self._write_stage(vectors_queue, vectorstore)
+            if self.dedup is not None:
+                self.dedup.log_stats()
+            return result
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _load_stage(self, documents: Iterable[Document], out: queue.Queue):
+        try:
+            for doc in documents:
+                if not self._put(out, doc):
+                    return
+            self._put(out, _DONE)
+        except BaseException as e:
+            self._put(out, _StageFailure(e))
+
+    def _split_stage(
+        self,
+        source: queue.Queue,
+        out: queue.Queue,
+        chunk_id: Callable[[str, int], str],
+    ):
+        counters: Dict[str, int] = defaultdict(int)
+        batch: Batch = []
+        try:
+            while True:
+                doc = self._get(source)
+                if doc is _DONE or isinstance(doc, _StageFailure):
+                    break
+                # Chunks are numbered per source, in document order
+                source_key = document_source(doc)
+                for split in self.text_splitter.split_documents([doc]):
+                    if self.dedup is not None and self.dedup.is_duplicate(
+                        split.page_content, source_key
+                    ):
+                        continue
+                    batch.append((chunk_id(source_key, counters[source_key]), split))
+                    counters[source_key] += 1
+                    if len(batch) >= self.batch_size:
+                        if not self._put(out, batch):
+                            return
+                        batch = []
+            if batch:
+                self._put(out, batch)
+            # Forward a failure, otherwise tell every embed worker to finish
+            end = doc if isinstance(doc, _StageFailure) else _DONE
+            for _ in range(self.embed_workers):
+                self._put(out, end)
+        except BaseException as e:
+            for _ in range(self.embed_workers):
+                self._put(out, _StageFailure(e))
+
+    def _embed_stage(self, source: queue.Queue, out: queue.Queue):
+        try:
+            while True:
+                batch = self._get(source)
+                if batch is _DONE or isinstance(batch, _StageFailure):
+                    self._put(out, batch)
+                    return
+                vectors = self.embeddings.embed_documents(
+                    [split.page_content for _, split in batch]
+                )
+                if not self._put(out, (batch, vectors)):
+                    return
+        except BaseException as e:
+            self._put(out, _StageFailure(e))
+
+    def _write_stage(
+        self, source: queue.Queue, vectorstore: Optional[FAISS]
+    ) -> Tuple[Optional[FAISS], Dict[str, List[str]]]:
+        ids_by_source: Dict[str, List[str]] = defaultdict(list)
+        finished_workers = 0
+        n_chunks = 0
+        while finished_workers < self.embed_workers:
+            item = source.get()
+            if isinstance(item, _StageFailure):
+                raise item.error
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            batch, vectors = item
+            ids = [chunk_id for chunk_id, _ in batch]
+            text_embeddings = [
+                (split.page_content, vector)
+                for (_, split), vector in zip(batch, vectors)
+            ]
+            metadatas = [split.metadata for _, split in batch]
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(
+                    text_embeddings, self.embeddings, metadatas=metadatas, ids=ids
+                )
+            else:
+                vectorstore.add_embeddings(
+                    text_embeddings, metadatas=metadatas, ids=ids
+                )
+            for chunk_id, split in batch:
+                ids_by_source[document_source(split)].append(chunk_id)
+            n_chunks += len(batch)
+        logging.info(f"Ingested {n_chunks} chunks from {len(ids_by_source)} sources")
+        return vectorstore, dict(ids_by_source)
@@ -0,0 +1,200 @@
+# mmap_store_service.py
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import psutil
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from utilities.cache_utils import remove_path, touch
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+PARAMS_FILE = "params.npz"
+DOCS_FILE = "docs.jsonl"
+SEARCH_BLOCK_ROWS = 65536
+QUANTIZED_DTYPES = ("float16", "int8")
+
+
+class QuantizedMmapIndex:
+    """
+    Exact L2 search over float16 or int8 scalar-quantized vectors in a memory-mapped
+    .npy file. The file is opened read-only, so every process that loads the same
+    store shares its pages through the OS page cache.
+
+    Implements the subset of the faiss.Index interface used by LangChain's FAISS
+    wrapper and HybridRetriever (ntotal, d, search, reconstruct, reconstruct_n).
+    """
+
+    def __init__(self, store_dir: Path):
+        store_dir = Path(store_dir)
+        self.codes = np.load(store_dir / VECTORS_FILE, mmap_mode="r")
+        # Squared norms of the dequantized vectors, 4 bytes per vector
+        self.norms = np.load(store_dir / NORMS_FILE, mmap_mode="r")
+        params = np.load(store_dir / PARAMS_FILE)
+        self.offset = params["offset"]
+        self.scale = params["scale"]
+        self.ntotal, self.d = self.codes.shape
+
+    def _dequantize(self, codes: np.ndarray) -> np.ndarray:
+        return dequantize(codes, self.offset, self.scale)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        k = min(k, self.ntotal)
+        n_queries = queries.shape[0]
+        best_dist = np.full((n_queries, k), np.inf, dtype=np.float32)
+        best_ids = np.full((n_queries, k), -1, dtype=np.int64)
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+
+        # Dequantize block by block so scratch memory stays bounded
+        for start in range(0, self.ntotal, SEARCH_BLOCK_ROWS):
+            block = self._dequantize(self.codes[start : start + SEARCH_BLOCK_ROWS])
+            distances = (
+                query_norms
+                - 2.0 * queries @ block.T
+                + self.norms[start : start + len(block)][None, :]
+            )
+            merged_dist = np.concatenate([best_dist, distances], axis=1)
+            block_ids = np.arange(start, start + len(block), dtype=np.int64)
+            merged_ids = np.concatenate(
+                [best_ids, np.broadcast_to(block_ids, distances.shape)], axis=1
+            )
+            top = np.argpartition(merged_dist, k - 1, axis=1)[:, :k]
+            best_dist = np.take_along_axis(merged_dist, top, axis=1)
+            best_ids = np.take_along_axis(merged_ids, top, axis=1)
+
+        order = np.argsort(best_dist, axis=1, kind="stable")
+        return (
+            np.take_along_axis(best_dist, order, axis=1),
+            np.take_along_axis(best_ids, order, axis=1),
+        )
+
+    def reconstruct(self, i: int) -> np.ndarray:
+        return self._dequantize(self.codes[i : i + 1])[0]
+
+    def reconstruct_n(self, start: int, n: int) -> np.ndarray:
+        return self._dequantize(self.codes[start : start + n])
+
+    def resident_bytes(self) -> int:
+        return self.codes.nbytes + self.norms.nbytes
+
+
+def quantize(
+    vectors: np.ndarray, dtype: str
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Quantize float32 vectors to float16, or to int8 with per-dimension affine scaling."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), {
+            "offset": np.zeros(1, dtype=np.float32),
+            "scale": np.ones(1, dtype=np.float32),
+        }
+    if dtype == "int8":
+        low = vectors.min(axis=0)
+        scale = (vectors.max(axis=0) - low) / 255.0
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint((vectors - low) / scale) - 128, -128, 127)
+        return codes.astype(np.int8), {"offset": low, "scale": scale.astype(np.float32)}
+    raise ValueError(f"Unsupported quantized dtype: {dtype}")
+
+
+def dequantize(codes: np.ndarray, offset: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    block = codes.astype(np.float32)
+    if codes.dtype == np.int8:
+        block = (block + 128.0) * scale + offset
+    return block
+
+
+def save_mmap_store(vectorstore: FAISS, store_dir: Path, dtype: str):
+    """Write the vectors of a FAISS store as a quantized .npy file plus its documents."""
+    store_dir = Path(store_dir)
+    store_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=store_dir.parent, prefix=".tmp-"))
+    try:
+        vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+        codes, params = quantize(vectors, dtype)
+        np.save(tmp_dir / VECTORS_FILE, codes)
+        np.savez(tmp_dir / PARAMS_FILE, **params)
+        restored = dequantize(codes, params["offset"], params["scale"])
+        np.save(tmp_dir / NORMS_FILE, np.einsum("ij,ij->i", restored, restored))
+
+        with open(tmp_dir / DOCS_FILE, "w", encoding="utf-8") as f:
+            for position in range(vectorstore.index.ntotal):
+                doc_id = vectorstore.index_to_docstore_id[position]
+                doc = vectorstore.docstore.search(doc_id)
+                record = {
+                    "id": doc_id,
+                    "page_content": doc.page_content,
+                    "metadata": doc.metadata,
+                }
+                f.write(json.dumps(record, default=str) + "\n")
+        remove_path(store_dir)
+        os.replace(tmp_dir, store_dir)
+    except Exception:
+        remove_path(tmp_dir)
+        raise
+
+
+def load_mmap_store(store_dir: Path, embeddings: Embeddings) -> Optional[FAISS]:
+    """Open a quantized store as a LangChain FAISS vector store, or return None if absent."""
+    store_dir = Path(store_dir)
+    if not (store_dir / DOCS_FILE).is_file():
+        return None
+    memory_before = process_memory()
+    try:
+        index = QuantizedMmapIndex(store_dir)
+        docs: Dict[str, Document] = {}
+        index_to_docstore_id: Dict[int, str] = {}
+        with open(store_dir / DOCS_FILE, "r", encoding="utf-8") as f:
+            for position, line in enumerate(f):
+                record = json.loads(line)
+                docs[record["id"]] = Document(
+                    page_content=record["page_content"], metadata=record["metadata"]
+                )
+                index_to_docstore_id[position] = record["id"]
+    except Exception as e:
+        logging.error(f"Failed to open memory-mapped store {store_dir}: {str(e)}")
+        remove_path(store_dir)
+        return None
+    touch(store_dir)
+    log_memory_savings(index, process_memory() - memory_before)
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(docs),
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def process_memory() -> int:
+    """Unique set size of this process, or its resident set size where USS is unavailable."""
+    process = psutil.Process()
+    try:
+        return process.memory_full_info().uss
+    except (psutil.AccessDenied, AttributeError):
+        return process.memory_info().rss
+
+
+def log_memory_savings(index: QuantizedMmapIndex, loaded_bytes: int):
+    """
+    Log the measured growth of this process's memory while the store was loaded,
+    which includes the deserialized documents, next to the size of the mapped
+    vectors and an estimate of the float32 FAISS index they replace.
+    """
+    float32_bytes = index.ntotal * index.d * 4
+    mapped_bytes = index.resident_bytes()
+    logging.info(
+        f"Loaded memory-mapped {index.codes.dtype} store: process memory grew "
+        f"{loaded_bytes / 1024**2:.1f} MB (measured, documents included); vectors "
+        f"map {mapped_bytes / 1024**2:.1f} MB of shared page cache, where a float32 "
+        f"FAISS index would hold an estimated {float32_bytes / 1024**2:.1f} MB per process"
+    )
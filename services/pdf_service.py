@@ -0,0 +1,100 @@
+# pdf_service.py
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import pymupdf
+from langchain.schema import Document
+from langchain_core.document_loaders import BaseLoader
+
+# Cap on the processes each loader in this process may start; set in file
+# parsing pool workers so both levels of parallelism share the machine's cores
+_page_worker_budget: Optional[int] = None
+
+
+def set_page_worker_budget(max_workers: Optional[int]):
+    """Cap the page extraction processes of loaders created in this process."""
+    global _page_worker_budget
+    _page_worker_budget = max_workers
+
+
+def page_ranges(n_pages: int, n_ranges: int) -> List[Tuple[int, int]]:
+    """Split pages 0..n_pages into n_ranges contiguous [start, stop) ranges of near-equal size."""
+    n_ranges = max(1, min(n_ranges, n_pages))
+    bounds = [round(i * n_pages / n_ranges) for i in range(n_ranges + 1)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[Document]:
+    """Extract pages [start, stop) of a PDF; opens the file itself so it can run in a worker."""
+    with pymupdf.open(file_path) as pdf:
+        file_metadata = {
+            key: value
+            for key, value in pdf.metadata.items()
+            if isinstance(value, (str, int))
+        }
+        return [
+            Document(
+                page_content=pdf[number].get_text(),
+                metadata={
+                    **file_metadata,
+                    "source": file_path,
+                    "file_path": file_path,
+                    "page": number,
+                    "total_pages": len(pdf),
+                },
+            )
+            for number in range(start, stop)
+        ]
+
+
+class ParallelPyMuPDFLoader(BaseLoader):
+    """
+    PyMuPDF loader that extracts large PDFs page-range by page-range in worker
+    processes, so a single long file uses every core. Pages come back in order
+    with the same metadata PyMuPDFLoader produces; small files are extracted
+    in-process, where a pool would cost more than it saves. Inside a file
+    parsing pool worker, the pool only gets that worker's share of the cores.
+    """
+
+    # Part of the parsed-document cache key
+    loader_version = f"1-pymupdf-{pymupdf.VersionBind}"
+
+    def __init__(
+        self,
+        file_path: str,
+        max_workers: Optional[int] = None,
+        min_pages_per_worker: int = 500,
+    ):
+        self.file_path = str(file_path)
+        self.max_workers = max_workers or min(
+            os.cpu_count() or 1, 8, _page_worker_budget or 8
+        )
+        self.min_pages_per_worker = max(1, min_pages_per_worker)
+
+    def lazy_load(self) -> Iterator[Document]:
+        with pymupdf.open(self.file_path) as pdf:
+            n_pages = len(pdf)
+        n_workers = min(self.max_workers, n_pages // self.min_pages_per_worker)
+        if n_workers <= 1:
+            yield from extract_page_range(self.file_path, 0, n_pages)
+            return
+
+        # A few ranges per worker evens out pages that are slower to extract
+        ranges = page_ranges(n_pages, n_workers * 4)
+        logging.info(
+            f"Extracting {n_pages} pages of {self.file_path} in {len(ranges)} ranges "
+            f"on {n_workers} processes"
+        )
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(extract_page_range, self.file_path, start, stop)
+                for start, stop in ranges
+            ]
+            for future in futures:
+                yield from future.result()
@@ -0,0 +1,154 @@
+# query_cache_service.py
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+@dataclass
+class CacheEntry:
+    answer: str
+    vector: Optional[np.ndarray]
+    created_at: float
+
+
+class QueryCache:
+    """
+    Two-tier, thread-safe answer cache for RAG queries.
+
+    The exact tier matches on the normalized question. The optional semantic tier
+    reuses an answer when the query embedding has cosine similarity of at least
+    semantic_threshold with a cached one. Entries are scoped (typically to the
+    index version) so answers never leak across corpora, and are evicted by LRU
+    order and TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        semantic_threshold: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get(self, query: str, scope: str) -> Optional[str]:
+        """Exact-tier lookup."""
+        key = (scope, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                self._entries.pop(key, None)
+                if self.semantic_threshold is None:
+                    # Otherwise the miss is counted by the semantic tier
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.answer
+
+    def get_similar(self, query_vector: List[float], scope: str) -> Optional[str]:
+        """Semantic-tier lookup against cached queries in the same scope."""
+        if self.semantic_threshold is None:
+            return None
+        with self._lock:
+            self._purge_expired()
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if key[0] == scope and entry.vector is not None
+            ]
+            if not candidates:
+                self.misses += 1
+                return None
+            matrix = np.stack([entry.vector for _, entry in candidates])
+            similarities = matrix @ _unit(query_vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.semantic_threshold:
+                self.misses += 1
+                return None
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            logging.info(f"Semantic cache hit (cosine {similarities[best]:.3f})")
+            return entry.answer
+
+    def put(
+        self,
+        query: str,
+        scope: str,
+        answer: str,
+        query_vector: Optional[List[float]] = None,
+    ):
+        vector = _unit(query_vector) if query_vector is not None else None
+        with self._lock:
+            key = (scope, normalize_query(query))
+            self._entries[key] = CacheEntry(answer, vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scope: Optional[str] = None):
+        """Drop every entry, or only the entries of one scope."""
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == scope]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+            }
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.created_at > self.ttl_seconds
+
+    def _purge_expired(self):
+        for key in [
+            key for key, entry in self._entries.items() if self._expired(entry)
+        ]:
+            del self._entries[key]
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+_shared_caches: Dict[Tuple, QueryCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_query_cache(
+    max_entries: int, ttl_seconds: float, semantic_threshold: Optional[float]
+) -> QueryCache:
+    """Process-wide cache so answers are reused across runs and Streamlit sessions."""
+    settings = (max_entries, ttl_seconds, semantic_threshold)
+    with _shared_lock:
+        if settings not in _shared_caches:
+            _shared_caches[settings] = QueryCache(*settings)
+        return _shared_caches[settings]
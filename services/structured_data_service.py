@@ -0,0 +1,166 @@
+# structured_data_service.py
+
+import csv
+import json
+from typing import Any, Iterator, List, TextIO
+
+from langchain.schema import Document
+from langchain_core.document_loaders import BaseLoader
+
+JSON_READ_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+# Characters that can continue a JSON number; never valid right after a value
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+class BatchedCSVLoader(BaseLoader):
+    """
+    Streams a CSV file and groups rows into documents of rows_per_document rows.
+
+    Every row is rendered as "column: value" lines and rows are separated by a
+    blank line, so each chunk the splitter cuts along row boundaries still carries
+    its column names. Only one batch of rows is held in memory at a time.
+    """
+
+    loader_version = "1"
+
+    def __init__(
+        self, file_path: str, rows_per_document: int = 100, encoding: str = "utf-8"
+    ):
+        self.file_path = str(file_path)
+        self.rows_per_document = max(1, rows_per_document)
+        self.encoding = encoding
+
+    def lazy_load(self) -> Iterator[Document]:
+        with open(self.file_path, newline="", encoding=self.encoding) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            header = [column.strip() for column in header]
+            rows: List[str] = []
+            row_start = 0
+            for n, row in enumerate(reader):
+                rows.append(
+                    "\n".join(
+                        f"{column}: {value.strip()}"
+                        for column, value in zip(header, row)
+                    )
+                )
+                if len(rows) >= self.rows_per_document:
+                    yield self._document(rows, row_start)
+                    rows = []
+                    row_start = n + 1
+            if rows:
+                yield self._document(rows, row_start)
+
+    def _document(self, rows: List[str], row_start: int) -> Document:
+        return Document(
+            page_content="\n\n".join(rows),
+            metadata={
+                "source": self.file_path,
+                "row_start": row_start,
+                "row_end": row_start + len(rows) - 1,
+            },
+        )
+
+
+def iter_json_records(
+    stream: TextIO, lines: bool = False, read_size: int = JSON_READ_SIZE
+) -> Iterator[Any]:
+    """
+    Incrementally parse JSON from a text stream, yielding one record at a time:
+    the elements of a top-level array or the members of a top-level object as
+    {key: value} dicts. With lines=True every top-level value is a record
+    (JSON Lines). Memory is bounded by the largest single record, not the file.
+    """
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill(min_size: int = read_size) -> bool:
+        """Append at least min_size characters; compacts consumed input first."""
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        buffer = buffer[position:]
+        position = 0
+        data = stream.read(max(read_size, min_size))
+        if not data:
+            eof = True
+            return False
+        buffer += data
+        return True
+
+    def skip(chars: str) -> str:
+        """Skip whitespace and the given separators; return the next char or ""."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and (
+                buffer[position].isspace() or buffer[position] in chars
+            ):
+                position += 1
+            if position < len(buffer) or not fill():
+                return buffer[position] if position < len(buffer) else ""
+
+    def decode() -> Any:
+        """Decode the value at position, reading more input until it is complete."""
+        nonlocal position
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+                # A number at the end of the buffer may be cut short, e.g. "2." of "2.5"
+                if eof or (end < len(buffer) and buffer[end] not in _NUMBER_CHARS):
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            # Grow geometrically so a large record is not re-parsed too often
+            fill(len(buffer) - position)
+
+    first = skip("")
+    if lines or first not in ("[", "{"):
+        while skip("") != "":
+            yield decode()
+        return
+
+    position += 1
+    closing = "]" if first == "[" else "}"
+    while (next_char := skip(",")) not in (closing, ""):
+        if first == "[":
+            yield decode()
+            continue
+        key = decode()
+        if skip("") != ":":
+            raise ValueError(f"Expected ':' after object key {key!r}")
+        position += 1
+        skip("")
+        yield {key: decode()}
+    if next_char == "":
+        raise ValueError(f"Unexpected end of JSON input, expected '{closing}'")
+
+
+class StreamingJSONLoader(BaseLoader):
+    """Loads a JSON or JSON Lines (.jsonl) file record by record without reading it whole."""
+
+    loader_version = "1"
+
+    def __init__(self, file_path: str, encoding: str = "utf-8"):
+        self.file_path = str(file_path)
+        self.encoding = encoding
+
+    def lazy_load(self) -> Iterator[Document]:
+        with open(self.file_path, encoding=self.encoding) as f:
+            records = iter_json_records(f, lines=self.file_path.endswith(".jsonl"))
+            for seq_num, record in enumerate(records):
+                content = (
+                    record
+                    if isinstance(record, str)
+                    else json.dumps(record, ensure_ascii=False)
+                )
+                yield Document(
+                    page_content=content,
+                    metadata={"source": self.file_path, "seq_num": seq_num},
+                )
@@ -2,26 +2,52 @@
 
 # url_service.py
 
+import asyncio
+import gzip
+import io
+import json
 import logging
+import os
 import re
+import sqlite3
 import subprocess
 import sys
+import tempfile
+import threading
 import time
-from typing import List
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
 
-import numpy as np
-from bs4 import BeautifulSoup, Comment
+import requests
+from bs4 import UnicodeDammit
+from bs4.dammit import EncodingDetector
+from defusedxml import ElementTree as DefusedElementTree
 from langchain.schema import Document
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from lxml import etree
 from playwright.sync_api import sync_playwright
-from sklearn.feature_extraction.text import TfidfVectorizer
-from undetected_playwright import Malenia
-
-
-def ensure_playwright_installed():
-    """Ensure Playwright and its browsers are installed."""
+from requests.adapters import HTTPAdapter
+
+from config.config import ScraperConfig
+from services.browser_pool_service import BrowserPool, get_browser_pool
+from services.content_cleaner_service import LxmlContentCleaner, get_site_templates
+from services.crawler_service import (
+    THROTTLE_STATUSES,
+    HostRateLimiter,
+    PageResult,
+    SiteCrawler,
+)
+from services.index_cache_service import compute_index_key
+from utilities.cache_utils import evict_lru, hash_bytes, remove_path, touch
+
+
+@lru_cache(maxsize=1)
+def ensure_playwright_installed() -> bool:
+    """Ensure Playwright and its browsers are installed. Runs once per process."""
     try:
         import playwright
     except ImportError:
@@ -30,14 +56,17 @@ def ensure_playwright_installed():
         import playwright
 
     try:
-        # Check if browsers are installed
+        # Checks that the browser binary exists without launching it
         with sync_playwright() as p:
-            p.chromium.launch()
+            installed = Path(p.chromium.executable_path).exists()
     except Exception:
+        installed = False
+    if not installed:
         logging.info("Installing Playwright browsers...")
         subprocess.check_call(
             [sys.executable, "-m", "playwright", "install", "chromium"]
         )
+    return True
 
 
 class RateLimiter:
@@ -52,136 +81,458 @@ class RateLimiter:
         self.last_request = time.time()
 
 
-class ContentCleaner:
-    def __init__(self):
-        # Define common class names for ads and navigation elements
-        self.common_ad_classes = ["ad", "advertisement", "banner", "sponsored"]
-        self.common_nav_classes = ["nav", "navigation", "menu", "sidebar"]
-        # Define tags that are typically irrelevant to main content
-        self.irrelevant_tags = [
-            "script",
-            "style",
-            "noscript",
-            "iframe",
-            "header",
-            "footer",
+# Non-visible markup that does not count as page text
+SCRIPT_STYLE_PATTERN = re.compile(
+    r"<(script|style|template|svg)\b[^>]*>.*?</\1\s*>", re.I | re.S
+)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+NOSCRIPT_PATTERN = re.compile(r"<noscript\b[^>]*>(.*?)</noscript\s*>", re.I | re.S)
+JS_REQUIRED_HINT = re.compile(r"(?:enable|requires?|turn on)\s+javascript", re.I)
+# Empty single-page-app mount points such as <div id="root"></div>
+EMPTY_APP_ROOT = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</div>", re.I
+)
+
+
+def needs_javascript(
+    html: str, min_text_chars: int = 200, min_text_ratio: float = 0.02
+) -> bool:
+    """
+    Heuristic for server HTML that only becomes readable after scripts run: an
+    (almost) empty body, very little text for the amount of markup, a
+    <noscript> asking for JavaScript or an empty app mount point.
+    """
+    if EMPTY_APP_ROOT.search(html) or any(
+        JS_REQUIRED_HINT.search(noscript) for noscript in NOSCRIPT_PATTERN.findall(html)
+    ):
+        return True
+    # Inline scripts and data blobs are not markup the reader sees
+    markup = SCRIPT_STYLE_PATTERN.sub(" ", html)
+    text_chars = len(" ".join(TAG_PATTERN.sub(" ", markup).split()))
+    if text_chars < min_text_chars:
+        return True
+    return text_chars / max(len(markup), 1) < min_text_ratio
+
+
+def decode_html(response: requests.Response) -> str:
+    """
+    Response body as text. requests falls back to ISO-8859-1 for text/*
+    responses without a charset, which garbles UTF-8 pages, so the header is
+    only trusted when it names a charset; otherwise a BOM, the <meta> charset,
+    UTF-8 and finally the detected encoding are tried in that order.
+    """
+    content_type = response.headers.get("content-type", "")
+    header = [response.encoding] if "charset" in content_type.lower() else []
+    declared = EncodingDetector.find_declared_encoding(response.content, is_html=True)
+    dammit = UnicodeDammit(
+        response.content,
+        known_definite_encodings=header,
+        user_encodings=[declared, "utf-8"] if declared else ["utf-8"],
+        is_html=True,
+    )
+    if dammit.unicode_markup is not None:
+        return dammit.unicode_markup
+    return response.content.decode(response.apparent_encoding or "utf-8", "replace")
+
+
+@lru_cache(maxsize=None)
+def get_http_session(pool_size: int = 16) -> requests.Session:
+    """Process-wide HTTP session with pooled keep-alive connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+class FetchResult(NamedTuple):
+    html: str
+    tier: str  # "static" or "browser"
+    status: int
+    headers: Dict[str, str]  # lowercased names
+
+
+class TieredFetcher:
+    """
+    Fetches a page with a plain HTTP GET first and falls back to rendering it in
+    the browser pool only when the static HTML looks like it needs JavaScript.
+    """
+
+    def __init__(self, browser_pool: BrowserPool, scraper_config: ScraperConfig):
+        self.browser_pool = browser_pool
+        self.scraper_config = scraper_config
+        self.session = get_http_session()
+
+    def fetch(
+        self,
+        url: str,
+        timeout: int = 30000,
+        validators: Optional[Dict[str, str]] = None,
+    ) -> FetchResult:
+        """
+        Fetch url; timeout is in milliseconds, as for Playwright. Conditional
+        request headers in validators may produce a 304 result with no body.
+        """
+        start = time.perf_counter()
+        result = static = None
+        if self.scraper_config.static_fetch_enabled:
+            static = self.fetch_static(url, validators)
+            if static is not None and (
+                static.status == 304
+                # A browser would be throttled too; let the caller back off
+                or static.status in THROTTLE_STATUSES
+                or self.is_static_usable(url, static)
+            ):
+                result = static
+        if result is None:
+            html = self.browser_pool.render(url, timeout=timeout)
+            # Validators of the static response still allow later revalidation
+            headers = (
+                static.headers if static is not None and static.status == 200 else {}
+            )
+            result = FetchResult(html, "browser", 200, headers)
+        logging.info(
+            f"Fetched {url} via {result.tier} tier in "
+            f"{time.perf_counter() - start:.2f}s (HTTP {result.status})"
+        )
+        return result
+
+    def fetch_static(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> Optional[FetchResult]:
+        """Plain GET, or None if the request failed."""
+        try:
+            response = self.session.get(
+                url,
+                headers={
+                    "User-Agent": self.scraper_config.user_agent,
+                    **(headers or {}),
+                },
+                timeout=self.scraper_config.static_fetch_timeout_seconds,
+            )
+        except requests.RequestException as e:
+            logging.info(f"Static fetch failed for {url}, using browser: {str(e)}")
+            return None
+        headers = {key.lower(): value for key, value in response.headers.items()}
+        return FetchResult(
+            decode_html(response), "static", response.status_code, headers
+        )
+
+    def is_static_usable(self, url: str, result: FetchResult) -> bool:
+        """Whether a static response can be used as is, without a browser."""
+        content_type = result.headers.get("content-type", "")
+        if result.status != 200 or "html" not in content_type.lower():
+            logging.info(
+                f"Static fetch of {url} returned {result.status} "
+                f"{content_type}, using browser"
+            )
+            return False
+        if needs_javascript(
+            result.html,
+            self.scraper_config.js_min_text_chars,
+            self.scraper_config.js_min_text_ratio,
+        ):
+            logging.info(f"{url} appears to need JavaScript, using browser")
+            return False
+        return True
+
+
+class PageCache:
+    """
+    On-disk cache of fetched pages keyed by URL: the raw HTML, the documents
+    extracted from it and the response's ETag / Last-Modified validators.
+
+    Entries younger than ttl_seconds are served without network access; older
+    ones are revalidated with a conditional request, and a 304 reuses the
+    stored documents without re-parsing.
+    """
+
+    def __init__(self, cache_dir: Path, ttl_seconds: int, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, url: str) -> Path:
+        return self.cache_dir / f"{hash_bytes(url)}.json.gz"
+
+    def load(self, url: str) -> Optional[Dict]:
+        entry_path = self._entry_path(url)
+        try:
+            with gzip.open(entry_path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            touch(entry_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read cached page for {url}: {str(e)}")
+            remove_path(entry_path)
+            return None
+        return entry if entry.get("url") == url else None
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl_seconds
+
+    @staticmethod
+    def validators(entry: Dict) -> Dict[str, str]:
+        """Conditional request headers for revalidating an entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def documents(entry: Dict) -> List[Document]:
+        return [
+            Document(page_content=doc["page_content"], metadata=doc["metadata"])
+            for doc in entry["documents"]
         ]
-        # Initialize TF-IDF vectorizer for text analysis
-        self.vectorizer = TfidfVectorizer(stop_words="english")
-
-    def clean(self, soup: BeautifulSoup) -> BeautifulSoup:
-        """Main cleaning method that applies all cleaning techniques."""
-        # Apply basic cleaning techniques
-        self.remove_comments(soup)
-        self.remove_irrelevant_tags(soup)
-        self.remove_ads(soup)
-        self.remove_navigation(soup)
-        self.remove_empty_tags(soup)
-        self.clean_text(soup)
-
-        # Find the main content wrapper
-        main_content = self.find_content_wrapper(soup)
-        if main_content:
-            soup = BeautifulSoup(str(main_content), "html.parser")
-
-        # Extract paragraphs and remove boilerplate content
-        paragraphs = [p.get_text() for p in soup.find_all("p")]
-        cleaned_paragraphs = self.remove_boilerplate(paragraphs)
-        logging.debug(f"Cleaned paragraphs: {cleaned_paragraphs}")
-        # Reconstruct the soup with cleaned paragraphs
-        new_soup = BeautifulSoup("<div></div>", "html.parser")
-        for para in cleaned_paragraphs:
-            new_p = new_soup.new_tag("p")
-            new_p.string = para
-            new_soup.div.append(new_p)
-
-        return new_soup
-
-    def remove_comments(self, soup: BeautifulSoup):
-        """Remove HTML comments from the soup."""
-        for comment in soup.find_all(text=lambda text: isinstance(text, Comment)):
-            comment.extract()
-
-    def remove_irrelevant_tags(self, soup: BeautifulSoup):
-        """Remove irrelevant tags from the soup."""
-        for tag in self.irrelevant_tags:
-            for element in soup.find_all(tag):
-                element.decompose()
-
-    def remove_ads(self, soup: BeautifulSoup):
-        """Remove elements with common ad class names from the soup."""
-        for ad_class in self.common_ad_classes:
-            for element in soup.find_all(class_=re.compile(ad_class, re.I)):
-                element.decompose()
-
-    def remove_navigation(self, soup: BeautifulSoup):
-        """Remove elements with common navigation class names from the soup."""
-        for nav_class in self.common_nav_classes:
-            for element in soup.find_all(class_=re.compile(nav_class, re.I)):
-                element.decompose()
-
-    def remove_empty_tags(self, soup: BeautifulSoup):
-        """Remove empty tags from the soup."""
-        for element in soup.find_all():
-            if len(element.get_text(strip=True)) == 0:
-                element.extract()
-
-    def clean_text(self, soup: BeautifulSoup):
-        """Normalize whitespace in text nodes."""
-        for element in soup.find_all(text=True):
-            text = element.strip()
-            if text:
-                cleaned_text = re.sub(r"\s+", " ", text)
-                element.replace_with(cleaned_text)
 
-    def remove_boilerplate(self, paragraphs: List[str]) -> List[str]:
-        """Remove boilerplate content using TF-IDF analysis."""
-        if not paragraphs:
-            return []
+    def save(
+        self,
+        url: str,
+        result: FetchResult,
+        documents: List[Document],
+        extraction_version: str,
+    ) -> Dict:
+        headers = result.headers
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "tier": result.tier,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "extraction_version": extraction_version,
+            "html": result.html,
+            "documents": [
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in documents
+            ],
+        }
+        self._write(url, entry)
+        return entry
+
+    def refresh(self, url: str, entry: Dict, headers: Dict[str, str]) -> Dict:
+        """Restart an entry's TTL after a 304, picking up any updated validators."""
+        entry = {
+            **entry,
+            "fetched_at": time.time(),
+            "etag": headers.get("etag", entry.get("etag")),
+            "last_modified": headers.get("last-modified", entry.get("last_modified")),
+        }
+        self._write(url, entry)
+        return entry
+
+    def _write(self, url: str, entry: Dict):
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+            with gzip.open(os.fdopen(fd, "wb"), "wt", encoding="utf-8") as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, self._entry_path(url))
+        except Exception as e:
+            logging.error(f"Failed to cache page {url}: {str(e)}")
+            if tmp_path:
+                remove_path(Path(tmp_path))
+            return
+        evict_lru(
+            [p for p in self.cache_dir.iterdir() if not p.name.startswith(".")],
+            self.max_bytes,
+        )
+
+    def clear(self):
+        """Remove every cached page."""
+        for entry_path in self.cache_dir.iterdir():
+            remove_path(entry_path)
+        logging.info(f"Cleared page cache at {self.cache_dir}")
+
+
+# The sitemap protocol's limit for one uncompressed sitemap
+SITEMAP_MAX_BYTES = 50 * 1024**2
+
+
+class SitemapEntry(NamedTuple):
+    url: str
+    lastmod: Optional[str]
+
+
+def read_capped(chunks: Iterable[bytes], max_bytes: int) -> bytes:
+    """Join chunks, raising ValueError once they exceed max_bytes."""
+    content = bytearray()
+    for chunk in chunks:
+        content += chunk
+        if len(content) > max_bytes:
+            raise ValueError(f"larger than {max_bytes} bytes")
+    return bytes(content)
+
+
+def iter_sitemap(
+    sitemap_url: str,
+    session: requests.Session,
+    user_agent: str,
+    timeout: float = 10,
+    max_depth: int = 3,
+    max_bytes: int = SITEMAP_MAX_BYTES,
+) -> Iterator[SitemapEntry]:
+    """
+    Yield the pages listed in a sitemap, following sitemap indexes and
+    decompressing gzipped sitemaps. Sitemaps are untrusted XML, so they are
+    read and decompressed up to max_bytes and parsed without entity expansion.
+    Unreachable, oversized or malformed sitemaps are logged and skipped.
+    """
+    try:
+        with session.get(
+            sitemap_url,
+            headers={"User-Agent": user_agent},
+            timeout=timeout,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            content = read_capped(response.iter_content(64 * 1024), max_bytes)
+        if content[:2] == b"\x1f\x8b":
+            with gzip.GzipFile(fileobj=io.BytesIO(content)) as f:
+                content = read_capped(iter(lambda: f.read(64 * 1024), b""), max_bytes)
+        root = DefusedElementTree.fromstring(content)
+    except (
+        requests.RequestException,
+        OSError,
+        ValueError,
+        ElementTree.ParseError,
+    ) as e:
+        logging.warning(f"Failed to read sitemap {sitemap_url}: {str(e)}")
+        return
+
+    is_index = root.tag.rsplit("}", 1)[-1] == "sitemapindex"
+    for item in root:
+        fields = {
+            child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in item
+        }
+        if not fields.get("loc"):
+            continue
+        if not is_index:
+            yield SitemapEntry(fields["loc"], fields.get("lastmod") or None)
+        elif max_depth > 0:
+            yield from iter_sitemap(
+                fields["loc"], session, user_agent, timeout, max_depth - 1
+            )
+        else:
+            logging.warning(f"Skipping nested sitemap {fields['loc']}: too deep")
+
+
+class CrawlLedger:
+    """
+    SQLite record of every page ingested from a sitemap: its URL, the sitemap
+    lastmod it was fetched at, the hash of the documents extracted from it and
+    the extraction version that produced them.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, lastmod TEXT, "
+            "content_hash TEXT NOT NULL, extraction_version TEXT NOT NULL, "
+            "crawled_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, urls: List[str]) -> Dict[str, Tuple[Optional[str], str, str]]:
+        """Map each known URL to its (lastmod, content_hash, extraction_version)."""
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(urls), 500):
+                batch = urls[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    "SELECT url, lastmod, content_hash, extraction_version FROM pages "
+                    f"WHERE url IN ({placeholders})",
+                    batch,
+                )
+                for url, *record in rows:
+                    found[url] = tuple(record)
+        return found
 
-        # Calculate TF-IDF scores for each paragraph
-        tfidf_matrix = self.vectorizer.fit_transform(paragraphs)
+    def record(
+        self,
+        url: str,
+        lastmod: Optional[str],
+        content_hash: str,
+        extraction_version: str,
+    ):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (url, lastmod, content_hash, extraction_version, time.time()),
+            )
+            self._conn.commit()
 
-        # Calculate the average TF-IDF score for each paragraph
-        avg_scores = np.mean(tfidf_matrix.toarray(), axis=1)
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
 
-        # Keep paragraphs with above-average TF-IDF scores
-        threshold = np.mean(avg_scores)
-        return [
-            para for para, score in zip(paragraphs, avg_scores) if score > threshold
-        ]
 
-    def score_readability(self, text):
-        """Calculate a basic readability score for a given text."""
-        words = len(re.findall(r"\w+", text))
-        sentences = len(re.findall(r"\w+[.!?]", text)) or 1
-        return words / sentences  # A simple words per sentence ratio
+class SiteSnapshot(NamedTuple):
+    source_hashes: Dict[str, str]  # every page in the sitemap
+    documents: Dict[str, List[Document]]  # only pages that were fetched and changed
 
-    def find_content_wrapper(self, soup):
-        """Identify the main content wrapper based on readability and structure."""
-        candidates = soup.find_all(["div", "article", "main", "section"])
-        if not candidates:
-            return None
 
-        scored_candidates = []
-        for candidate in candidates:
-            text = candidate.get_text()
-            score = self.score_readability(text)
-            text_length = len(text)
-            p_density = len(candidate.find_all("p")) / (len(candidate.find_all()) + 1)
+class Section(NamedTuple):
+    heading_path: List[str]  # titles of the enclosing headings, outermost first
+    anchor: str  # id of the heading's fragment, "" if it has none
+    text: str
 
-            combined_score = score * text_length * p_density
-            scored_candidates.append((candidate, combined_score))
 
-        return max(scored_candidates, key=lambda x: x[1])[0]
+HEADING_LEVELS = {f"h{level}": level for level in range(1, 7)}
+
+# Bump when extract_content changes, so cached pages are re-extracted
+EXTRACTION_VERSION = "3"
 
 
 class WebScraper:
-    def __init__(self, requests_per_minute: int = 20):
+    def __init__(
+        self,
+        requests_per_minute: int = 20,
+        scraper_config: Optional[ScraperConfig] = None,
+        browser_pool: Optional[BrowserPool] = None,
+    ):
         ensure_playwright_installed()
+        self.scraper_config = scraper_config or ScraperConfig()
+        # Warm browser contexts shared by every scraper in the process
+        self.browser_pool = browser_pool or get_browser_pool(
+            self.scraper_config.browser_pool_size,
+            self.scraper_config.browser_max_pages_per_context,
+            self.scraper_config.user_agent,
+        )
+        self.fetcher = TieredFetcher(self.browser_pool, self.scraper_config)
+        self.page_cache = (
+            PageCache(
+                self.scraper_config.page_cache_dir,
+                self.scraper_config.page_cache_ttl_seconds,
+                self.scraper_config.page_cache_max_bytes,
+            )
+            if self.scraper_config.page_cache_enabled
+            else None
+        )
         self.rate_limiter = RateLimiter(requests_per_minute)
+        # Crawls wait per host on the event loop instead of sleeping the thread
+        self.host_rate_limiter = HostRateLimiter(
+            self.scraper_config.host_requests_per_second,
+            self.scraper_config.host_burst,
+        )
+        self.ledger = CrawlLedger(self.scraper_config.crawl_ledger_path)
         self.robot_parsers = {}
-        self.content_cleaner = ContentCleaner()
+        # Learns each domain's boilerplate from the pages scraped from it
+        self.content_cleaner = LxmlContentCleaner(
+            get_site_templates(self.scraper_config.site_template_min_other_pages)
+        )
         logging.info(
             f"WebScraper initialized with {requests_per_minute} requests per minute"
         )
@@ -201,8 +552,130 @@ class WebScraper:
         logging.info(f"Can fetch {url}: {can_fetch}")
         return can_fetch
 
+    def discover_sitemaps(self, url: str) -> List[str]:
+        """Sitemaps listed in the site's robots.txt, or /sitemap.xml if none are."""
+        parsed_url = urlparse(url)
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        self.can_fetch(url)  # Reads robots.txt once per site
+        sitemaps = self.robot_parsers[base_url].site_maps()
+        return sitemaps or [urljoin(base_url, "/sitemap.xml")]
+
+    def sitemap_entries(self, url: str) -> Dict[str, Optional[str]]:
+        """Map the sitemap pages at or below url's directory to their lastmod."""
+        parsed_url = urlparse(url)
+        path = parsed_url.path or "/"
+        prefix = path[: path.rfind("/") + 1]
+        entries: Dict[str, Optional[str]] = {}
+        for sitemap_url in self.discover_sitemaps(url):
+            for entry in iter_sitemap(
+                sitemap_url,
+                self.fetcher.session,
+                self.scraper_config.user_agent,
+                self.scraper_config.static_fetch_timeout_seconds,
+            ):
+                page = urlparse(entry.url)
+                if page.netloc == parsed_url.netloc and page.path.startswith(prefix):
+                    entries.setdefault(entry.url, entry.lastmod)
+                if len(entries) >= self.scraper_config.sitemap_max_urls:
+                    logging.warning(
+                        f"Sitemap of {url} truncated to "
+                        f"{self.scraper_config.sitemap_max_urls} pages"
+                    )
+                    return entries
+        return entries
+
+    def sitemap_snapshot(
+        self, url: str, timeout: int = 30000
+    ) -> Optional[SiteSnapshot]:
+        """
+        Hash every sitemap page under url, fetching only pages that are new to
+        the crawl ledger, whose lastmod changed or that have no lastmod. Those
+        are fetched concurrently with per-host rate limits, and cached copies
+        are revalidated rather than served. Returns None if no sitemap lists any.
+        """
+        logging.info(f"Reading sitemaps for {url}")
+        entries = self.sitemap_entries(url)
+        if not entries:
+            logging.info(f"No sitemap pages found for {url}")
+            return None
+
+        known = self.ledger.get_many(list(entries))
+        source_hashes: Dict[str, str] = {}
+        to_fetch = []
+        for page_url, lastmod in entries.items():
+            record = known.get(page_url)
+            if (
+                record is not None
+                and lastmod
+                and record[0] == lastmod
+                and record[2] == EXTRACTION_VERSION
+            ):
+                source_hashes[page_url] = record[1]
+            else:
+                to_fetch.append(page_url)
+
+        fetched: Dict[str, List[Document]] = defaultdict(list)
+        for document in self.fetch_pages(to_fetch, timeout):
+            fetched[document.metadata["url"]].append(document)
+
+        documents: Dict[str, List[Document]] = {}
+        for page_url in to_fetch:
+            record = known.get(page_url)
+            page_documents = fetched.get(page_url)
+            if not page_documents:
+                if record is not None:
+                    # Keep the last good version rather than dropping the page
+                    source_hashes[page_url] = record[1]
+                continue
+            content_hash = compute_index_key(page_documents)
+            source_hashes[page_url] = content_hash
+            if record is None or record[1] != content_hash:
+                documents[page_url] = page_documents
+            self.ledger.record(
+                page_url, entries[page_url], content_hash, EXTRACTION_VERSION
+            )
+
+        logging.info(
+            f"Sitemap recrawl of {url}: {len(entries)} pages, {len(to_fetch)} "
+            f"fetched, {len(documents)} new or changed"
+        )
+        return SiteSnapshot(source_hashes, documents)
+
+    def fetch_pages(self, urls: List[str], timeout: int = 30000) -> Iterator[Document]:
+        """
+        Fetch pages concurrently through the tiered fetcher with per-host rate
+        limits. Cached copies are revalidated with a conditional request even
+        when they are within their TTL, since the caller knows they may be stale.
+        """
+
+        async def fetch_page(page_url: str) -> PageResult:
+            loop = asyncio.get_running_loop()
+            # The tiered fetch blocks on HTTP and the browser pool's own loop
+            result, documents = await loop.run_in_executor(
+                None, self.fetch_documents, page_url, timeout, True
+            )
+            return result.status, result.headers.get("retry-after"), documents, []
+
+        crawler = SiteCrawler(
+            self.browser_pool,
+            self.extract_content,
+            can_fetch=self.can_fetch,
+            rate_limiter=self.host_rate_limiter,
+            max_depth=0,
+            max_concurrency=self.scraper_config.crawl_max_concurrency,
+            max_retries=self.scraper_config.crawl_max_retries,
+            timeout=timeout,
+            fetch_page=fetch_page,
+        )
+        return crawler.fetch_all(urls)
+
     def scrape_website(self, url: str, timeout: int = 30000) -> List[Document]:
         logging.info(f"Starting to scrape website: {url}")
+        entry = self.page_cache.load(url) if self.page_cache else None
+        if entry is not None and self.page_cache.is_fresh(entry):
+            logging.info(f"Serving {url} from the page cache")
+            return self._cached_documents(url, entry)
+
         if not self.can_fetch(url):
             logging.warning(f"Scraping not allowed for {url} according to robots.txt")
             # return []
@@ -211,65 +684,182 @@ class WebScraper:
         logging.info(f"Rate limiter delay applied for {url}")
 
         try:
-            with sync_playwright() as p:
-                logging.info("Launching browser")
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    user_agent="YourBot/1.0 (+https://yourwebsite.com/bot)"
-                )
-                Malenia.apply_stealth(context)  # Apply stealth mode
-                page = context.new_page()
-
-                try:
-                    logging.info(f"Navigating to {url}")
-                    page.goto(url, timeout=timeout)
-                    logging.info("Waiting for network idle")
-                    page.wait_for_load_state("networkidle", timeout=timeout)
-                except PlaywrightTimeoutError:
-                    logging.warning(f"Timeout occurred while loading {url}")
-
-                logging.info("Extracting page content")
-                content = page.content()
-                browser.close()
-                logging.info("Browser closed")
+            return self.fetch_documents(url, timeout, entry=entry)[1]
         except Exception as e:
             logging.error(f"Error occurred while scraping {url}: {str(e)}")
             return []
 
+    def fetch_documents(
+        self,
+        url: str,
+        timeout: int = 30000,
+        revalidate: bool = False,
+        entry: Optional[Dict] = None,
+    ) -> Tuple[FetchResult, List[Document]]:
+        """
+        Fetch url and extract its documents, revalidating the cached entry if
+        one is given (or, with revalidate, looked up). Error and throttling
+        responses yield no documents.
+        """
+        if revalidate and entry is None and self.page_cache is not None:
+            entry = self.page_cache.load(url)
+        validators = PageCache.validators(entry) if entry is not None else None
+        result = self.fetcher.fetch(url, timeout=timeout, validators=validators)
+
+        if result.status == 304 and entry is not None:
+            logging.info(f"{url} not modified, reusing cached documents")
+            entry = self.page_cache.refresh(url, entry, result.headers)
+            return result, self._cached_documents(url, entry)
+        if result.status >= 300:
+            logging.warning(f"Fetching {url} returned HTTP {result.status}")
+            return result, []
+
         logging.info(f"Extracting and processing content for {url}")
-        return self.extract_content(content, url)
+        documents = self.extract_content(result.html, url)
+        if self.page_cache is not None:
+            self.page_cache.save(url, result, documents, EXTRACTION_VERSION)
+        return result, documents
+
+    def crawl_website(self, url: str, timeout: int = 30000) -> Iterator[Document]:
+        """
+        Crawl same-site links from url concurrently, yielding one Document per
+        page as soon as it is extracted.
+        """
+        logging.info(f"Starting to crawl website: {url}")
+        crawler = SiteCrawler(
+            self.browser_pool,
+            self.extract_content,
+            can_fetch=self.can_fetch,
+            rate_limiter=self.host_rate_limiter,
+            max_depth=self.scraper_config.crawl_max_depth,
+            max_pages=self.scraper_config.crawl_max_pages,
+            max_concurrency=self.scraper_config.crawl_max_concurrency,
+            max_retries=self.scraper_config.crawl_max_retries,
+            timeout=timeout,
+        )
+        yield from crawler.crawl(url)
+
+    def _cached_documents(self, url: str, entry: Dict) -> List[Document]:
+        """Documents of a cached page, re-extracted from its HTML if extraction changed."""
+        if entry.get("extraction_version") == EXTRACTION_VERSION:
+            return PageCache.documents(entry)
+        documents = self.extract_content(entry["html"], url)
+        self.page_cache.save(
+            url,
+            FetchResult(entry["html"], entry["tier"], 200, {}),
+            documents,
+            EXTRACTION_VERSION,
+        )
+        return documents
 
     def extract_content(self, html_content: str, url: str) -> List[Document]:
+        """
+        One Document per heading-delimited section of the page, after the
+        content cleaner has dropped the site's chrome and template blocks.
+        """
         logging.info("Cleaning and parsing HTML content")
-        soup = BeautifulSoup(html_content, "html.parser")
+        root = self.content_cleaner.clean_page(html_content, url)
+        if root is None:
+            return []
 
         # Extract title
-        title = self.extract_title(soup)
-
-        # Extract main content
-        main_content = self.extract_main_content(soup)
-
-        # Create document
-        document = Document(
-            page_content=main_content,
-            metadata={
-                "url": url,
-                "title": title,
-                "type": "main_content",
-            },
-        )
-
-        logging.info(f"Extracted document with {len(main_content)} characters")
-        return [document]
-
-    def extract_main_content(self, soup: BeautifulSoup) -> str:
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-
-        # Get text
-        text = soup.get_text()
+        title = self.extract_title(root)
+
+        # Sections are laid out one per line, so chunk offsets stay page-wide
+        documents = []
+        section_start = 0
+        body = root.find("body")
+        for section in self.extract_sections(body if body is not None else root):
+            documents.append(
+                Document(
+                    page_content=section.text,
+                    metadata={
+                        "url": url,
+                        "title": title,
+                        "type": "section",
+                        "heading_path": " > ".join(section.heading_path),
+                        "anchor": section.anchor,
+                        "section_start": section_start,
+                    },
+                )
+            )
+            section_start += len(section.text) + 1
 
+        logging.info(
+            f"Extracted {len(documents)} sections with "
+            f"{max(section_start - 1, 0)} characters"
+        )
+        return documents
+
+    def extract_sections(self, root: etree._Element) -> List[Section]:
+        """
+        Split the text under root at every h1-h6. Each section is its heading on
+        a line of its own followed by the text up to the next heading; text
+        before the first heading is a section with an empty heading path.
+        Sections without body text are dropped.
+        """
+        sections = []
+        headings: List[Tuple[int, str]] = []
+        anchor = ""
+        strings: List[str] = []
+        heading = None
+
+        def close_section():
+            text = self.normalize_text("".join(strings))
+            if text:
+                title = headings[-1][1] if headings else ""
+                text = f"{title}\n{text}" if title else text
+                sections.append(Section([t for _, t in headings], anchor, text))
+
+        for event, element in etree.iterwalk(root, events=("start", "end")):
+            if not isinstance(element.tag, str):
+                continue
+            if event == "start":
+                if heading is None and element.tag in HEADING_LEVELS:
+                    close_section()
+                    level = HEADING_LEVELS[element.tag]
+                    while headings and headings[-1][0] >= level:
+                        headings.pop()
+                    text = " ".join(
+                        part.strip() for part in element.itertext() if part.strip()
+                    )
+                    headings.append((level, text))
+                    anchor = self.heading_anchor(element)
+                    strings = []
+                    heading = element
+                elif heading is None and element.text:
+                    strings.append(element.text)
+            else:
+                if element is heading:
+                    heading = None
+                # The heading's own text is its title, not body text
+                if heading is None and element is not root and element.tail:
+                    strings.append(element.tail)
+        close_section()
+        return sections
+
+    @staticmethod
+    def heading_anchor(heading: etree._Element) -> str:
+        """The fragment id of a heading, from itself, a link in it or one just before it."""
+        if heading.get("id"):
+            return heading.get("id")
+        target = next(heading.iterfind(".//a[@id]"), None)
+        if target is None:
+            target = next(heading.iterfind(".//a[@name]"), None)
+        if target is None:
+            previous = heading.getprevious()
+            if (
+                previous is not None
+                and previous.tag == "a"
+                and not previous.text_content()
+            ):
+                target = previous
+        if target is None:
+            return ""
+        return target.get("id") or target.get("name") or ""
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
         # Break into lines and remove leading and trailing space on each
         lines = (line.strip() for line in text.splitlines())
 
@@ -277,11 +867,9 @@ class WebScraper:
         chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
 
         # Drop blank lines
-        text = "\n".join(chunk for chunk in chunks if chunk)
-
-        return text
+        return "\n".join(chunk for chunk in chunks if chunk)
 
-    def extract_title(self, soup: BeautifulSoup) -> str:
-        title = soup.title.string if soup.title else ""
+    def extract_title(self, root: etree._Element) -> str:
+        title = (root.findtext(".//title") or "").strip()
         logging.info(f"Extracted title: {title}")
         return title
@@ -0,0 +1,51 @@
+# test_ann_index.py
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from services.ann_index_service import (  # noqa: E402
+    RecallSample,
+    build_faiss_index,
+    select_faiss_index,
+)
+
+
+def clustered_vectors(n_vectors: int, seed: int, dim: int = 32) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(0).normal(size=(64, dim))
+    vectors = centers[rng.integers(0, 64, size=n_vectors)]
+    vectors = vectors + rng.normal(scale=0.6, size=(n_vectors, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type", ["ivf", "hnsw", "ivfpq"])
+def test_calibrated_index_meets_recall_target_on_unseen_queries(index_type):
+    corpus = clustered_vectors(20_000, seed=1)
+    calibration = RecallSample(corpus, k=10, queries=clustered_vectors(1000, seed=2))
+    index = build_faiss_index(index_type, corpus, 0.95, calibration, k=10)
+
+    held_out = RecallSample(corpus, k=10, queries=clustered_vectors(1000, seed=3))
+    assert held_out.measure(index)[0] >= 0.95
+
+
+def test_ivfpq_index_is_smaller_than_flat():
+    corpus = clustered_vectors(20_000, seed=1, dim=64)
+    sample = RecallSample(corpus, k=10, queries=clustered_vectors(200, seed=2, dim=64))
+    sizes = {
+        index_type: faiss.serialize_index(
+            build_faiss_index(index_type, corpus, 0.9, sample, k=10)
+        ).nbytes
+        for index_type in ("flat", "ivfpq")
+    }
+    assert sizes["ivfpq"] < sizes["flat"]
+
+
+def test_selected_index_meets_recall_target():
+    corpus = clustered_vectors(20_000, seed=1)
+    index_type, index = select_faiss_index(
+        corpus, recall_target=0.95, flat_max_vectors=1000, k=10
+    )
+    held_out = RecallSample(corpus, k=10, queries=clustered_vectors(1000, seed=3))
+    assert held_out.measure(index)[0] >= 0.95
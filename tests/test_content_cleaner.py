@@ -0,0 +1,27 @@
+# test_content_cleaner.py
+
+import random
+
+from bs4 import BeautifulSoup
+
+from benchmarks.cleaner_benchmark import synthetic_page
+from services.content_cleaner_service import ContentCleaner, LxmlContentCleaner
+
+
+def test_lxml_engine_matches_reference_cleaner():
+    rng = random.Random(0)
+    reference, cleaner = ContentCleaner(), LxmlContentCleaner()
+    for _ in range(20):
+        html = synthetic_page(rng, paragraphs=12, depth=6)
+        expected = reference.clean(BeautifulSoup(html, "html.parser"))
+        assert str(cleaner.clean_html(html)) == str(expected)
+
+
+def test_text_around_comments_is_normalized_separately():
+    html = (
+        "<html><body><article><p>Teams  met <!-- note -->at dawn.</p>"
+        "<p>The drone found   the hikers near the quarry road.</p>"
+        "<p>Short.</p></article></body></html>"
+    )
+    expected = ContentCleaner().clean(BeautifulSoup(html, "html.parser"))
+    assert str(LxmlContentCleaner().clean_html(html)) == str(expected)
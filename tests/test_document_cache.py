@@ -0,0 +1,85 @@
+# test_document_cache.py
+
+import random
+import string
+
+from services.document_service import (
+    DocumentCache,
+    iter_documents,
+    iter_documents_parallel,
+)
+
+TEXT = "Team two searched the eastern ridge until the light failed.\n"
+
+
+def write_file(tmp_path, name: str, lines: int) -> str:
+    path = tmp_path / name
+    path.write_text(TEXT * lines)
+    return str(path)
+
+
+def test_documents_are_cached_while_streaming(tmp_path):
+    cache = DocumentCache(tmp_path / "cache", max_bytes=1_000_000)
+    path = write_file(tmp_path, "report.txt", 10)
+
+    first = list(iter_documents([path], cache))
+    assert len(cache.entries()) == 1
+
+    second = list(iter_documents([path], cache))
+    assert [d.page_content for d in second] == [d.page_content for d in first]
+    assert [d.metadata for d in second] == [d.metadata for d in first]
+
+
+class CountingCache(DocumentCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loads = 0
+
+    def load(self, key, file_path):
+        self.loads += 1
+        return super().load(key, file_path)
+
+
+def test_parallel_loading_reads_cache_entries_lazily(tmp_path):
+    cache = CountingCache(tmp_path / "cache", max_bytes=1_000_000)
+    paths = [write_file(tmp_path, f"report{n}.txt", n + 1) for n in range(3)]
+    list(iter_documents(paths, cache))
+    cache.loads = 0
+
+    documents = iter_documents_parallel(paths, cache=cache)
+    assert next(documents).metadata["source"] == paths[0]
+    assert cache.loads == 1
+    assert [d.metadata["source"] for d in documents] == paths[1:]
+    assert cache.loads == 3
+
+
+def test_file_larger_than_cache_is_not_cached(tmp_path):
+    cache = DocumentCache(tmp_path / "cache", max_bytes=64)
+    path = tmp_path / "noise.txt"
+    rng = random.Random(0)
+    path.write_text("".join(rng.choices(string.ascii_letters, k=20_000)))
+
+    assert len(list(iter_documents([str(path)], cache))) == 1
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_abandoned_file_leaves_no_entry(tmp_path):
+    cache = DocumentCache(tmp_path / "cache", max_bytes=1_000_000)
+    documents = iter_documents([write_file(tmp_path, "report.txt", 10)], cache)
+    next(documents)
+    documents.close()
+    assert list((tmp_path / "cache").iterdir()) == []
+
+
+def test_csv_rows_per_document_is_configurable(tmp_path):
+    cache = DocumentCache(tmp_path / "cache", max_bytes=1_000_000)
+    path = tmp_path / "teams.csv"
+    path.write_text("team,area\n" + "".join(f"{n},sector {n}\n" for n in range(10)))
+
+    default = list(iter_documents([str(path)], cache))
+    assert len(default) == 1
+
+    options = {"csv": {"rows_per_document": 4}}
+    batched = list(iter_documents([str(path)], cache, options))
+    assert [doc.metadata["row_start"] for doc in batched] == [0, 4, 8]
+    assert len(cache.entries()) == 2
@@ -0,0 +1,52 @@
+# test_embeddings.py
+
+from services.embedding_service import (
+    CachedEmbeddings,
+    EmbeddingStore,
+    TfidfSvdEmbeddings,
+)
+
+SUBJECTS = ["drone", "helicopter", "ground team", "radio", "weather", "dog unit"]
+PLACES = ["ridge", "quarry", "river", "forest", "sector seven", "base camp"]
+
+
+def corpus(variant: str):
+    return [
+        f"The {subject} reported from the {place} near {variant} point {n}."
+        for n, (subject, place) in enumerate((s, p) for s in SUBJECTS for p in PLACES)
+    ]
+
+
+def test_fit_keeps_requested_dimensions(tmp_path):
+    embeddings = TfidfSvdEmbeddings(tmp_path / "model.joblib", dimensions=8)
+    embeddings.fit(corpus("north"))
+    assert len(embeddings.embed_query("drone at the ridge")) == 8
+
+
+def test_refit_changes_cache_identity(tmp_path):
+    embeddings = TfidfSvdEmbeddings(tmp_path / "model.joblib", dimensions=8)
+    embeddings.fit(corpus("north"))
+    first_id = embeddings.model_id
+    assert TfidfSvdEmbeddings(tmp_path / "model.joblib").model_id == first_id
+
+    store = EmbeddingStore(tmp_path / "embeddings.sqlite3")
+    cached = CachedEmbeddings(embeddings, embeddings.model_id, store)
+    first = cached.embed_documents(["drone at the ridge"])
+
+    embeddings.fit(corpus("south") + ["Unrelated words about logistics."])
+    assert embeddings.model_id != first_id
+    cached = CachedEmbeddings(embeddings, embeddings.model_id, store)
+    assert cached.embed_documents(["drone at the ridge"]) != first
+    assert cached.stats()["hits"] == 0
+
+
+def test_each_corpus_gets_its_own_model(tmp_path):
+    shared = TfidfSvdEmbeddings(tmp_path / "model.joblib", dimensions=8)
+    north = shared.for_corpus("north-corpus-key")
+    north.fit(corpus("north"))
+
+    south = shared.for_corpus("south-corpus-key")
+    assert not south.is_fitted
+    south.fit(corpus("south") + ["Unrelated words about logistics."])
+    assert south.model_id != north.model_id
+    assert shared.for_corpus("north-corpus-key").model_id == north.model_id
@@ -0,0 +1,58 @@
+# test_fetch_static.py
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("undetected_playwright")
+
+from config.config import ScraperConfig  # noqa: E402
+from services.url_service import TieredFetcher  # noqa: E402
+
+TEXT = "Café crème — naïve résumé"
+
+PAGES = {
+    # No charset anywhere: requests alone would decode this as ISO-8859-1
+    "/plain": ("text/html", f"<html><body><p>{TEXT}</p></body></html>", "utf-8"),
+    "/meta": (
+        "text/html",
+        f'<html><head><meta charset="windows-1252"></head><body><p>{TEXT.replace("—", "-")}</p></body></html>',
+        "windows-1252",
+    ),
+    "/header": (
+        "text/html; charset=utf-8",
+        f"<html><body><p>{TEXT}</p></body></html>",
+        "utf-8",
+    ),
+}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, html, encoding = PAGES[self.path]
+        body = html.encode(encoding)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.parametrize("path", ["/plain", "/meta", "/header"])
+def test_fetch_static_decodes_page_charset(base_url, path):
+    fetcher = TieredFetcher(browser_pool=None, scraper_config=ScraperConfig())
+    result = fetcher.fetch_static(f"{base_url}{path}")
+    assert "Café crème" in result.html and "résumé" in result.html
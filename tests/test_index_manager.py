@@ -0,0 +1,112 @@
+# test_index_manager.py
+
+import threading
+
+from filelock import FileLock
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from services.dedup_service import NearDuplicateFilter
+from services.index_manager_service import IndexManager
+from services.ingestion_service import IngestionPipeline
+from utilities.cache_utils import hash_bytes
+
+TEXT = "Search sector four at dawn. The team reports calm weather and good signal."
+
+
+def test_identical_files_under_different_paths(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    pipeline = IngestionPipeline(
+        RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0), embeddings
+    )
+    manager = IndexManager(tmp_path / "index", embeddings)
+    content_hash = hash_bytes(TEXT)
+    sources = {"a/report.txt": content_hash, "b/copy.txt": content_hash}
+
+    def load_sources(paths):
+        for path in paths:
+            yield Document(page_content=TEXT, metadata={"source": path})
+
+    vectorstore = manager.sync(sources, load_sources, pipeline)
+    assert len(vectorstore.docstore._dict) == 2 * len(
+        RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0).split_text(TEXT)
+    )
+
+    # Removing one copy keeps the other one's chunks
+    del sources["a/report.txt"]
+    vectorstore = manager.sync(sources, load_sources, pipeline)
+    assert {doc.metadata["source"] for doc in vectorstore.docstore._dict.values()} == {
+        "b/copy.txt"
+    }
+
+
+def test_sync_waits_for_other_processes(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    pipeline = IngestionPipeline(
+        RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0), embeddings
+    )
+    manager = IndexManager(tmp_path / "index", embeddings)
+
+    def load_sources(paths):
+        for path in paths:
+            yield Document(page_content=TEXT, metadata={"source": path})
+
+    # Held the way another process syncing the same working index would hold it
+    other_process = FileLock(manager.lock_path)
+    other_process.acquire()
+    sync = threading.Thread(
+        target=manager.sync, args=({"a.txt": hash_bytes(TEXT)}, load_sources, pipeline)
+    )
+    sync.start()
+    sync.join(timeout=0.5)
+    assert sync.is_alive() and not manager.manifest_path.exists()
+
+    other_process.release()
+    sync.join(timeout=30)
+    assert not sync.is_alive() and manager.manifest_path.exists()
+
+
+SHARED = (
+    "The helicopter crew located the missing hikers near the old quarry road "
+    "shortly after sunrise and guided the ground team to the site."
+)
+MARKER = "Marker paragraph unique to the second file about the radio relay tower."
+
+
+def dedup_sync(store_dir, sources):
+    """Sync sources (path -> text) into the working index with dedup enabled."""
+    embeddings = DeterministicFakeEmbedding(size=16)
+    pipeline = IngestionPipeline(
+        RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0),
+        embeddings,
+        dedup=NearDuplicateFilter(threshold=0.9),
+    )
+
+    def load_sources(paths):
+        for path in paths:
+            yield Document(page_content=sources[path], metadata={"source": path})
+
+    vectorstore = IndexManager(store_dir, embeddings).sync(
+        {path: hash_bytes(text) for path, text in sources.items()},
+        load_sources,
+        pipeline,
+    )
+    return [doc.page_content for doc in vectorstore.docstore._dict.values()]
+
+
+def test_duplicates_come_back_when_the_kept_copy_is_removed(tmp_path):
+    store_dir = tmp_path / "index"
+    first, second = SHARED, SHARED + "\n\n" + MARKER
+    texts = dedup_sync(store_dir, {"a.txt": first, "b.txt": second})
+    assert texts.count(SHARED) == 1 and texts.count(MARKER) == 1
+
+    texts = dedup_sync(store_dir, {"b.txt": second})
+    assert texts.count(SHARED) == 1 and texts.count(MARKER) == 1
+
+
+def test_incremental_sync_dedups_against_indexed_chunks(tmp_path):
+    store_dir = tmp_path / "index"
+    dedup_sync(store_dir, {"a.txt": SHARED})
+    texts = dedup_sync(store_dir, {"a.txt": SHARED, "c.txt": SHARED})
+    assert texts.count(SHARED) == 1
@@ -0,0 +1,36 @@
+# test_pdf_loader.py
+
+import pytest
+
+pymupdf = pytest.importorskip("pymupdf")
+
+from services.pdf_service import (  # noqa: E402
+    ParallelPyMuPDFLoader,
+    set_page_worker_budget,
+)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "report.pdf"
+    with pymupdf.open() as pdf:
+        for n in range(6):
+            pdf.new_page().insert_text((72, 72), f"Sector {n} cleared.")
+        pdf.save(path)
+    return str(path)
+
+
+def test_pages_come_back_in_order(pdf_path):
+    loader = ParallelPyMuPDFLoader(pdf_path, max_workers=2, min_pages_per_worker=2)
+    documents = loader.load()
+    assert [d.metadata["page"] for d in documents] == list(range(6))
+    assert "Sector 5 cleared." in documents[-1].page_content
+
+
+def test_page_worker_budget_caps_default_workers(pdf_path):
+    set_page_worker_budget(1)
+    try:
+        assert ParallelPyMuPDFLoader(pdf_path).max_workers == 1
+        assert ParallelPyMuPDFLoader(pdf_path, max_workers=3).max_workers == 3
+    finally:
+        set_page_worker_budget(None)
@@ -0,0 +1,105 @@
+# test_rag_tool.py
+
+import json
+from operator import itemgetter
+from typing import List
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.runnables import RunnableLambda
+
+pytest.importorskip("playwright")
+pytest.importorskip("undetected_playwright")
+
+from agents.rag import HybridRetriever, RagChain, is_keyword_query  # noqa: E402
+from agents.tools import BatchRagTool, RagTool  # noqa: E402
+from services.embedding_service import CachedEmbeddings, EmbeddingStore  # noqa: E402
+from services.query_cache_service import QueryCache  # noqa: E402
+
+TEXTS = [
+    "Team one searched the northern ridge and found nothing.",
+    "The drone lost signal near sector 7 at noon.",
+    "Weather cleared in the afternoon, so the helicopter took off.",
+    "error_code 42 means the battery is below the safe threshold.",
+]
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embeddings = DeterministicFakeEmbedding(size=16)
+        self.query_calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return self.embeddings.embed_query(text)
+
+
+def rag_tool(mode: str, embeddings=None, tool_class=RagTool):
+    embeddings = embeddings or CountingEmbeddings()
+    vectorstore = FAISS.from_texts(TEXTS, embeddings)
+    retriever = HybridRetriever.from_vectorstore(vectorstore, embeddings, mode=mode)
+    answer_chain = RunnableLambda(
+        lambda inputs: f"answer from {len(inputs['context'])} chunks"
+    )
+    chain = {
+        "context": itemgetter("question") | retriever,
+        "question": itemgetter("question"),
+    } | answer_chain
+    rag_chain = RagChain(
+        chain,
+        answer_chain,
+        retriever,
+        llm=RunnableLambda(lambda prompt: json.dumps(["one", "two"])),
+        embedding_model=embeddings,
+        index_version="index",
+        cache_scope="scope",
+        query_cache=QueryCache(semantic_threshold=0.95),
+    )
+    return tool_class(rag_chain), embeddings
+
+
+def test_one_embedding_call_per_cache_miss():
+    tool, embeddings = rag_tool("hybrid")
+    assert tool._run("Where did the drone lose signal?").startswith("answer")
+    assert embeddings.query_calls == 1
+
+    # Exact-tier hit: no embedding at all
+    tool._run("where did the drone lose signal")
+    assert embeddings.query_calls == 1
+
+
+def test_keyword_query_is_not_embedded():
+    tool, embeddings = rag_tool("auto")
+    tool._run("error_code 42")
+    assert embeddings.query_calls == 0
+
+
+def test_batch_queries_stay_out_of_the_chunk_cache(tmp_path):
+    counting = CountingEmbeddings()
+    embeddings = CachedEmbeddings(
+        counting, "model", EmbeddingStore(tmp_path / "embeddings.sqlite3")
+    )
+    tool, _ = rag_tool("hybrid", embeddings, BatchRagTool)
+    result = tool._run(["Where did the drone lose signal?", "When did it clear?"])
+    assert "Answer: one" in result and "Answer: two" in result
+    assert counting.query_calls == 2
+    assert embeddings.stats()["misses"] == len(TEXTS)
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("what's the refund policy", False),
+        ("Where are the teams' radios?", False),
+        ('the "battery threshold" rule', True),
+        ("what does `error_code` mean?", True),
+        ('he said "hi', False),
+        ("error_code 42", True),
+    ],
+)
+def test_keyword_routing(query, expected):
+    assert is_keyword_query(query) is expected
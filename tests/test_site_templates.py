@@ -0,0 +1,69 @@
+# test_site_templates.py
+
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("undetected_playwright")
+
+from config.config import ScraperConfig  # noqa: E402
+from services import url_service  # noqa: E402
+from services.url_service import WebScraper  # noqa: E402
+
+PAGE = """<html><head><title>{title}</title></head><body>
+<div id="top-links"><ul><li>Home</li><li>Missions</li><li>Contact us</li></ul></div>
+<article><h1>{title}</h1><p>{body}</p></article>
+<div class="site-info"><p>Rescue Ops 2024. All rights reserved.</p></div>
+</body></html>"""
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "site"
+    root.mkdir()
+    pages = {
+        "north.html": ("North ridge", "The drone searched the north ridge. " * 12),
+        "quarry.html": ("Quarry road", "Ground teams walked the quarry road. " * 12),
+    }
+    for name, (title, body) in pages.items():
+        (root / name).write_text(PAGE.format(title=title, body=body))
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietHandler, directory=str(root))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def page_text(documents):
+    return "\n".join(document.page_content for document in documents)
+
+
+def test_shared_nav_and_footer_are_dropped_from_later_pages(
+    site, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(url_service, "ensure_playwright_installed", lambda: True)
+    config = ScraperConfig(
+        page_cache_dir=tmp_path / "pages",
+        crawl_ledger_path=tmp_path / "ledger.sqlite3",
+        site_template_min_other_pages=1,
+    )
+    scraper = WebScraper(requests_per_minute=6000, scraper_config=config)
+
+    first = page_text(scraper.scrape_website(f"{site}/north.html"))
+    assert "Contact us" in first and "All rights reserved" in first
+
+    second = scraper.scrape_website(f"{site}/quarry.html")
+    text = page_text(second)
+    assert "Contact us" not in text and "Missions" not in text
+    assert "All rights reserved" not in text
+    assert "Ground teams walked the quarry road." in text
+    assert [doc.metadata["heading_path"] for doc in second] == ["Quarry road"]
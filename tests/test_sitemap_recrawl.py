@@ -0,0 +1,106 @@
+# test_sitemap_recrawl.py
+
+import gzip
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+pytest.importorskip("playwright")
+pytest.importorskip("undetected_playwright")
+
+from config.config import ScraperConfig  # noqa: E402
+from services import url_service  # noqa: E402
+from services.url_service import WebScraper, iter_sitemap  # noqa: E402
+
+PAGE = "<html><head><title>Status</title></head><body><h1>Status</h1><p>{}</p></body></html>"
+
+
+def page_text(documents):
+    return "\n".join(document.page_content for document in documents)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "site"
+    (root / "docs").mkdir(parents=True)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietHandler, directory=str(root))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    (root / "robots.txt").write_text(f"User-agent: *\nSitemap: {base}/sitemap.xml\n")
+
+    def publish(text: str, lastmod: str, mtime: float):
+        page = root / "docs" / "status.html"
+        page.write_text(PAGE.format(" ".join([text] * 40)))
+        os.utime(page, (mtime, mtime))
+        (root / "sitemap.xml").write_text(
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"><url>'
+            f"<loc>{base}/docs/status.html</loc><lastmod>{lastmod}</lastmod>"
+            "</url></urlset>"
+        )
+
+    yield base, publish
+    server.shutdown()
+
+
+def test_changed_lastmod_bypasses_fresh_page_cache(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(url_service, "ensure_playwright_installed", lambda: True)
+    base, publish = site
+    config = ScraperConfig(
+        sitemap_enabled=True,
+        page_cache_dir=tmp_path / "pages",
+        page_cache_ttl_seconds=3600,
+        crawl_ledger_path=tmp_path / "ledger.sqlite3",
+    )
+    scraper = WebScraper(requests_per_minute=6000, scraper_config=config)
+    url = f"{base}/docs/status.html"
+
+    publish("All teams are standing by.", "2024-01-01", time.time() - 100)
+    first = scraper.sitemap_snapshot(f"{base}/docs/")
+    assert "standing by" in page_text(first.documents[url])
+
+    # The cached copy is still within its TTL, but the sitemap says it changed
+    publish("Team two found the hikers.", "2024-02-01", time.time())
+    second = scraper.sitemap_snapshot(f"{base}/docs/")
+    assert "found the hikers" in page_text(second.documents[url])
+    assert second.source_hashes[url] != first.source_hashes[url]
+
+    # Unchanged lastmod: served from the ledger without fetching
+    third = scraper.sitemap_snapshot(f"{base}/docs/")
+    assert third.documents == {}
+    assert third.source_hashes[url] == second.source_hashes[url]
+
+
+def test_sitemap_is_capped_and_parsed_safely(site, tmp_path):
+    base, publish = site
+    publish("All teams are standing by.", "2024-01-01", time.time())
+    root = tmp_path / "site"
+    entry = f"<url><loc>{base}/docs/status.html</loc></url>"
+    urlset = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{}</urlset>'
+    (root / "big.xml.gz").write_bytes(
+        gzip.compress(urlset.format(entry * 5000).encode())
+    )
+    (root / "entities.xml").write_text(
+        '<?xml version="1.0"?><!DOCTYPE urlset [<!ENTITY page "status">]>'
+        + urlset.format(f"<url><loc>{base}/docs/&page;.html</loc></url>")
+    )
+
+    def entries(name: str):
+        return list(
+            iter_sitemap(f"{base}/{name}", requests.Session(), "test", max_bytes=64_000)
+        )
+
+    assert [e.url for e in entries("sitemap.xml")] == [f"{base}/docs/status.html"]
+    assert entries("big.xml.gz") == []
+    assert entries("entities.xml") == []
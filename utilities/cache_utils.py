@@ -0,0 +1,80 @@
+# cache_utils.py
+
+import hashlib
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Tuple, Union
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(*parts: Union[str, bytes]) -> str:
+    """Returns the SHA-256 hex digest of the given string or byte parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        # Separator so that ("ab", "c") and ("a", "bc") hash differently
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def hash_stream(stream: BinaryIO, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Returns the SHA-256 hex digest of a binary stream, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(file_path: Union[str, Path], chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Returns the SHA-256 hex digest of a file's contents."""
+    with open(file_path, "rb") as f:
+        return hash_stream(f, chunk_size)
+
+
+def path_size(path: Path) -> int:
+    """Returns the size in bytes of a file, or of all files below a directory."""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def touch(path: Path):
+    """Marks a cache entry as recently used by bumping its modification time."""
+    now = time.time()
+    os.utime(path, (now, now))
+
+
+def remove_path(path: Path):
+    """Removes a cache entry, whether it is a file or a directory."""
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def evict_lru(entries: Iterable[Path], max_bytes: int) -> List[Path]:
+    """
+    Removes the least recently used entries until their total size fits in max_bytes.
+    Entries are ordered by modification time, so readers should call touch() on hits.
+    """
+    sized: List[Tuple[float, int, Path]] = []
+    for entry in entries:
+        try:
+            sized.append((entry.stat().st_mtime, path_size(entry), entry))
+        except FileNotFoundError:
+            continue  # Removed concurrently by another process
+
+    total = sum(size for _, size, _ in sized)
+    evicted = []
+    for _, size, entry in sorted(sized, key=lambda item: item[0]):
+        if total <= max_bytes:
+            break
+        logging.info(f"Evicting cache entry {entry} ({size} bytes)")
+        remove_path(entry)
+        total -= size
+        evicted.append(entry)
+    return evicted
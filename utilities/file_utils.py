@@ -1,23 +1,172 @@
 # file_utils.py
 
+import json
 import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from config.config import UPLOAD_DIR
+from utilities.cache_utils import hash_stream, remove_path, touch
 
-def save_uploaded_file(uploaded_file, save_dir="/tmp"):
-    """Saves an uploaded file to the specified directory and returns the path."""
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadStore:
+    """
+    Content-addressed store for uploaded files, shared by all sessions.
+
+    Each unique upload is streamed to disk once, under <root>/blobs/<sha256>/<name>,
+    so reruns and other sessions uploading the same bytes reuse the file. Every
+    session records the hashes it references; blobs that no live session
+    references are garbage-collected.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        session_ttl_seconds: int = 24 * 3600,
+        blob_grace_seconds: int = 3600,
+        gc_interval_seconds: int = 600,
+    ):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.sessions_dir = self.root / "sessions"
+        self.session_ttl_seconds = session_ttl_seconds
+        self.blob_grace_seconds = blob_grace_seconds
+        self.gc_interval_seconds = gc_interval_seconds
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Upload IDs already stored, so reruns neither re-hash nor re-write
+        self._stored: Dict[Tuple[str, str], Path] = {}
+        self._last_gc = 0.0
+
+    def put(self, uploaded_file) -> Path:
+        """Store an uploaded file (a binary stream with a name) and return its path."""
+        name = Path(uploaded_file.name).name
+        upload_id = (getattr(uploaded_file, "file_id", None) or "", name)
+        with self._lock:
+            path = self._stored.get(upload_id)
+        if upload_id[0] and path is not None and path.is_file():
+            touch(path)
+            return path
+
+        uploaded_file.seek(0)
+        content_hash = hash_stream(uploaded_file)
+        path = self._write(uploaded_file, content_hash, name)
+        with self._lock:
+            self._stored[upload_id] = path
+        return path
+
+    def _write(self, uploaded_file, content_hash: str, name: str) -> Path:
+        blob_dir = self.blobs_dir / content_hash
+        path = blob_dir / name
+        if path.is_file():
+            touch(path)
+            return path
+        blob_dir.mkdir(parents=True, exist_ok=True)
+        existing = next((p for p in blob_dir.iterdir() if p.is_file()), None)
+        fd, tmp_path = tempfile.mkstemp(dir=blob_dir, prefix=".tmp-")
+        try:
+            if existing is not None:
+                # Same bytes under another name: link instead of writing again
+                os.close(fd)
+                os.remove(tmp_path)
+                try:
+                    os.link(existing, tmp_path)
+                except OSError:
+                    shutil.copyfile(existing, tmp_path)
+            else:
+                uploaded_file.seek(0)
+                with os.fdopen(fd, "wb") as f:
+                    shutil.copyfileobj(uploaded_file, f, COPY_CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            remove_path(Path(tmp_path))
+            raise
+        logging.info(f"Stored upload {name} as {content_hash[:12]}")
+        return path
+
+    def set_session_files(self, session_id: str, paths: Iterable[Path]):
+        """Record the files a session currently references and collect unreferenced blobs."""
+        hashes = sorted({Path(p).parent.name for p in paths})
+        ref_path = self.sessions_dir / f"{session_id}.json"
+        tmp_path = ref_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+        os.replace(tmp_path, ref_path)
+        self.collect_garbage()
+
+    def collect_garbage(self, force: bool = False) -> List[Path]:
+        """
+        Remove blobs that no live session references. Sessions that have not
+        updated their references within session_ttl_seconds are considered gone;
+        blobs used within blob_grace_seconds are kept so an upload that is not
+        yet referenced is never removed.
+        """
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_gc < self.gc_interval_seconds:
+                return []
+            self._last_gc = now
+
+        referenced = set()
+        for ref_path in self.sessions_dir.glob("*.json"):
+            try:
+                if now - ref_path.stat().st_mtime > self.session_ttl_seconds:
+                    ref_path.unlink(missing_ok=True)
+                    continue
+                with open(ref_path, "r", encoding="utf-8") as f:
+                    referenced.update(json.load(f))
+            except (OSError, ValueError):
+                continue  # Rewritten or removed concurrently
+
+        removed = []
+        for blob_dir in self.blobs_dir.iterdir():
+            if blob_dir.name in referenced:
+                continue
+            try:
+                last_used = max(
+                    [p.stat().st_mtime for p in blob_dir.iterdir()]
+                    + [blob_dir.stat().st_mtime]
+                )
+            except FileNotFoundError:
+                continue
+            if now - last_used > self.blob_grace_seconds:
+                remove_path(blob_dir)
+                removed.append(blob_dir)
+        with self._lock:
+            self._stored = {k: p for k, p in self._stored.items() if p.is_file()}
+        if removed:
+            logging.info(f"Removed {len(removed)} unreferenced uploads")
+        return removed
+
+
+_upload_stores: Dict[Path, UploadStore] = {}
+_upload_stores_lock = threading.Lock()
+
+
+def get_upload_store(root: Optional[Path] = None) -> UploadStore:
+    """Return the process-wide upload store for a directory."""
+    root = Path(root or UPLOAD_DIR).absolute()
+    with _upload_stores_lock:
+        if root not in _upload_stores:
+            _upload_stores[root] = UploadStore(root)
+        return _upload_stores[root]
+
+
+def save_uploaded_file(uploaded_file, store: Optional[UploadStore] = None) -> Path:
+    """Saves an uploaded file to the content-addressed upload store and returns the path."""
     if not uploaded_file:
         raise ValueError("No file uploaded")
 
     try:
-        save_directory = Path(save_dir)
-        save_directory.mkdir(parents=True, exist_ok=True)
-        file_path = save_directory / uploaded_file.name
-
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getvalue())
-
-        return file_path
+        return (store or get_upload_store()).put(uploaded_file)
     except Exception as e:
         logging.error(f"Failed to save uploaded file: {str(e)}")
         raise
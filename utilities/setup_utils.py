@@ -2,6 +2,7 @@
 
 import logging
 import os
+import uuid
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -34,9 +35,12 @@ def configure_session_state():
         "config_json": None,
         "messages": [],
         "langfuse_handler": None,
+        "rag_config": None,
     }
     for key, value in session_defaults.items():
         st.session_state.setdefault(key, value)
+    # Identifies this browser session's references in the upload store
+    st.session_state.setdefault("session_id", uuid.uuid4().hex)
 
 
 def load_css():